@@ -0,0 +1,113 @@
+package db
+
+import (
+	"context"
+	"github.com/pproj/tutter/timing"
+	"go.uber.org/zap"
+	"time"
+)
+
+// PostBatcher coalesces concurrently created posts into a single transaction (group commit).
+// Instead of every request running its own transaction (and waiting for its own commit to be flushed to disk),
+// posts are collected for a short window, or until there are enough of them, and then stored together
+type PostBatcher struct {
+	queue    chan *pendingPost
+	window   time.Duration
+	maxPosts int
+	onCommit func(posts []*Post)
+	logger   *zap.Logger
+	store    func(ctx context.Context, posts []*Post) error // createPosts, except in the tests
+}
+
+type pendingPost struct {
+	post *Post
+	done chan error
+}
+
+// NewPostBatcher starts the writer goroutine. onCommit is called with every batch of committed posts (in id order), before
+// any of their creators are let go, so that they may notify others about them
+func NewPostBatcher(logger *zap.Logger, window time.Duration, maxPosts int, onCommit func(posts []*Post)) *PostBatcher {
+	return newPostBatcher(logger, window, maxPosts, onCommit, createPosts)
+}
+
+func newPostBatcher(logger *zap.Logger, window time.Duration, maxPosts int, onCommit func(posts []*Post), store func(ctx context.Context, posts []*Post) error) *PostBatcher {
+	b := &PostBatcher{
+		queue:    make(chan *pendingPost, maxPosts*4), // so the next batch can pile up while one is being written
+		window:   window,
+		maxPosts: maxPosts,
+		onCommit: onCommit,
+		logger:   logger,
+		store:    store,
+	}
+	go b.run()
+	return b
+}
+
+// Create queues the post to be stored with the next batch, and waits until it is committed. The post is filled in the same way as CreatePost does
+func (b *PostBatcher) Create(ctx context.Context, post *Post) error {
+	started := time.Now()
+	p := &pendingPost{post: post, done: make(chan error, 1)}
+
+	select {
+	case b.queue <- p:
+	case <-ctx.Done():
+		return ctx.Err()
+	}
+
+	// Once queued, the post is going to be stored even if the client went away meanwhile, so we wait for it regardless
+	err := <-p.done
+	timing.FromContext(ctx).Add("batch", time.Since(started))
+	return err
+}
+
+func (b *PostBatcher) run() {
+	for {
+		batch := []*pendingPost{<-b.queue} // the window starts with the first post
+		timer := time.NewTimer(b.window)
+
+	Collect:
+		for len(batch) < b.maxPosts {
+			select {
+			case p := <-b.queue:
+				batch = append(batch, p)
+			case <-timer.C:
+				break Collect
+			}
+		}
+		timer.Stop()
+
+		b.flush(batch)
+	}
+}
+
+func (b *PostBatcher) flush(batch []*pendingPost) {
+	posts := make([]*Post, len(batch))
+	for i, p := range batch {
+		posts[i] = p.post
+	}
+
+	// The batch belongs to many requests, none of them should be able to cancel it for the others
+	err := b.store(context.Background(), posts)
+	if err == nil {
+		b.onCommit(posts)
+		for _, p := range batch {
+			p.done <- nil
+		}
+		return
+	}
+
+	if len(batch) == 1 {
+		batch[0].done <- err
+		return
+	}
+
+	// A single bad post should not fail all the others with it, so try them one by one
+	b.logger.Warn("Storing a batch of posts failed, storing them one by one", zap.Int("posts", len(batch)), zap.Error(err))
+	for _, p := range batch {
+		err = b.store(context.Background(), []*Post{p.post})
+		if err == nil {
+			b.onCommit([]*Post{p.post})
+		}
+		p.done <- err
+	}
+}
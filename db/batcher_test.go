@@ -0,0 +1,223 @@
+package db
+
+import (
+	"context"
+	"errors"
+	"go.uber.org/zap"
+	"sync"
+	"testing"
+	"time"
+)
+
+// These run the batcher against a fake store, the SQL of createPosts itself is covered by the e2e tests (see test_group_commit.py)
+
+var errBadPost = errors.New("bad post")
+
+// fakeStore hands out ids in the order of the posts, like createPosts does, and fails the whole batch (storing nothing) if any post is bad
+type fakeStore struct {
+	mu      sync.Mutex
+	nextID  uint64
+	batches [][]*Post
+	hold    chan struct{} // if set, storing waits until it's closed...
+	waiting chan struct{} // ...and signals here that it started waiting
+}
+
+func (s *fakeStore) store(_ context.Context, posts []*Post) error {
+	if s.hold != nil {
+		select {
+		case s.waiting <- struct{}{}:
+		default:
+		}
+		<-s.hold
+	}
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	for _, p := range posts {
+		if p.Text == "bad" {
+			return errBadPost
+		}
+	}
+	for _, p := range posts {
+		s.nextID++
+		p.ID = s.nextID
+	}
+	s.batches = append(s.batches, posts)
+	return nil
+}
+
+// committed collects what onCommit was called with
+type committed struct {
+	mu    sync.Mutex
+	posts []*Post
+}
+
+func (c *committed) onCommit(posts []*Post) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	c.posts = append(c.posts, posts...)
+}
+
+func (c *committed) assertInOrder(t *testing.T, count int) {
+	t.Helper()
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if len(c.posts) != count {
+		t.Fatalf("%d posts were committed instead of %d", len(c.posts), count)
+	}
+	for i := 1; i < len(c.posts); i++ {
+		if c.posts[i].ID <= c.posts[i-1].ID {
+			t.Fatalf("committed posts are out of order: %d after %d", c.posts[i].ID, c.posts[i-1].ID)
+		}
+	}
+}
+
+// holdFirstBatch makes the writer goroutine busy with a single post, so the posts queued meanwhile end up in the next batch, in the order they were queued
+func holdFirstBatch(t *testing.T, b *PostBatcher, s *fakeStore) <-chan error {
+	t.Helper()
+	s.hold = make(chan struct{})
+	s.waiting = make(chan struct{}, 1)
+	done := make(chan error, 1)
+	go func() {
+		done <- b.Create(context.Background(), &Post{Text: "first"})
+	}()
+	select {
+	case <-s.waiting:
+	case <-time.After(5 * time.Second):
+		t.Fatal("the first batch was not stored")
+	}
+	return done
+}
+
+// queueInOrder queues the posts one by one, each of them only after the previous one is surely in the queue
+func queueInOrder(t *testing.T, b *PostBatcher, posts []*Post) []chan error {
+	t.Helper()
+	results := make([]chan error, len(posts))
+	for i, p := range posts {
+		results[i] = make(chan error, 1)
+		go func(p *Post, result chan error) {
+			result <- b.Create(context.Background(), p)
+		}(p, results[i])
+		waitFor(t, func() bool { return len(b.queue) == i+1 })
+	}
+	return results
+}
+
+func waitFor(t *testing.T, cond func() bool) {
+	t.Helper()
+	deadline := time.Now().Add(5 * time.Second)
+	for !cond() {
+		if time.Now().After(deadline) {
+			t.Fatal("timed out")
+		}
+		time.Sleep(time.Millisecond)
+	}
+}
+
+func TestPostBatcherConcurrentPosts(t *testing.T) {
+	const posts = 500
+	s := &fakeStore{}
+	c := &committed{}
+	b := newPostBatcher(zap.NewNop(), 5*time.Millisecond, 50, c.onCommit, s.store)
+
+	created := make([]*Post, posts)
+	var wg sync.WaitGroup
+	for i := range created {
+		created[i] = &Post{Text: "post"}
+		wg.Add(1)
+		go func(p *Post) {
+			defer wg.Done()
+			if err := b.Create(context.Background(), p); err != nil {
+				t.Error(err)
+			}
+		}(created[i])
+	}
+	wg.Wait()
+
+	seen := make(map[uint64]bool)
+	for _, p := range created {
+		if p.ID == 0 || seen[p.ID] {
+			t.Fatalf("post got id %d, which is either missing or not unique", p.ID)
+		}
+		seen[p.ID] = true
+	}
+	c.assertInOrder(t, posts)
+
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	if len(s.batches) == posts {
+		t.Error("no posts were batched together")
+	}
+	for _, batch := range s.batches {
+		if len(batch) > 50 {
+			t.Errorf("batch of %d posts is over the limit", len(batch))
+		}
+	}
+}
+
+func TestPostBatcherSubmissionOrder(t *testing.T) {
+	s := &fakeStore{}
+	c := &committed{}
+	b := newPostBatcher(zap.NewNop(), 20*time.Millisecond, 100, c.onCommit, s.store)
+
+	first := holdFirstBatch(t, b, s)
+	posts := make([]*Post, 20)
+	for i := range posts {
+		posts[i] = &Post{Text: "post"}
+	}
+	results := queueInOrder(t, b, posts)
+	close(s.hold)
+
+	if err := <-first; err != nil {
+		t.Fatal(err)
+	}
+	for i, result := range results {
+		if err := <-result; err != nil {
+			t.Fatal(err)
+		}
+		if posts[i].ID != uint64(i+2) { // the first one got 1
+			t.Fatalf("post %d got id %d, ids must follow the order the posts were submitted in", i, posts[i].ID)
+		}
+	}
+	c.assertInOrder(t, len(posts)+1)
+
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	if len(s.batches) != 2 {
+		t.Fatalf("the queued posts should have been stored in a single batch, there were %d batches", len(s.batches))
+	}
+}
+
+func TestPostBatcherBadPostFallsBack(t *testing.T) {
+	s := &fakeStore{}
+	c := &committed{}
+	b := newPostBatcher(zap.NewNop(), 20*time.Millisecond, 100, c.onCommit, s.store)
+
+	first := holdFirstBatch(t, b, s)
+	posts := make([]*Post, 10)
+	for i := range posts {
+		posts[i] = &Post{Text: "post"}
+	}
+	posts[4].Text = "bad"
+	results := queueInOrder(t, b, posts)
+	close(s.hold)
+
+	if err := <-first; err != nil {
+		t.Fatal(err)
+	}
+	for i, result := range results {
+		err := <-result
+		if i == 4 {
+			if !errors.Is(err, errBadPost) {
+				t.Fatalf("the bad post should have failed, got %v", err)
+			}
+			if posts[i].ID != 0 {
+				t.Fatal("the bad post got an id")
+			}
+			continue
+		}
+		if err != nil {
+			t.Fatalf("post %d failed along with the bad one: %v", i, err)
+		}
+	}
+	c.assertInOrder(t, len(posts)) // the first one, and all but the bad one
+}
@@ -1,21 +1,103 @@
 package db
 
 import (
+	"context"
 	"database/sql"
 	"fmt"
+	"github.com/jackc/pgx/v5"
+	"github.com/jackc/pgx/v5/stdlib"
 	"gitlab.com/MikeTTh/env"
 	"go.uber.org/zap"
 	"gorm.io/driver/postgres"
 	"gorm.io/gorm"
 	gormlogger "gorm.io/gorm/logger"
 	"moul.io/zapgorm2"
+	"net/url"
+	"regexp"
+	"strings"
 	"time"
 )
 
 var db *gorm.DB
 
+// connectionDSN is the final DSN used for the pool, kept for connections that can not come from it (like the LISTEN one)
+var connectionDSN string
+
+var schemaNameRegex = regexp.MustCompile(`^[a-z_][a-z0-9_]*$`)
+
+// withSearchPath sets the search_path runtime param in the DSN, so every connection in the pool would use the given schema.
+// Both the URL and the keyword/value DSN formats are supported.
+func withSearchPath(dsn, schema string) (string, error) {
+	if strings.HasPrefix(dsn, "postgres://") || strings.HasPrefix(dsn, "postgresql://") {
+		u, err := url.Parse(dsn)
+		if err != nil {
+			return "", err
+		}
+		q := u.Query()
+		q.Set("search_path", schema)
+		u.RawQuery = q.Encode()
+		return u.String(), nil
+	}
+	return dsn + " search_path=" + schema, nil
+}
+
+// dedupeTags merges the duplicate tags created by concurrent posts back when tags had no unique index, otherwise the index could not be created.
+// Every post is moved to the oldest one of its duplicates. A post can not have two of them, as its tags were de-duplicated by name
+func dedupeTags() error {
+	if !db.Migrator().HasTable(&Tag{}) || db.Migrator().HasIndex(&Tag{}, "Tag") {
+		return nil
+	}
+	return db.Transaction(func(tx *gorm.DB) error {
+		duplicates := "SELECT id, min(id) OVER (PARTITION BY tag) AS keep FROM tags"
+		err := tx.Exec("UPDATE post_tags SET tag_id = d.keep FROM (" + duplicates + ") d WHERE post_tags.tag_id = d.id AND d.id <> d.keep").Error
+		if err != nil {
+			return err
+		}
+		return tx.Exec("DELETE FROM tags USING (" + duplicates + ") d WHERE tags.id = d.id AND d.id <> d.keep").Error
+	})
+}
+
+// withPgxConn runs f on a connection from the pool, for things gorm can not do (like COPY or pipelining)
+func withPgxConn(ctx context.Context, f func(conn *pgx.Conn) error) error {
+	sqlDB, err := db.DB()
+	if err != nil {
+		return err
+	}
+
+	conn, err := sqlDB.Conn(ctx)
+	if err != nil {
+		return err
+	}
+	defer conn.Close()
+
+	return conn.Raw(func(driverConn any) error {
+		return f(driverConn.(*stdlib.Conn).Conn())
+	})
+}
+
 func Connect(lgr *zap.Logger) (err error) {
 	dsn := env.String("POSTGRESQL_DSN", "postgresql://localhost/postgres")
+
+	// Using a separate schema allows running multiple isolated instances on a single database (used by the e2e tests)
+	schema := env.String("POSTGRESQL_SCHEMA", "")
+	if schema != "" {
+		if !schemaNameRegex.MatchString(schema) {
+			err = fmt.Errorf("invalid schema name: %s", schema)
+			return
+		}
+		dsn, err = withSearchPath(dsn, schema)
+		if err != nil {
+			return
+		}
+	}
+
+	connectionDSN = dsn
+	newPostChannel = newPostChannelName(schema)
+	instanceID, err = generateInstanceID()
+	if err != nil {
+		return
+	}
+
 	db, err = gorm.Open(postgres.Open(dsn), &gorm.Config{
 		Logger: zapgorm2.Logger{
 			ZapLogger:                 lgr,
@@ -26,7 +108,19 @@ func Connect(lgr *zap.Logger) (err error) {
 			Context:                   nil,
 		},
 		SkipDefaultTransaction: true, // Epic performance improvement
+		// Postgres only stores microseconds, truncating here makes posts kept in memory look the same as the ones loaded from the DB
+		NowFunc: func() time.Time {
+			return time.Now().Truncate(time.Microsecond)
+		},
 	})
+	if err != nil {
+		return
+	}
+
+	err = registerTimingCallbacks(db)
+	if err != nil {
+		return
+	}
 
 	var sqlDB *sql.DB
 	sqlDB, err = db.DB()
@@ -50,10 +144,50 @@ func Connect(lgr *zap.Logger) (err error) {
 	sqlDB.SetMaxIdleConns(maxIdle)
 	sqlDB.SetMaxOpenConns(maxConn)
 
+	if schema != "" {
+		// the schema name is validated above, so it is safe to be used here
+		err = db.Exec(fmt.Sprintf("CREATE SCHEMA IF NOT EXISTS %s", schema)).Error
+		if err != nil {
+			return
+		}
+	}
+
+	err = dedupeTags()
+	if err != nil {
+		return
+	}
+
 	err = db.AutoMigrate(Post{}, Tag{}, Author{})
 	if err != nil {
 		return
 	}
 
+	// The primary key of the join table is (post_id, tag_id), which is no good for finding the posts of a tag in order.
+	// gorm can't be told to create this one, as it creates the join table on its own
+	err = db.Exec("CREATE INDEX IF NOT EXISTS idx_post_tags_tag_id_post_id ON post_tags (tag_id, post_id)").Error
+	if err != nil {
+		return
+	}
+
+	postCacheMaxBytes := env.Int("POST_CACHE_MAX_BYTES", 64*1024*1024)
+	if postCacheMaxBytes < 0 {
+		err = fmt.Errorf("post cache size must not be negative")
+		return
+	}
+	postCache = newPostJSONCache(int64(postCacheMaxBytes))
+
+	err = seedCounters()
+	if err != nil {
+		return
+	}
+	reconcileInterval := env.Int("COUNTER_RECONCILE_INTERVAL", 60)
+	if reconcileInterval < 0 {
+		err = fmt.Errorf("counter reconcile interval must not be negative")
+		return
+	}
+	if reconcileInterval > 0 {
+		go counterReconciler(lgr, time.Duration(reconcileInterval)*time.Second)
+	}
+
 	return
 }
@@ -1,58 +1,236 @@
 package db
 
 import (
+	"context"
 	"fmt"
+	"github.com/jackc/pgx/v5"
+	"github.com/jackc/pgx/v5/pgconn"
+	"github.com/pproj/tutter/timing"
 	"gorm.io/gorm"
+	"time"
 )
 
 var RandomGormError = fmt.Errorf("random gorm error")
 
 // POSTS
 
-func CreatePost(post *Post) error {
+// The statements of creating posts, they are sent in a single pipelined batch, which postgres runs as one implicit transaction.
+// Upserting with ON CONFLICT DO NOTHING never fails because someone else created the same author or tag meanwhile:
+// the insert waits for the other transaction, and the statements after it already see the row the other one committed.
+// New authors and tags are inserted in the same order by everyone, so concurrent inserts waiting for each other can not deadlock
+const (
+	createPostsUpsertAuthorsSQL = `INSERT INTO authors (name) SELECT n FROM unnest($1::text[]) n ORDER BY n ON CONFLICT (name) DO NOTHING`
+	createPostsUpsertTagsSQL    = `INSERT INTO tags (tag) SELECT t FROM unnest($1::text[]) t ORDER BY t ON CONFLICT (tag) DO NOTHING`
+
+	// The ids are taken from the sequence up front and handed out in order, so the posts get their ids in the order they were supplied.
+	// Authors and tags are looked up by name, so nothing has to be read back before the posts are inserted.
+	// The range of the new ids is announced to the other replicas right here (the payload is the same as newPostPayload creates),
+	// the ids are not known when the statements are queued. The notification is only sent if the transaction commits
+	createPostsInsertSQL = `WITH new_ids AS (
+	SELECT nextval(pg_get_serial_sequence('posts', 'id')) AS id FROM generate_series(1, $1::int)
+), numbered_ids AS (
+	SELECT id, row_number() OVER (ORDER BY id) AS ord FROM new_ids
+), new_posts AS (
+	INSERT INTO posts (id, created_at, text, author_id)
+	SELECT numbered_ids.id, input.created_at, input.text, authors.id
+	FROM unnest($2::timestamptz[], $3::text[], $4::text[]) WITH ORDINALITY AS input(created_at, text, author, ord)
+	JOIN numbered_ids ON numbered_ids.ord = input.ord
+	JOIN authors ON authors.name = input.author
+	RETURNING id, author_id
+), new_post_tags AS (
+	INSERT INTO post_tags (post_id, tag_id)
+	SELECT numbered_ids.id, tags.id
+	FROM unnest($5::bigint[], $6::text[]) AS input(ord, tag)
+	JOIN numbered_ids ON numbered_ids.ord = input.ord
+	JOIN tags ON tags.tag = input.tag
+), notified AS (
+	SELECT pg_notify($7, $8::text || min(id) || '-' || max(id)) FROM new_posts
+)
+SELECT new_posts.id, new_posts.author_id FROM numbered_ids JOIN new_posts ON new_posts.id = numbered_ids.id CROSS JOIN notified ORDER BY numbered_ids.ord`
 
-	return db.Transaction(func(tx *gorm.DB) error {
+	createPostsSelectAuthorsSQL = `SELECT id, name, first_seen FROM authors WHERE name = ANY($1::text[])`
+	createPostsSelectTagsSQL    = `SELECT id, tag, first_seen, trending FROM tags WHERE tag = ANY($1::text[])`
+)
 
-		result := tx.Where(post.Author).First(post.Author) // This looks cursed
+// CreatePost stores the post along with its author and tags (creating them if needed), then fills in the ids and the rest of their columns.
+// It's a single round trip no matter how many tags the post has
+func CreatePost(ctx context.Context, post *Post) error {
+	return createPosts(ctx, []*Post{post})
+}
 
-		if result.Error == gorm.ErrRecordNotFound {
-			innerResult := tx.Create(post.Author)
+// createPosts is CreatePost for many posts at once, in a single transaction. The posts get their ids in the order they are in the slice
+func createPosts(ctx context.Context, posts []*Post) error {
+	createdAt := db.NowFunc()
+
+	// the columns of the posts and their tags, to be unnested into rows
+	texts := make([]string, len(posts))
+	authorNames := make([]string, len(posts))
+	createdAts := make([]time.Time, len(posts))
+	var postTagOrds []int64
+	var postTagNames []string
+
+	authorsByName := make(map[string][]*Author)
+	tagsByName := make(map[string][]*Tag)
+	for i, post := range posts {
+		post.CreatedAt = createdAt
+		texts[i] = post.Text
+		authorNames[i] = post.Author.Name
+		createdAts[i] = post.CreatedAt
+		authorsByName[post.Author.Name] = append(authorsByName[post.Author.Name], post.Author)
+		for _, tag := range post.Tags {
+			postTagOrds = append(postTagOrds, int64(i+1)) // ordinality starts from 1
+			postTagNames = append(postTagNames, tag.Tag)
+			tagsByName[tag.Tag] = append(tagsByName[tag.Tag], tag)
+		}
+	}
+	distinctAuthors := make([]string, 0, len(authorsByName))
+	for name := range authorsByName {
+		distinctAuthors = append(distinctAuthors, name)
+	}
+	distinctTags := make([]string, 0, len(tagsByName))
+	for name := range tagsByName {
+		distinctTags = append(distinctTags, name)
+	}
 
-			if innerResult.Error != nil {
-				return innerResult.Error
+	var newAuthors, newTags int64
+	batch := &pgx.Batch{}
+	batch.Queue(createPostsUpsertAuthorsSQL, distinctAuthors).Exec(func(ct pgconn.CommandTag) error {
+		newAuthors = ct.RowsAffected()
+		return nil
+	})
+	if len(distinctTags) > 0 {
+		batch.Queue(createPostsUpsertTagsSQL, distinctTags).Exec(func(ct pgconn.CommandTag) error {
+			newTags = ct.RowsAffected()
+			return nil
+		})
+	}
+	batch.Queue(createPostsInsertSQL, len(posts), createdAts, texts, authorNames, postTagOrds, postTagNames, newPostChannel, instanceID+":").Query(func(rows pgx.Rows) error {
+		i := 0
+		for rows.Next() {
+			if i >= len(posts) {
+				return fmt.Errorf("more posts were inserted than supplied")
 			}
-
-		} else if result.Error != nil {
-			return result.Error
+			err := rows.Scan(&posts[i].ID, &posts[i].AuthorID)
+			if err != nil {
+				return err
+			}
+			i++
 		}
-
-		for _, tag := range post.Tags {
-			result = tx.Where(tag).First(tag) // the cursedness increases
-			if result.Error == gorm.ErrRecordNotFound {
-				innerResult := tx.Create(tag)
-				if innerResult.Error != nil {
-					return innerResult.Error
-				}
-			} else if result.Error != nil {
-				return result.Error
+		if rows.Err() == nil && i != len(posts) {
+			return fmt.Errorf("only %d posts were inserted out of %d", i, len(posts)) // should not happen, the authors were just created
+		}
+		return rows.Err()
+	})
+	batch.Queue(createPostsSelectAuthorsSQL, distinctAuthors).Query(func(rows pgx.Rows) error {
+		for rows.Next() {
+			var stored Author
+			err := rows.Scan(&stored.ID, &stored.Name, &stored.FirstSeen)
+			if err != nil {
+				return err
+			}
+			for _, author := range authorsByName[stored.Name] {
+				author.ID, author.FirstSeen = stored.ID, stored.FirstSeen
 			}
 		}
+		return rows.Err()
+	})
+	if len(distinctTags) > 0 {
+		batch.Queue(createPostsSelectTagsSQL, distinctTags).Query(func(rows pgx.Rows) error {
+			for rows.Next() {
+				var stored Tag
+				err := rows.Scan(&stored.ID, &stored.Tag, &stored.FirstSeen, &stored.Trending)
+				if err != nil {
+					return err
+				}
+				for _, tag := range tagsByName[stored.Tag] {
+					tag.ID, tag.FirstSeen, tag.Trending = stored.ID, stored.FirstSeen, stored.Trending
+				}
+			}
+			return rows.Err()
+		})
+	}
 
-		result = tx.Create(post)
-		return result.Error
+	started := time.Now()
+	err := withPgxConn(ctx, func(conn *pgx.Conn) error {
+		return conn.SendBatch(ctx, batch).Close() // runs the callbacks above, and returns the first error
 	})
+	timing.FromContext(ctx).AddRoundTrip("posts", time.Since(started))
+	if err != nil {
+		return err
+	}
 
+	// only count things that are actually committed
+	addToCounters(int64(len(posts)), newAuthors, newTags)
+	return nil
 }
 
-func GetPosts(filter *PostFilterParams) (*[]Post, error) {
-	var posts []Post
-	result := filter.Apply(db).Find(&posts)
-	if result.Error != nil {
-		return nil, result.Error
+func GetPosts(ctx context.Context, filter *PostFilterParams) (*[]Post, error) {
+	posts, err := findPosts(filter.Apply(db.WithContext(ctx)), true)
+	if err != nil {
+		return nil, err
 	}
 	return &posts, nil
 }
 
+// GetPostsPage is GetPosts with keyset pagination: if there's a limit (or a cursor), the cursors of the neighbouring pages are returned too
+func GetPostsPage(ctx context.Context, filter *PostFilterParams) (*[]Post, Page, error) {
+	c, err := filter.pageCursor()
+	if err != nil {
+		return nil, Page{}, err
+	}
+	if c == nil {
+		posts, err := GetPosts(ctx, filter)
+		return posts, Page{}, err
+	}
+
+	chain := c.Filters.applyFilters(db.WithContext(ctx))
+	skipped := filter.Cursor == nil && filter.Offset != nil && *filter.Offset > 0
+	if skipped { // the first page may still be offset
+		chain = chain.Offset(intConv(*filter.Offset))
+	}
+
+	posts, err := findPosts(c.seek(chain), true)
+	if err != nil {
+		return nil, Page{}, err
+	}
+
+	posts, page := finishPage(*c, posts, postID, skipped)
+	return &posts, page, nil
+}
+
+// StreamPosts lists the posts matching an unbounded filter (see PostFilterParams.Unbounded) chunk by chunk, calling emit with each chunk,
+// so the whole listing never has to be in memory at once. Every chunk is a keyset seek from the last post of the previous one,
+// so the last chunk is just as cheap as the first
+func StreamPosts(ctx context.Context, filter *PostFilterParams, chunkSize uint, emit func(posts []Post) error) error {
+	order := filter.effectiveOrder()
+	if order == "" {
+		order = FilterParamOrderAscending // chunks must be in some order, otherwise they could overlap
+	}
+	c := pageCursor{Order: order, Limit: chunkSize}
+
+	for {
+		posts, err := findPosts(c.seek(filter.applyFilters(db.WithContext(ctx))), true)
+		if err != nil {
+			return err
+		}
+
+		more := uint(len(posts)) > chunkSize // seek fetches one more
+		if more {
+			posts = posts[:chunkSize]
+		}
+		if len(posts) != 0 {
+			err = emit(posts)
+			if err != nil {
+				return err
+			}
+		}
+		if !more {
+			return nil
+		}
+		c.ID = posts[len(posts)-1].ID
+	}
+}
+
 func GetAllPostsAfterId(id uint64) (*[]Post, error) {
 	var allPosts []Post
 	result := db.Preload("Author").Preload("Tags").Where("id > ?", id).Find(&allPosts)
@@ -62,9 +240,9 @@ func GetAllPostsAfterId(id uint64) (*[]Post, error) {
 	return &allPosts, nil
 }
 
-func GetPostById(id uint64) (*Post, error) {
+func GetPostById(ctx context.Context, id uint64) (*Post, error) {
 	var post Post
-	result := db.Preload("Author").Preload("Tags").First(&post, id)
+	result := db.WithContext(ctx).Preload("Author").Preload("Tags").First(&post, id)
 	if result.Error != nil {
 		return nil, result.Error
 	}
@@ -78,6 +256,17 @@ func GetPostById(id uint64) (*Post, error) {
 	return &post, nil
 }
 
+// GetPostIds returns the ids of the posts after afterID up to untilID, in order. Those in between that are missing were either
+// never committed, or are not committed yet
+func GetPostIds(ctx context.Context, afterID, untilID uint64) ([]uint64, error) {
+	var ids []uint64
+	result := db.WithContext(ctx).Model(&Post{}).Where("id > ? AND id <= ?", afterID, untilID).Order("id").Pluck("id", &ids)
+	if result.Error != nil {
+		return nil, result.Error
+	}
+	return ids, nil
+}
+
 // GetLastPostId returns the id of the last post or 0 if no posts were published yet (post id starts with 1)
 func GetLastPostId() (uint64, error) {
 	var maxid *uint64
@@ -103,9 +292,10 @@ func GetLastPostId() (uint64, error) {
 }
 
 // GetLastPost returns the last post or error gorm.ErrRecordNotFound if no posts were published yet
+// The author and tags are loaded too, as this is what the observer is notified with, which needs them for filtering
 func GetLastPost() (*Post, error) {
 	var post Post
-	result := db.Order("id DESC").First(&post)
+	result := db.Preload("Author").Preload("Tags").Order("id DESC").First(&post)
 	if result.Error != nil {
 		return nil, result.Error
 	}
@@ -126,9 +316,9 @@ func GetPostCount() (int64, error) {
 
 // AUTHORS
 
-func GetAuthors(filter *AuthorFilterParams) (*[]Author, error) {
+func GetAuthors(ctx context.Context, filter *AuthorFilterParams) (*[]Author, error) {
 	var authors []Author
-	result := filter.Apply(db).Find(&authors)
+	result := filter.Apply(db.WithContext(ctx)).Find(&authors)
 	if result.Error != nil {
 		return nil, result.Error
 	}
@@ -144,20 +334,37 @@ func GetAllAuthors() (*[]Author, error) {
 	return &authors, nil
 }
 
-func GetAuthorById(id uint, filter *AuthorFillFilterParams) (*Author, error) {
+func GetAuthorById(ctx context.Context, id uint, filter *AuthorFillFilterParams) (*Author, Page, error) {
+	c, err := filter.pageCursor(fmt.Sprintf("author:%d", id))
+	if err != nil {
+		return nil, Page{}, err
+	}
+
 	var author Author
-	result := filter.Apply(db).Find(&author, id)
+	result := db.WithContext(ctx).Find(&author, id)
 	if result.Error != nil {
-		return nil, result.Error
+		return nil, Page{}, result.Error
 	}
 	if result.RowsAffected == 0 {
-		return nil, gorm.ErrRecordNotFound
+		return nil, Page{}, gorm.ErrRecordNotFound
 	}
 	if author.ID != id {
 		// I can't believe I have to do this...
-		return nil, RandomGormError
+		return nil, Page{}, RandomGormError
 	}
-	return &author, nil
+
+	var page Page
+	if filter.IsFill() {
+		posts, err := findPosts(filter.Apply(db.WithContext(ctx), author.ID, c), false)
+		if err != nil {
+			return nil, Page{}, err
+		}
+		if c != nil {
+			posts, page = finishPage(*c, posts, postID, filter.offsetUsed())
+		}
+		author.Posts = postPtrs(posts)
+	}
+	return &author, page, nil
 }
 
 func GetAuthorCount() (int64, error) {
@@ -171,9 +378,9 @@ func GetAuthorCount() (int64, error) {
 
 // TAGS
 
-func GetTags(filter *CommonPaginationParams) (*[]Tag, error) {
+func GetTags(ctx context.Context, filter *CommonPaginationParams) (*[]Tag, error) {
 	var tags []Tag
-	result := filter.Apply(db).Find(&tags)
+	result := filter.Apply(db.WithContext(ctx)).Find(&tags)
 	if result.Error != nil {
 		return nil, result.Error
 	}
@@ -198,25 +405,42 @@ func GetTagCount() (int64, error) {
 	return count, nil
 }
 
-func GetTagByTag(tagStr string, filter *TagFillFilterParams) (*Tag, error) {
+func GetTagByTag(ctx context.Context, tagStr string, filter *TagFillFilterParams) (*Tag, Page, error) {
+	c, err := filter.pageCursor("tag:" + tagStr)
+	if err != nil {
+		return nil, Page{}, err
+	}
+
 	var tag Tag
-	result := filter.Apply(db.Where("tag = ?", tagStr)).First(&tag)
+	result := db.WithContext(ctx).Where("tag = ?", tagStr).First(&tag)
 	if result.Error != nil {
-		return nil, result.Error
+		return nil, Page{}, result.Error
 	}
 	if result.RowsAffected == 0 {
-		return nil, gorm.ErrRecordNotFound
+		return nil, Page{}, gorm.ErrRecordNotFound
 	}
 	if tag.Tag != tagStr {
 		// I can't believe I have to do this...
-		return nil, RandomGormError
+		return nil, Page{}, RandomGormError
+	}
+
+	var page Page
+	if filter.IsFill() {
+		posts, err := findPosts(filter.Apply(db.WithContext(ctx), tag.ID, c), true)
+		if err != nil {
+			return nil, Page{}, err
+		}
+		if c != nil {
+			posts, page = finishPage(*c, posts, postID, filter.offsetUsed())
+		}
+		tag.Posts = postPtrs(posts)
 	}
-	return &tag, nil
+	return &tag, page, nil
 }
 
-func GetTrendingTags() (*[]Tag, error) {
+func GetTrendingTags(ctx context.Context) (*[]Tag, error) {
 	var tags []Tag
-	result := db.Where("trending = true").Find(&tags)
+	result := db.WithContext(ctx).Where("trending = true").Find(&tags)
 	if result.Error != nil {
 		return nil, result.Error
 	}
@@ -230,6 +454,8 @@ func CleanUpEverything() {
 	db.Exec("TRUNCATE TABLE posts RESTART IDENTITY CASCADE;")
 	db.Exec("TRUNCATE TABLE authors RESTART IDENTITY CASCADE;")
 	db.Exec("TRUNCATE TABLE tags RESTART IDENTITY CASCADE;")
+	resetCounters()
+	postCache.clear() // ids start from 1 again
 }
 
 func SetTrendingTag(tag string, trending bool) error {
@@ -0,0 +1,108 @@
+package db
+
+import (
+	"go.uber.org/zap"
+	"sync/atomic"
+	"time"
+)
+
+// Counting the rows with COUNT(*) is a full table scan, doing that on every Prometheus scrape is not something we want with millions of posts.
+// Instead, these counters are seeded once at startup, incremented as things are inserted, and periodically reconciled with the estimates of Postgres.
+// When running in multiple replicas each one of them only sees its own inserts, the reconciliation makes up for the rest.
+var (
+	postCounter   atomic.Int64
+	authorCounter atomic.Int64
+	tagCounter    atomic.Int64
+)
+
+func PostCount() int64 {
+	return postCounter.Load()
+}
+
+func AuthorCount() int64 {
+	return authorCounter.Load()
+}
+
+func TagCount() int64 {
+	return tagCounter.Load()
+}
+
+func addToCounters(posts, authors, tags int64) {
+	postCounter.Add(posts)
+	authorCounter.Add(authors)
+	tagCounter.Add(tags)
+}
+
+func resetCounters() {
+	postCounter.Store(0)
+	authorCounter.Store(0)
+	tagCounter.Store(0)
+}
+
+// seedCounters does the exact (expensive) counting, this is only done once at startup
+func seedCounters() error {
+	posts, err := GetPostCount()
+	if err != nil {
+		return err
+	}
+	authors, err := GetAuthorCount()
+	if err != nil {
+		return err
+	}
+	tags, err := GetTagCount()
+	if err != nil {
+		return err
+	}
+	postCounter.Store(posts)
+	authorCounter.Store(authors)
+	tagCounter.Store(tags)
+	return nil
+}
+
+// raiseTo sets the counter to the given value if that's larger. Row estimates of other replicas' inserts only make the count grow,
+// and our own inserts are already counted, so a smaller estimate is just the statistics lagging behind
+func raiseTo(counter *atomic.Int64, estimate int64) {
+	for {
+		current := counter.Load()
+		if estimate <= current || counter.CompareAndSwap(current, estimate) {
+			return
+		}
+	}
+}
+
+// reconcileCounters reads the live row estimates from the statistics collector, which is basically free compared to COUNT(*)
+func reconcileCounters() error {
+	type estimate struct {
+		Relname  string
+		NLiveTup int64
+	}
+	var estimates []estimate
+	result := db.Raw(
+		"SELECT relname, n_live_tup FROM pg_stat_user_tables WHERE schemaname = current_schema() AND relname IN ('posts', 'authors', 'tags')",
+	).Scan(&estimates)
+	if result.Error != nil {
+		return result.Error
+	}
+
+	for _, e := range estimates {
+		switch e.Relname {
+		case "posts":
+			raiseTo(&postCounter, e.NLiveTup)
+		case "authors":
+			raiseTo(&authorCounter, e.NLiveTup)
+		case "tags":
+			raiseTo(&tagCounter, e.NLiveTup)
+		}
+	}
+	return nil
+}
+
+func counterReconciler(logger *zap.Logger, interval time.Duration) {
+	for {
+		time.Sleep(interval)
+		err := reconcileCounters()
+		if err != nil {
+			logger.Warn("Error while reconciling entity counters", zap.Error(err))
+		}
+	}
+}
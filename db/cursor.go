@@ -0,0 +1,136 @@
+package db
+
+import (
+	"encoding/base64"
+	"encoding/json"
+	"errors"
+	"fmt"
+
+	"gorm.io/gorm"
+)
+
+// ErrInvalidCursor is returned (wrapped) for cursors that could not be decoded, or that were given out for a different listing
+var ErrInvalidCursor = errors.New("invalid cursor")
+
+// Page holds the cursors of the pages next to the one returned, an empty string means there's no such page (as far as we know)
+type Page struct {
+	Next string
+	Prev string
+}
+
+// pageCursor is where a page starts. Instead of having postgres count through all the rows skipped by an offset,
+// the next page is looked up by seeking to the id after the last one seen, which is a simple index lookup.
+// The filters of the listing are in the cursor too, so the client only has to hand back the token
+type pageCursor struct {
+	Order    string            `json:"o"`
+	ID       uint64            `json:"i,omitempty"` // 0 means from the start of the listing, post ids start from 1
+	Backward bool              `json:"b,omitempty"` // the page ends before ID instead of starting after it
+	Limit    uint              `json:"l"`
+	Scope    string            `json:"s,omitempty"` // which tag or author the cursor belongs to, when paginating fills
+	Filters  *PostFilterParams `json:"f,omitempty"`
+}
+
+func encodeCursor(c pageCursor) string {
+	data, err := json.Marshal(c)
+	if err != nil {
+		panic(err) // there's nothing in the struct that could fail to marshal
+	}
+	return base64.RawURLEncoding.EncodeToString(data)
+}
+
+// decodeCursor decodes a token handed out by encodeCursor, and makes sure it belongs to the listing it's used with
+func decodeCursor(token, scope string) (pageCursor, error) {
+	var c pageCursor
+	data, err := base64.RawURLEncoding.DecodeString(token)
+	if err != nil {
+		return c, fmt.Errorf("%w: %s", ErrInvalidCursor, err.Error())
+	}
+	err = json.Unmarshal(data, &c)
+	if err != nil {
+		return c, fmt.Errorf("%w: %s", ErrInvalidCursor, err.Error())
+	}
+	if c.Order != FilterParamOrderAscending && c.Order != FilterParamOrderDescending {
+		return c, fmt.Errorf("%w: unknown order", ErrInvalidCursor)
+	}
+	if c.Limit == 0 {
+		return c, fmt.Errorf("%w: limit 0 makes no sense", ErrInvalidCursor)
+	}
+	if c.Scope != scope {
+		return c, fmt.Errorf("%w: cursor belongs to a different listing", ErrInvalidCursor)
+	}
+	return c, nil
+}
+
+// direction is the order the rows have to be fetched in, backward pages are fetched in reverse and flipped afterward
+func (c pageCursor) direction() string {
+	if c.Backward == (c.Order == FilterParamOrderAscending) {
+		return FilterParamOrderDescending
+	}
+	return FilterParamOrderAscending
+}
+
+// seek applies the keyset condition, the ordering and the limit to a query on posts.
+// One more row is fetched than the limit, so we know if there's anything after the page without counting
+func (c pageCursor) seek(chain *gorm.DB) *gorm.DB {
+	if c.direction() == FilterParamOrderAscending {
+		if c.ID != 0 {
+			chain = chain.Where("posts.id > ?", c.ID)
+		}
+		chain = chain.Order("posts.id ASC")
+	} else {
+		if c.ID != 0 {
+			chain = chain.Where("posts.id < ?", c.ID)
+		}
+		chain = chain.Order("posts.id DESC")
+	}
+	return chain.Limit(intConv(c.Limit) + 1)
+}
+
+// finishPage trims the extra row fetched by seek, puts backward pages in order, and creates the cursors of the neighbouring pages.
+// skipped tells if the first page was requested with an offset, so there are posts before it
+func finishPage[T any](c pageCursor, items []T, idOf func(T) uint64, skipped bool) ([]T, Page) {
+	hasMore := uint(len(items)) > c.Limit
+	if hasMore {
+		items = items[:c.Limit]
+	}
+
+	var page Page
+	if len(items) == 0 {
+		return items, page
+	}
+
+	if c.Backward {
+		for i, j := 0, len(items)-1; i < j; i, j = i+1, j-1 {
+			items[i], items[j] = items[j], items[i]
+		}
+	}
+
+	next := c
+	next.Backward = false
+	next.ID = idOf(items[len(items)-1])
+
+	prev := c
+	prev.Backward = true
+	prev.ID = idOf(items[0])
+
+	if c.Backward {
+		// we came here from the next page, so that one surely exists
+		page.Next = encodeCursor(next)
+		if hasMore {
+			page.Prev = encodeCursor(prev)
+		}
+	} else {
+		if hasMore {
+			page.Next = encodeCursor(next)
+		}
+		if c.ID != 0 || skipped {
+			page.Prev = encodeCursor(prev)
+		}
+	}
+
+	return items, page
+}
+
+func postID(p Post) uint64 {
+	return p.ID
+}
@@ -1,6 +1,7 @@
 package db
 
 import (
+	"encoding/base64"
 	"fmt"
 	"math"
 	"time"
@@ -19,14 +20,16 @@ type CommonPaginationParams struct {
 	Order  *string `form:"order"`
 }
 
+// PostFilterParams are also stored in cursors (without pagination), hence the json tags
 type PostFilterParams struct {
-	CommonPaginationParams
-	BeforeId *uint64    `form:"before_id"`
-	AfterId  *uint64    `form:"after_id"`
-	Before   *time.Time `form:"before"`
-	After    *time.Time `form:"after"`
-	Tags     []string   `form:"tag"`
-	Authors  []uint     `form:"author_id"`
+	CommonPaginationParams `json:"-"`
+	BeforeId               *uint64    `form:"before_id" json:"bi,omitempty"`
+	AfterId                *uint64    `form:"after_id" json:"ai,omitempty"`
+	Before                 *time.Time `form:"before" json:"bt,omitempty"`
+	After                  *time.Time `form:"after" json:"at,omitempty"`
+	Tags                   []string   `form:"tag" json:"t,omitempty"`
+	Authors                []uint     `form:"author_id" json:"a,omitempty"`
+	Cursor                 *string    `form:"cursor" json:"-"`
 }
 
 type AuthorFilterParams struct {
@@ -36,7 +39,8 @@ type AuthorFilterParams struct {
 
 type fillFilterParams struct {
 	CommonPaginationParams
-	Fill *bool `form:"fill"`
+	Fill   *bool   `form:"fill"`
+	Cursor *string `form:"cursor"`
 }
 
 type TagFillFilterParams struct {
@@ -94,6 +98,21 @@ func (p CommonPaginationParams) Apply(chain *gorm.DB) *gorm.DB {
 	return chain
 }
 
+// applyToPosts is Apply for queries run by findPosts, the ordering column must be qualified, as the authors are joined
+func (p CommonPaginationParams) applyToPosts(chain *gorm.DB) *gorm.DB {
+	if p.Order != nil {
+		switch *p.Order {
+		case FilterParamOrderAscending:
+			chain = chain.Order("posts.id ASC")
+		case FilterParamOrderDescending:
+			chain = chain.Order("posts.id DESC")
+		}
+	}
+	pagination := p
+	pagination.Order = nil // already done
+	return pagination.Apply(chain)
+}
+
 // PostFilterParams
 
 func (p PostFilterParams) Validate() error {
@@ -129,57 +148,109 @@ func (p PostFilterParams) Validate() error {
 		}
 	}
 
+	if p.Cursor != nil {
+		// The cursor already holds the filters and the ordering of the listing, only the page size may be changed
+		if p.Offset != nil || p.Order != nil || p.BeforeId != nil || p.AfterId != nil || p.Before != nil || p.After != nil || len(p.Tags) != 0 || len(p.Authors) != 0 {
+			return fmt.Errorf("cursor can only be combined with limit")
+		}
+		_, err = decodeCursor(*p.Cursor, "")
+		if err != nil {
+			return err
+		}
+	}
+
 	return nil
 }
 
-func (p PostFilterParams) Apply(chain *gorm.DB) *gorm.DB {
-	chain = chain.Preload("Tags", func(subChain *gorm.DB) *gorm.DB {
-		return subChain.Omit("FirstSeen") // These cols would be omitted by the json serializer anyway
-		// note: ID can not be omitted otherwise the join would fail
-	})
+// effectiveOrder returns the explicit or implicit ordering of the listing, or an empty string if it's not ordered at all
+func (p PostFilterParams) effectiveOrder() string {
+	if p.Order != nil {
+		return *p.Order
+	}
+	afterUsed := p.AfterId != nil || p.After != nil
+	beforeUsed := p.BeforeId != nil || p.Before != nil
+	if afterUsed && !beforeUsed {
+		return FilterParamOrderAscending
+	} else if !afterUsed && beforeUsed {
+		return FilterParamOrderDescending
+	}
+	return ""
+}
+
+// pageCursor returns where the requested page starts, or nil if there's no limit, so the listing isn't paginated at all
+func (p PostFilterParams) pageCursor() (*pageCursor, error) {
+	if p.Cursor != nil {
+		c, err := decodeCursor(*p.Cursor, "")
+		if err != nil {
+			return nil, err
+		}
+		if p.Limit != nil {
+			c.Limit = *p.Limit
+		}
+		if c.Filters == nil {
+			c.Filters = &PostFilterParams{}
+		}
+		return &c, nil
+	}
+
+	if p.Limit == nil {
+		return nil, nil
+	}
 
-	// these must be the first ones
+	order := p.effectiveOrder()
+	if order == "" {
+		order = FilterParamOrderAscending // pages must be in some order, otherwise they could overlap
+	}
+	filters := p
+	filters.CommonPaginationParams = CommonPaginationParams{}
+	return &pageCursor{
+		Order:   order,
+		Limit:   *p.Limit,
+		Filters: &filters,
+	}, nil
+}
+
+// Unbounded tells if the whole listing is requested (no limit, cursor or offset), which may be arbitrarily big
+func (p PostFilterParams) Unbounded() bool {
+	return p.Limit == nil && p.Cursor == nil && (p.Offset == nil || *p.Offset == 0)
+}
+
+// applyFilters applies everything but the ordering and pagination. The chain is expected to be run by findPosts
+func (p PostFilterParams) applyFilters(chain *gorm.DB) *gorm.DB {
 	if p.Tags != nil && len(p.Tags) != 0 {
-		// https://github.com/go-gorm/gorm/issues/3287#issuecomment-908893840
-		chain = chain.Joins("JOIN post_tags on post_tags.post_id = posts.id JOIN tags on post_tags.tag_id = tags.id AND tags.tag in ? ", p.Tags).Group("posts.id")
+		// EXISTS instead of joining the tags, so there's no need to group the rows back together afterward
+		chain = chain.Where("EXISTS (SELECT 1 FROM post_tags filter_post_tags JOIN tags filter_tags ON filter_tags.id = filter_post_tags.tag_id "+
+			"WHERE filter_post_tags.post_id = posts.id AND filter_tags.tag IN ?)", p.Tags)
 	}
 
 	if p.Authors != nil && len(p.Authors) != 0 {
-		chain = chain.Where("author_id IN (?)", p.Authors)
+		chain = chain.Where("posts.author_id IN (?)", p.Authors)
 	}
-	chain = chain.Preload("Author")
 
 	// and then these filters
-	var afterUsed bool
 	if p.AfterId != nil {
 		chain = chain.Where("posts.id > ?", *p.AfterId)
-		afterUsed = true
 	} else if p.After != nil {
 		chain = chain.Where("posts.created_at > ?", *p.After)
-		afterUsed = true
 	}
 
-	var beforeUsed bool
 	if p.BeforeId != nil {
 		chain = chain.Where("posts.id < ?", *p.BeforeId)
-		beforeUsed = true
 	} else if p.Before != nil {
 		chain = chain.Where("posts.created_at < ?", *p.Before)
-		beforeUsed = true
 	}
 
-	// implicit ordering
+	return chain
+}
 
-	if p.Order == nil {
-		if afterUsed && !beforeUsed {
-			chain = chain.Order("id ASC")
-		} else if !afterUsed && beforeUsed {
-			chain = chain.Order("id DESC")
-		}
-	}
+func (p PostFilterParams) Apply(chain *gorm.DB) *gorm.DB {
+	chain = p.applyFilters(chain)
 
-	// and then these
-	return p.CommonPaginationParams.Apply(chain)
+	// explicit or implicit ordering
+	order := p.effectiveOrder()
+	pagination := p.CommonPaginationParams
+	pagination.Order = &order
+	return pagination.applyToPosts(chain)
 }
 
 // AuthorFilterParams
@@ -217,11 +288,22 @@ func (p fillFilterParams) Validate() error {
 
 	if !p.IsFill() {
 		// if fill is disabled no params should be allowed
-		if p.Limit != nil || p.Offset != nil || p.Order != nil {
+		if p.Limit != nil || p.Offset != nil || p.Order != nil || p.Cursor != nil {
 			return fmt.Errorf("using any pagination params while fill is disabled makes no sense")
 		}
 	}
 
+	if p.Cursor != nil {
+		if p.Offset != nil || p.Order != nil {
+			return fmt.Errorf("cursor can only be combined with limit")
+		}
+		// the scope is checked once we know what is being filled
+		_, err := base64.RawURLEncoding.DecodeString(*p.Cursor)
+		if err != nil {
+			return fmt.Errorf("%w: %s", ErrInvalidCursor, err.Error())
+		}
+	}
+
 	return p.CommonPaginationParams.Validate()
 }
 
@@ -229,24 +311,66 @@ func (p fillFilterParams) IsFill() bool { // Default is true
 	return p.Fill == nil || *p.Fill == true
 }
 
-// TagFillFilterParams
+// pageCursor returns where the requested page of posts starts, or nil if there's no limit. The scope tells which tag or author is being filled
+func (p fillFilterParams) pageCursor(scope string) (*pageCursor, error) {
+	if !p.IsFill() {
+		return nil, nil
+	}
+
+	if p.Cursor != nil {
+		c, err := decodeCursor(*p.Cursor, scope)
+		if err != nil {
+			return nil, err
+		}
+		if p.Limit != nil {
+			c.Limit = *p.Limit
+		}
+		return &c, nil
+	}
 
-func (p TagFillFilterParams) Apply(chain *gorm.DB) *gorm.DB {
-	if p.IsFill() {
-		chain = chain.Preload("Posts", func(subChain *gorm.DB) *gorm.DB {
-			return p.CommonPaginationParams.Apply(subChain)
-		}).Preload("Posts.Author").Preload("Posts.Tags")
+	if p.Limit == nil {
+		return nil, nil
 	}
-	return chain
+
+	order := FilterParamOrderAscending
+	if p.Order != nil {
+		order = *p.Order
+	}
+	return &pageCursor{
+		Order: order,
+		Limit: *p.Limit,
+		Scope: scope,
+	}, nil
 }
 
-// AuthorFillFilterParams
+// offsetUsed tells if the first page was requested with an offset, which means there are posts before it
+func (p fillFilterParams) offsetUsed() bool {
+	return p.Cursor == nil && p.Offset != nil && *p.Offset > 0
+}
 
-func (p AuthorFillFilterParams) Apply(chain *gorm.DB) *gorm.DB {
-	if p.IsFill() {
-		chain = chain.Preload("Posts", func(subChain *gorm.DB) *gorm.DB {
-			return p.CommonPaginationParams.Apply(subChain)
-		}).Preload("Posts.Tags")
+// applyPosts paginates the posts, either by the cursor or the plain old way if there's none
+func (p fillFilterParams) applyPosts(chain *gorm.DB, c *pageCursor) *gorm.DB {
+	if c == nil {
+		return p.CommonPaginationParams.applyToPosts(chain)
 	}
-	return chain
+	if p.offsetUsed() { // the first page may still be offset
+		chain = chain.Offset(intConv(*p.Offset))
+	}
+	return c.seek(chain)
+}
+
+// TagFillFilterParams
+
+// Apply filters a query of posts (run by findPosts) to the posts of the tag. A page of them is a seek on the (tag_id, post_id) index of the join table
+func (p TagFillFilterParams) Apply(chain *gorm.DB, tagID uint, c *pageCursor) *gorm.DB {
+	chain = chain.Joins("JOIN post_tags ON post_tags.post_id = posts.id AND post_tags.tag_id = ?", tagID)
+	return p.applyPosts(chain, c)
+}
+
+// AuthorFillFilterParams
+
+// Apply filters a query of posts (run by findPosts) to the posts of the author
+func (p AuthorFillFilterParams) Apply(chain *gorm.DB, authorID uint, c *pageCursor) *gorm.DB {
+	chain = chain.Where("posts.author_id = ?", authorID)
+	return p.applyPosts(chain, c)
 }
@@ -0,0 +1,120 @@
+package db
+
+import (
+	"context"
+	"crypto/rand"
+	"encoding/hex"
+	"fmt"
+	"github.com/jackc/pgx/v5"
+	"go.uber.org/zap"
+	"strconv"
+	"strings"
+	"time"
+)
+
+// New posts are announced with pg_notify, so that every replica can wake up its long pollers right away.
+// Notifications are database wide, so the channel is namespaced by the schema, instances on different schemas should not hear each other.
+const newPostChannelPrefix = "tutter_new_post"
+
+var (
+	newPostChannel string
+	instanceID     string // to recognize our own notifications
+)
+
+func newPostChannelName(schema string) string {
+	if schema == "" {
+		return newPostChannelPrefix
+	}
+	return newPostChannelPrefix + "_" + schema
+}
+
+func generateInstanceID() (string, error) {
+	b := make([]byte, 8)
+	_, err := rand.Read(b)
+	if err != nil {
+		return "", err
+	}
+	return hex.EncodeToString(b), nil
+}
+
+// newPostPayload announces the posts between firstID and lastID (both included) committed in a single transaction.
+// Every id is in there, so even if the transaction commits after one with higher ids, the others know what to look up
+func newPostPayload(firstID, lastID uint64) string {
+	return instanceID + ":" + strconv.FormatUint(firstID, 10) + "-" + strconv.FormatUint(lastID, 10)
+}
+
+// parseNewPostPayload returns the range of post ids from a notification, ok is false for our own or for malformed notifications.
+// A single id (sent by older versions) is a range of one
+func parseNewPostPayload(payload string) (firstID, lastID uint64, ok bool) {
+	sender, ids, found := strings.Cut(payload, ":")
+	if !found || sender == instanceID {
+		return 0, 0, false
+	}
+	first, last, isRange := strings.Cut(ids, "-")
+	if !isRange {
+		last = first
+	}
+	firstID, err := strconv.ParseUint(first, 10, 64)
+	if err != nil || firstID == 0 { // ids start from 1
+		return 0, 0, false
+	}
+	lastID, err = strconv.ParseUint(last, 10, 64)
+	if err != nil || lastID < firstID {
+		return 0, 0, false
+	}
+	return firstID, lastID, true
+}
+
+// ListenForNewPosts keeps a dedicated connection (outside the pool) LISTEN-ing for posts created by other replicas, and calls onNewPosts with
+// the range of ids committed together (only the posts created by other replicas are in there, but not every id of the range may belong to them).
+// If the connection is lost, it is re-established with a backoff. Notifications sent meanwhile are lost, so onReconnect is called
+// every time the connection is (re-)established, so the caller can catch up.
+// This blocks until the context is cancelled.
+func ListenForNewPosts(ctx context.Context, logger *zap.Logger, onNewPosts func(firstID, lastID uint64), onReconnect func()) {
+	const maxBackoff = 30 * time.Second
+	backoff := time.Second
+
+	for ctx.Err() == nil {
+		err := listenForNewPosts(ctx, onNewPosts, func() {
+			backoff = time.Second // reset once we are connected again
+			onReconnect()
+		})
+		if ctx.Err() != nil {
+			return
+		}
+		logger.Warn("Listening for new posts failed, reconnecting", zap.Error(err), zap.Duration("backoff", backoff))
+
+		select {
+		case <-ctx.Done():
+			return
+		case <-time.After(backoff):
+		}
+		backoff = min(backoff*2, maxBackoff)
+	}
+}
+
+func listenForNewPosts(ctx context.Context, onNewPosts func(firstID, lastID uint64), onConnected func()) error {
+	conn, err := pgx.Connect(ctx, connectionDSN)
+	if err != nil {
+		return err
+	}
+	defer conn.Close(context.Background())
+
+	_, err = conn.Exec(ctx, "LISTEN "+pgx.Identifier{newPostChannel}.Sanitize())
+	if err != nil {
+		return err
+	}
+	onConnected()
+
+	for {
+		notification, err := conn.WaitForNotification(ctx)
+		if err != nil {
+			return fmt.Errorf("waiting for notification: %w", err)
+		}
+		firstID, lastID, ok := parseNewPostPayload(notification.Payload)
+		if !ok {
+			continue
+		}
+		onNewPosts(firstID, lastID)
+	}
+}
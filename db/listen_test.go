@@ -0,0 +1,30 @@
+package db
+
+import "testing"
+
+func TestNewPostPayload(t *testing.T) {
+	instanceID = "us"
+	defer func() { instanceID = "" }()
+
+	for _, tc := range []struct {
+		payload     string
+		first, last uint64
+		ok          bool
+	}{
+		{"them:5-8", 5, 8, true},
+		{"them:7-7", 7, 7, true},
+		{"them:7", 7, 7, true}, // older versions announce a single id
+		{newPostPayload(5, 8), 0, 0, false},
+		{"them:8-5", 0, 0, false},
+		{"them:0-5", 0, 0, false},
+		{"them:5-", 0, 0, false},
+		{"them:-5", 0, 0, false},
+		{"them:x", 0, 0, false},
+		{"them", 0, 0, false},
+	} {
+		first, last, ok := parseNewPostPayload(tc.payload)
+		if first != tc.first || last != tc.last || ok != tc.ok {
+			t.Errorf("%q was parsed as %d-%d (%v), expected %d-%d (%v)", tc.payload, first, last, ok, tc.first, tc.last, tc.ok)
+		}
+	}
+}
@@ -0,0 +1,91 @@
+package db
+
+import (
+	"encoding/json"
+	"gorm.io/gorm"
+	"time"
+)
+
+// postRow is a post as returned by the listing query, with the author's columns joined, and the tags aggregated into a json array
+type postRow struct {
+	ID              uint64
+	CreatedAt       time.Time
+	Text            string
+	AuthorID        uint
+	AuthorFirstSeen time.Time
+	AuthorName      string
+	Tags            []byte
+}
+
+// The tags are aggregated by a correlated sub-query, so the outer query needs no GROUP BY, and the filters, ordering and limit
+// still apply to the posts table directly (which means index seeks on posts.id).
+// The aliases are unusual on purpose, the outer query may join post_tags itself
+const postListingColumns = `posts.id, posts.created_at, posts.text, posts.author_id, ` +
+	`listing_authors.first_seen AS author_first_seen, listing_authors.name AS author_name, ` +
+	`(SELECT COALESCE(json_agg(listing_tags.tag ORDER BY listing_tags.id), '[]') FROM post_tags listing_post_tags ` +
+	`JOIN tags listing_tags ON listing_tags.id = listing_post_tags.tag_id WHERE listing_post_tags.post_id = posts.id) AS tags`
+
+// findPosts runs the query built on the chain (filters, ordering and pagination of posts) in a single round trip.
+// Preloading the authors and the tags would be two more queries, each of them carrying every id of the result, which is a lot for big listings.
+// withAuthor tells if the author should be set on the posts (the posts of an author are listed without it)
+func findPosts(chain *gorm.DB, withAuthor bool) ([]Post, error) {
+	var rows []postRow
+	result := chain.Table("posts").
+		Select(postListingColumns).
+		Joins("JOIN authors listing_authors ON listing_authors.id = posts.author_id").
+		Find(&rows)
+	if result.Error != nil {
+		return nil, result.Error
+	}
+
+	// posts of the same author or tag share the same objects, there is no need to have a copy of them for every post
+	authors := make(map[uint]*Author)
+	tags := make(map[string]*Tag)
+
+	posts := make([]Post, len(rows))
+	for i, row := range rows {
+		var tagNames []string
+		err := json.Unmarshal(row.Tags, &tagNames)
+		if err != nil {
+			return nil, err
+		}
+
+		postTags := make([]*Tag, len(tagNames))
+		for j, name := range tagNames {
+			tag, ok := tags[name]
+			if !ok {
+				tag = &Tag{Tag: name}
+				tags[name] = tag
+			}
+			postTags[j] = tag
+		}
+
+		posts[i] = Post{
+			ID:        row.ID,
+			CreatedAt: row.CreatedAt,
+			Text:      row.Text,
+			AuthorID:  row.AuthorID,
+			Tags:      postTags,
+		}
+
+		if withAuthor {
+			author, ok := authors[row.AuthorID]
+			if !ok {
+				author = &Author{ID: row.AuthorID, FirstSeen: row.AuthorFirstSeen, Name: row.AuthorName}
+				authors[row.AuthorID] = author
+			}
+			posts[i].Author = author
+		}
+	}
+
+	return posts, nil
+}
+
+// postPtrs is for the fills, which hold pointers to posts
+func postPtrs(posts []Post) []*Post {
+	ptrs := make([]*Post, len(posts))
+	for i := range posts {
+		ptrs[i] = &posts[i]
+	}
+	return ptrs
+}
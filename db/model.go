@@ -6,17 +6,39 @@ import (
 )
 
 type Post struct {
-	ID        uint64    `gorm:"primarykey"`
+	ID        uint64    `gorm:"primarykey;index:idx_posts_author_id_id,priority:2"`
 	CreatedAt time.Time `gorm:"default:now()"`
 	Text      string
 
-	AuthorID uint
+	AuthorID uint    `gorm:"index:idx_posts_author_id_id,priority:1"` // so pages of an author's posts are a single index seek
 	Author   *Author `gorm:"belongsTo:Author"`
 
 	Tags []*Tag `gorm:"many2many:post_tags;"`
 }
 
+// MarshalJSON returns the cached encoding of the post if there's one. The returned slice must not be modified
 func (p Post) MarshalJSON() ([]byte, error) {
+	// posts of an author's fill are encoded without the author, only the full form is cached
+	cacheable := p.ID != 0 && p.Author != nil
+	if cacheable {
+		data, ok := postCache.get(p.ID)
+		if ok {
+			return data, nil
+		}
+	}
+
+	data, err := p.encodeJSON()
+	if err != nil {
+		return nil, err
+	}
+
+	if cacheable {
+		postCache.put(p.ID, data)
+	}
+	return data, nil
+}
+
+func (p Post) encodeJSON() ([]byte, error) {
 
 	type MarshaledPost struct {
 		ID        uint64    `json:"id"`
@@ -46,7 +68,7 @@ func (p Post) MarshalJSON() ([]byte, error) {
 type Tag struct {
 	ID        uint      `gorm:"primarykey"`
 	FirstSeen time.Time `gorm:"default:now()"`
-	Tag       string    `gorm:"not null; uniqueIndex, varchar(280)"`
+	Tag       string    `gorm:"not null;uniqueIndex"` // this used to say "uniqueIndex, varchar(280)", which gorm silently ignored
 	Trending  bool      `json:"-" gorm:"not null; default:false"`
 
 	JSONIncludePosts bool    `json:"-" gorm:"-" sql:"-"` // Default false
@@ -55,15 +77,17 @@ type Tag struct {
 
 func (t Tag) MarshalJSON() ([]byte, error) {
 	if t.JSONIncludePosts {
-		return json.Marshal(struct {
+		head, err := json.Marshal(struct {
 			FirstSeen time.Time `json:"first_seen"`
 			Tag       string    `json:"tag"`
-			Posts     []*Post   `json:"posts"`
 		}{
 			FirstSeen: t.FirstSeen,
 			Tag:       t.Tag,
-			Posts:     t.Posts,
 		})
+		if err != nil {
+			return nil, err
+		}
+		return withPosts(head, t.Posts)
 	} else {
 		return json.Marshal(struct {
 			FirstSeen time.Time `json:"first_seen"`
@@ -86,17 +110,19 @@ type Author struct {
 
 func (a Author) MarshalJSON() ([]byte, error) {
 	if a.JSONIncludePosts {
-		return json.Marshal(struct {
+		head, err := json.Marshal(struct {
 			ID        uint      `json:"id"`
 			FirstSeen time.Time `json:"first_seen"`
 			Name      string    `json:"name"`
-			Posts     []*Post   `json:"posts"`
 		}{
 			ID:        a.ID,
 			FirstSeen: a.FirstSeen,
 			Name:      a.Name,
-			Posts:     a.Posts,
 		})
+		if err != nil {
+			return nil, err
+		}
+		return withPosts(head, a.Posts)
 	} else {
 		return json.Marshal(struct {
 			ID        uint      `json:"id"`
@@ -109,3 +135,52 @@ func (a Author) MarshalJSON() ([]byte, error) {
 		})
 	}
 }
+
+// MarshalPosts encodes a list of posts by splicing together their (mostly cached) encodings.
+// json.Marshal would do the same, except it would scan through the output of each MarshalJSON call again to validate it
+func MarshalPosts(posts []Post) ([]byte, error) {
+	if posts == nil {
+		return []byte("null"), nil
+	}
+	buf := make([]byte, 0, 2+len(posts)*256) // a post is usually around 200-300 bytes
+	buf = append(buf, '[')
+	for i := range posts {
+		if i != 0 {
+			buf = append(buf, ',')
+		}
+		data, err := posts[i].MarshalJSON()
+		if err != nil {
+			return nil, err
+		}
+		buf = append(buf, data...)
+	}
+	return append(buf, ']'), nil
+}
+
+// withPosts adds the posts field to the encoded object in head, for fills
+func withPosts(head []byte, posts []*Post) ([]byte, error) {
+	buf := make([]byte, 0, len(head)+12+len(posts)*256)
+	buf = append(buf, head[:len(head)-1]...) // without the closing brace
+	buf = append(buf, `,"posts":`...)
+	if posts == nil {
+		buf = append(buf, "null"...)
+	} else {
+		buf = append(buf, '[')
+		for i, post := range posts {
+			if i != 0 {
+				buf = append(buf, ',')
+			}
+			if post == nil {
+				buf = append(buf, "null"...)
+				continue
+			}
+			data, err := post.MarshalJSON()
+			if err != nil {
+				return nil, err
+			}
+			buf = append(buf, data...)
+		}
+		buf = append(buf, ']')
+	}
+	return append(buf, '}'), nil
+}
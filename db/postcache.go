@@ -0,0 +1,149 @@
+package db
+
+import (
+	"container/list"
+	"sync"
+	"sync/atomic"
+)
+
+const (
+	postCacheShards = 16
+
+	// rough size of the bookkeeping of an entry (list element, map entry, slice header), so lots of tiny posts can't blow the limit
+	postCacheEntryOverhead = 128
+)
+
+// postJSONCache keeps the encoded JSON of the most recently used posts. Posts never change after they are created,
+// so there's no need to invalidate anything, except when everything is cleaned up.
+// Entries are spread across shards by id, so requests encoding different posts rarely wait for each other
+type postJSONCache struct {
+	shards   [postCacheShards]postCacheShard
+	hits     atomic.Uint64
+	misses   atomic.Uint64
+	bytes    atomic.Int64
+	entries  atomic.Int64
+	maxBytes int64 // per shard
+}
+
+type postCacheShard struct {
+	mu      sync.Mutex
+	entries map[uint64]*list.Element
+	lru     *list.List // most recently used in the front
+	bytes   int64
+}
+
+type postCacheEntry struct {
+	id   uint64
+	data []byte
+}
+
+// postCache is nil when disabled, all the methods work on a nil cache
+var postCache *postJSONCache
+
+func newPostJSONCache(maxBytes int64) *postJSONCache {
+	if maxBytes <= 0 {
+		return nil
+	}
+	c := &postJSONCache{maxBytes: maxBytes / postCacheShards}
+	for i := range c.shards {
+		c.shards[i].entries = make(map[uint64]*list.Element)
+		c.shards[i].lru = list.New()
+	}
+	return c
+}
+
+func (c *postJSONCache) shard(id uint64) *postCacheShard {
+	return &c.shards[id%postCacheShards]
+}
+
+// get returns the encoded post, the returned slice must not be modified
+func (c *postJSONCache) get(id uint64) ([]byte, bool) {
+	if c == nil {
+		return nil, false
+	}
+	s := c.shard(id)
+	s.mu.Lock()
+	elem, ok := s.entries[id]
+	if ok {
+		s.lru.MoveToFront(elem)
+	}
+	s.mu.Unlock()
+
+	if !ok {
+		c.misses.Add(1)
+		return nil, false
+	}
+	c.hits.Add(1)
+	return elem.Value.(*postCacheEntry).data, true
+}
+
+// put stores the encoded post, evicting the least recently used ones if the shard would be over its limit
+func (c *postJSONCache) put(id uint64, data []byte) {
+	if c == nil {
+		return
+	}
+	size := int64(len(data)) + postCacheEntryOverhead
+	if size > c.maxBytes {
+		return // would not fit anyway
+	}
+
+	s := c.shard(id)
+	s.mu.Lock()
+	defer s.mu.Unlock()
+
+	if _, ok := s.entries[id]; ok {
+		return // someone else encoded it meanwhile, it's the same anyway
+	}
+
+	for s.bytes+size > c.maxBytes {
+		oldest := s.lru.Back()
+		entry := s.lru.Remove(oldest).(*postCacheEntry)
+		delete(s.entries, entry.id)
+		evicted := int64(len(entry.data)) + postCacheEntryOverhead
+		s.bytes -= evicted
+		c.bytes.Add(-evicted)
+		c.entries.Add(-1)
+	}
+
+	s.entries[id] = s.lru.PushFront(&postCacheEntry{id: id, data: data})
+	s.bytes += size
+	c.bytes.Add(size)
+	c.entries.Add(1)
+}
+
+// clear drops everything, used when the ids start from 1 again
+func (c *postJSONCache) clear() {
+	if c == nil {
+		return
+	}
+	for i := range c.shards {
+		s := &c.shards[i]
+		s.mu.Lock()
+		c.bytes.Add(-s.bytes)
+		c.entries.Add(-int64(len(s.entries)))
+		s.entries = make(map[uint64]*list.Element)
+		s.lru.Init()
+		s.bytes = 0
+		s.mu.Unlock()
+	}
+}
+
+type PostCacheStats struct {
+	Hits    uint64
+	Misses  uint64
+	Bytes   int64 // including the estimated bookkeeping overhead
+	Entries int64
+}
+
+// GetPostCacheStats returns the stats of the encoded post cache, all zeros if it's disabled
+func GetPostCacheStats() PostCacheStats {
+	if postCache == nil {
+		return PostCacheStats{}
+	}
+	return PostCacheStats{
+		Hits:    postCache.hits.Load(),
+		Misses:  postCache.misses.Load(),
+		Bytes:   postCache.bytes.Load(),
+		Entries: postCache.entries.Load(),
+	}
+}
@@ -0,0 +1,156 @@
+package db
+
+import (
+	"context"
+	"fmt"
+	"github.com/jackc/pgx/v5"
+	"slices"
+	"time"
+)
+
+// SeedPosts bulk loads a huge amount of posts (along with their authors and tags) using COPY, instead of inserting them one-by-one.
+// Authors and tags are created in order of their first appearance, posts are stored in the order they were supplied.
+// This is meant to be used for testing only, as it bypasses everything that is done for posts created normally.
+// Returns the id of the first and the last post created.
+func SeedPosts(ctx context.Context, posts []*Post) (firstId uint64, lastId uint64, err error) {
+	if len(posts) == 0 {
+		err = fmt.Errorf("nothing to seed")
+		return
+	}
+
+	err = withPgxConn(ctx, func(pgxConn *pgx.Conn) error { // gorm does not support COPY, so we have to go down to pgx for this
+		tx, err := pgxConn.Begin(ctx)
+		if err != nil {
+			return err
+		}
+		defer tx.Rollback(ctx) // this is a no-op after commit
+
+		// Collect authors and tags in order of appearance
+		var authorNames, tagNames []string
+		authorSeen := make(map[string]interface{})
+		tagSeen := make(map[string]interface{})
+		for _, post := range posts {
+			if _, ok := authorSeen[post.Author.Name]; !ok {
+				authorSeen[post.Author.Name] = nil
+				authorNames = append(authorNames, post.Author.Name)
+			}
+			for _, tag := range post.Tags {
+				if _, ok := tagSeen[tag.Tag]; !ok {
+					tagSeen[tag.Tag] = nil
+					tagNames = append(tagNames, tag.Tag)
+				}
+			}
+		}
+
+		authorIds, newAuthors, err := seedNames(ctx, tx, "authors", "name", authorNames)
+		if err != nil {
+			return err
+		}
+
+		tagIds, newTags, err := seedNames(ctx, tx, "tags", "tag", tagNames)
+		if err != nil {
+			return err
+		}
+
+		// Reserve ids for the posts, so that we know them before COPY-ing them in
+		rows, err := tx.Query(ctx, "SELECT nextval(pg_get_serial_sequence('posts', 'id')) FROM generate_series(1, $1)", len(posts))
+		if err != nil {
+			return err
+		}
+		postIds, err := pgx.CollectRows(rows, pgx.RowTo[int64])
+		if err != nil {
+			return err
+		}
+		slices.Sort(postIds) // sequences only grow, but the order of the rows is not guaranteed
+
+		now := time.Now()
+		postRows := make([][]any, len(posts))
+		var postTagRows [][]any
+		for i, post := range posts {
+			postRows[i] = []any{postIds[i], now, post.Text, authorIds[post.Author.Name]}
+			for _, tag := range post.Tags {
+				postTagRows = append(postTagRows, []any{postIds[i], tagIds[tag.Tag]})
+			}
+		}
+
+		_, err = tx.CopyFrom(ctx, pgx.Identifier{"posts"}, []string{"id", "created_at", "text", "author_id"}, pgx.CopyFromRows(postRows))
+		if err != nil {
+			return err
+		}
+
+		if len(postTagRows) > 0 {
+			_, err = tx.CopyFrom(ctx, pgx.Identifier{"post_tags"}, []string{"post_id", "tag_id"}, pgx.CopyFromRows(postTagRows))
+			if err != nil {
+				return err
+			}
+		}
+
+		// Other replicas look up the posts themselves, they only need to know the range
+		_, err = tx.Exec(ctx, "SELECT pg_notify($1, $2)", newPostChannel, newPostPayload(uint64(postIds[0]), uint64(postIds[len(postIds)-1])))
+		if err != nil {
+			return err
+		}
+
+		err = tx.Commit(ctx)
+		if err != nil {
+			return err
+		}
+		addToCounters(int64(len(posts)), newAuthors, newTags)
+
+		firstId = uint64(postIds[0])
+		lastId = uint64(postIds[len(postIds)-1])
+		return nil
+	})
+
+	return
+}
+
+// seedNames makes sure that all the names exist in the given table (authors or tags), and returns their ids.
+// Missing names are COPY-ed into a temporary table first, and then inserted in their original order.
+// Also returns the number of names that were actually inserted.
+func seedNames(ctx context.Context, tx pgx.Tx, table, column string, names []string) (map[string]int64, int64, error) {
+	ids := make(map[string]int64, len(names))
+	if len(names) == 0 {
+		return ids, 0, nil
+	}
+
+	stagingTable := "seed_" + table
+	_, err := tx.Exec(ctx, fmt.Sprintf("CREATE TEMPORARY TABLE %s (name text NOT NULL, ord bigint NOT NULL) ON COMMIT DROP", stagingTable))
+	if err != nil {
+		return nil, 0, err
+	}
+
+	_, err = tx.CopyFrom(ctx, pgx.Identifier{stagingTable}, []string{"name", "ord"}, pgx.CopyFromSlice(len(names), func(i int) ([]any, error) {
+		return []any{names[i], int64(i)}, nil
+	}))
+	if err != nil {
+		return nil, 0, err
+	}
+
+	// table and column names are never user supplied
+	tag, err := tx.Exec(ctx, fmt.Sprintf(
+		"INSERT INTO %[1]s (%[2]s) SELECT s.name FROM %[3]s s WHERE NOT EXISTS (SELECT 1 FROM %[1]s t WHERE t.%[2]s = s.name) ORDER BY s.ord",
+		table, column, stagingTable,
+	))
+	if err != nil {
+		return nil, 0, err
+	}
+
+	rows, err := tx.Query(ctx, fmt.Sprintf("SELECT t.id, t.%[2]s FROM %[1]s t JOIN %[3]s s ON s.name = t.%[2]s", table, column, stagingTable))
+	if err != nil {
+		return nil, 0, err
+	}
+	defer rows.Close()
+
+	for rows.Next() {
+		var id int64
+		var name string
+		err = rows.Scan(&id, &name)
+		if err != nil {
+			return nil, 0, err
+		}
+		ids[name] = id
+	}
+
+	return ids, tag.RowsAffected(), rows.Err()
+}
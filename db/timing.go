@@ -0,0 +1,51 @@
+package db
+
+import (
+	"github.com/pproj/tutter/timing"
+	"gorm.io/gorm"
+	"time"
+)
+
+const timingStartKey = "tutter:timing_start"
+
+// registerTimingCallbacks hooks into every gorm operation, so that each DB round trip is recorded in the timing.Timings of the request (if there's any).
+// Requests without timing (debug mode off) only pay for a context lookup.
+func registerTimingCallbacks(g *gorm.DB) error {
+	before := func(tx *gorm.DB) {
+		if timing.FromContext(tx.Statement.Context) != nil {
+			tx.InstanceSet(timingStartKey, time.Now())
+		}
+	}
+	after := func(tx *gorm.DB) {
+		t := timing.FromContext(tx.Statement.Context)
+		if t == nil {
+			return
+		}
+		started, ok := tx.InstanceGet(timingStartKey)
+		if !ok {
+			return
+		}
+		t.AddRoundTrip(tx.Statement.Table, time.Since(started.(time.Time)))
+	}
+
+	cb := g.Callback()
+	for _, err := range []error{
+		cb.Query().Before("gorm:query").Register("tutter:timing_before_query", before),
+		cb.Query().After("gorm:query").Register("tutter:timing_after_query", after),
+		cb.Create().Before("gorm:create").Register("tutter:timing_before_create", before),
+		cb.Create().After("gorm:create").Register("tutter:timing_after_create", after),
+		cb.Update().Before("gorm:update").Register("tutter:timing_before_update", before),
+		cb.Update().After("gorm:update").Register("tutter:timing_after_update", after),
+		cb.Delete().Before("gorm:delete").Register("tutter:timing_before_delete", before),
+		cb.Delete().After("gorm:delete").Register("tutter:timing_after_delete", after),
+		cb.Row().Before("gorm:row").Register("tutter:timing_before_row", before),
+		cb.Row().After("gorm:row").Register("tutter:timing_after_row", after),
+		cb.Raw().Before("gorm:raw").Register("tutter:timing_before_raw", before),
+		cb.Raw().After("gorm:raw").Register("tutter:timing_after_raw", after),
+	} {
+		if err != nil {
+			return err
+		}
+	}
+	return nil
+}
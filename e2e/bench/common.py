@@ -0,0 +1,9 @@
+from lib.fixtures import SlidingTagsDataset
+
+# The listing related scenarios share the same dataset, ids are known because the database is clean before seeding
+BENCH_AUTHORS = [f"bench_{i}" for i in range(20)]
+BENCH_TAGS = [f"bench{i}" for i in range(30)]
+
+
+def listing_dataset() -> SlidingTagsDataset:
+    return SlidingTagsDataset(BENCH_AUTHORS, BENCH_TAGS, repeat=100)  # 56000 posts
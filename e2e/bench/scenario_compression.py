@@ -0,0 +1,45 @@
+from bench.common import listing_dataset
+from lib.bench import BenchScenario, Metric, latency_metrics
+from lib.load import run_load, LoadClient
+
+LISTING = "/api/post?limit=5000&order=desc"
+
+
+async def list_gzip(client: LoadClient, i: int):
+    # aiohttp decompresses transparently, so the time spent decompressing is in the latency too, like for any real client
+    await client.request("GET", LISTING, 200, endpoint="GET /api/post", headers={"Accept-Encoding": "gzip"})
+
+
+async def list_identity(client: LoadClient, i: int):
+    await client.request("GET", LISTING, 200, endpoint="GET /api/post", headers={"Accept-Encoding": "identity"})
+
+
+class Compression(BenchScenario):
+    """
+    Big listings with and without compression, the difference of the two is the CPU cost of compressing,
+    the size of the compressed body is the bandwidth saved
+    """
+    requests_per_iteration = 200
+
+    def setup(self):
+        self.seed(listing_dataset())
+
+    def wire_size(self, encoding: str) -> int:
+        with self.request_and_expect_status("GET", LISTING, 200, headers={"Accept-Encoding": encoding},
+                                            stream=True) as r:
+            return len(r.raw.read(decode_content=False))
+
+    def measure(self) -> dict:
+        gzip_report = run_load(list_gzip, self.requests_per_iteration, self.base_url, processes=2, concurrency=8)
+        gzip_report.raise_for_errors()
+        identity_report = run_load(list_identity, self.requests_per_iteration, self.base_url, processes=2,
+                                   concurrency=8)
+        identity_report.raise_for_errors()
+
+        return {
+            "gzip_throughput": Metric(gzip_report.rps(), "req/s", higher_is_better=True),
+            **latency_metrics(gzip_report.endpoints["GET /api/post"].latency, "gzip_"),
+            "identity_throughput": Metric(identity_report.rps(), "req/s", higher_is_better=True),
+            **latency_metrics(identity_report.endpoints["GET /api/post"].latency, "identity_"),
+            "compression_ratio": Metric(self.wire_size("gzip") / self.wire_size("identity") * 100, "%"),
+        }
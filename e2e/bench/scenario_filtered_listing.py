@@ -0,0 +1,34 @@
+from bench.common import BENCH_AUTHORS, BENCH_TAGS, listing_dataset
+from lib.bench import BenchScenario, Metric, latency_metrics
+from lib.load import run_load, LoadClient
+
+
+async def list_by_tag(client: LoadClient, i: int):
+    tag = BENCH_TAGS[i % len(BENCH_TAGS)]
+    await client.request("GET", f"/api/post?tag={tag}&limit=100&order=desc", 200, endpoint="GET /api/post?tag")
+
+
+async def list_by_author(client: LoadClient, i: int):
+    author_id = i % len(BENCH_AUTHORS) + 1
+    await client.request("GET", f"/api/post?author_id={author_id}&limit=100&order=desc", 200,
+                         endpoint="GET /api/post?author_id")
+
+
+class FilteredListing(BenchScenario):
+    requests_per_iteration = 500
+
+    def setup(self):
+        self.seed(listing_dataset())
+
+    def measure(self) -> dict:
+        tag_report = run_load(list_by_tag, self.requests_per_iteration, self.base_url, processes=2, concurrency=8)
+        tag_report.raise_for_errors()
+        author_report = run_load(list_by_author, self.requests_per_iteration, self.base_url, processes=2,
+                                 concurrency=8)
+        author_report.raise_for_errors()
+        return {
+            "tag_throughput": Metric(tag_report.rps(), "req/s", higher_is_better=True),
+            **latency_metrics(tag_report.endpoints["GET /api/post?tag"].latency, "tag_"),
+            "author_throughput": Metric(author_report.rps(), "req/s", higher_is_better=True),
+            **latency_metrics(author_report.endpoints["GET /api/post?author_id"].latency, "author_"),
+        }
@@ -0,0 +1,21 @@
+from lib.bench import BenchScenario, Metric
+from lib.soak import run_longpoll_soak
+
+
+class LongPollWakeup(BenchScenario):
+    pollers = 1000
+
+    thresholds = {
+        "missed_deliveries": 0.0,  # any missed delivery is a regression
+    }
+
+    def measure(self) -> dict:
+        self.reset_database()  # the soak needs consecutive post ids
+        report = run_longpoll_soak(self.base_url, pollers=self.pollers, rate=10, duration=10, processes=2,
+                                   warmup=2, drain=2)
+        delay = report.stats.delay
+        return {
+            "wakeup_p50": Metric(delay.percentile(50) * 1000, "ms"),
+            "wakeup_p99": Metric(delay.percentile(99) * 1000, "ms"),
+            "missed_deliveries": Metric(report.missed_deliveries, "posts"),
+        }
@@ -0,0 +1,31 @@
+import time
+
+from bench.common import listing_dataset
+from lib.bench import BenchScenario, Metric, latency_metrics
+from lib.stats import LatencyHistogram
+
+
+class PaginationByAfterId(BenchScenario):
+    page_size = 500
+
+    def setup(self):
+        self.seed(listing_dataset())
+
+    def measure(self) -> dict:
+        pages = LatencyHistogram()
+        last_id = 0
+        walk_started = time.perf_counter()
+        while True:
+            started = time.perf_counter()
+            r = self.request_and_expect_status("GET", f"/api/post?after_id={last_id}&limit={self.page_size}", 200)
+            pages.record(time.perf_counter() - started)
+            posts = r.json()
+            if len(posts) < self.page_size:
+                break
+            last_id = posts[-1]["id"]
+        walk_time = time.perf_counter() - walk_started
+
+        return {
+            "walk_time": Metric(walk_time, "s"),
+            **latency_metrics(pages, "page_"),
+        }
@@ -0,0 +1,22 @@
+from lib.bench import BenchScenario, Metric, latency_metrics
+from lib.load import run_load, LoadClient
+
+
+async def create_post(client: LoadClient, i: int):
+    post = {
+        "author": f"bench_{i % 100}",
+        "text": f"#bench{i % 20} #bench{i % 7} benchmark post {i}"
+    }
+    await client.request("POST", "/api/post", 201, endpoint="POST /api/post", json=post)
+
+
+class PostCreationThroughput(BenchScenario):
+    posts_per_iteration = 2000
+
+    def measure(self) -> dict:
+        report = run_load(create_post, self.posts_per_iteration, self.base_url, processes=2, concurrency=16)
+        report.raise_for_errors()
+        return {
+            "throughput": Metric(report.rps(), "req/s", higher_is_better=True),
+            **latency_metrics(report.endpoints["POST /api/post"].latency),
+        }
@@ -0,0 +1,33 @@
+from bench.common import BENCH_AUTHORS, BENCH_TAGS, listing_dataset
+from lib.bench import BenchScenario, Metric, latency_metrics
+from lib.load import run_load, LoadClient
+
+
+async def fill_tag(client: LoadClient, i: int):
+    tag = BENCH_TAGS[i % len(BENCH_TAGS)]
+    await client.request("GET", f"/api/tag/{tag}?fill=true&limit=100&order=desc", 200, endpoint="GET /api/tag/{tag}")
+
+
+async def fill_author(client: LoadClient, i: int):
+    author_id = i % len(BENCH_AUTHORS) + 1
+    await client.request("GET", f"/api/author/{author_id}?fill=true&limit=100&order=desc", 200,
+                         endpoint="GET /api/author/{id}")
+
+
+class TagFill(BenchScenario):
+    requests_per_iteration = 500
+
+    def setup(self):
+        self.seed(listing_dataset())
+
+    def measure(self) -> dict:
+        tag_report = run_load(fill_tag, self.requests_per_iteration, self.base_url, processes=2, concurrency=8)
+        tag_report.raise_for_errors()
+        author_report = run_load(fill_author, self.requests_per_iteration, self.base_url, processes=2, concurrency=8)
+        author_report.raise_for_errors()
+        return {
+            "tag_throughput": Metric(tag_report.rps(), "req/s", higher_is_better=True),
+            **latency_metrics(tag_report.endpoints["GET /api/tag/{tag}"].latency, "tag_"),
+            "author_throughput": Metric(author_report.rps(), "req/s", higher_is_better=True),
+            **latency_metrics(author_report.endpoints["GET /api/author/{id}"].latency, "author_"),
+        }
@@ -0,0 +1,134 @@
+import json
+import statistics
+import time
+from abc import abstractmethod
+
+from .stats import LatencyHistogram
+from .testcase import TestCaseBase
+
+
+class Metric:
+
+    def __init__(self, value: float, unit: str, higher_is_better: bool = False):
+        self.value = value
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+
+    def to_dict(self) -> dict:
+        return {"value": self.value, "unit": self.unit, "higher_is_better": self.higher_is_better}
+
+    @staticmethod
+    def from_dict(d: dict) -> "Metric":
+        return Metric(d["value"], d["unit"], d["higher_is_better"])
+
+
+def latency_metrics(histogram: LatencyHistogram, prefix: str = "") -> dict:
+    return {
+        f"{prefix}p50": Metric(histogram.percentile(50) * 1000, "ms"),
+        f"{prefix}p95": Metric(histogram.percentile(95) * 1000, "ms"),
+        f"{prefix}p99": Metric(histogram.percentile(99) * 1000, "ms"),
+    }
+
+
+class BenchScenario(TestCaseBase):
+    """
+    A named benchmark scenario. setup() is called once on a clean database, then measure() is called for each
+    iteration. The median of each metric over the iterations is what gets stored and compared to the baseline.
+    """
+
+    iterations = 5
+
+    # relative change allowed for specific metrics, overriding the threshold given to run_bench.py
+    thresholds = {}
+
+    def __init__(self, base_url: str = None):
+        super().__init__(base_url)
+        self.results = {}
+
+    def setup(self):
+        pass
+
+    @abstractmethod
+    def measure(self) -> dict:
+        """Run one iteration and return {metric name: Metric}"""
+        pass
+
+    def run(self):
+        self.setup()
+        samples = {}
+        for _ in range(self.iterations):
+            for name, metric in self.measure().items():
+                samples.setdefault(name, []).append(metric)
+
+        self.results = {
+            name: Metric(statistics.median(m.value for m in metrics), metrics[0].unit, metrics[0].higher_is_better)
+            for name, metrics in samples.items()
+        }
+
+
+class Comparison:
+
+    def __init__(self, scenario: str, metric: str, current: Metric, baseline: Metric = None, threshold: float = None):
+        self.scenario = scenario
+        self.metric = metric
+        self.current = current
+        self.baseline = baseline
+        self.threshold = threshold
+
+    @property
+    def change(self):
+        """Relative change, positive means worse"""
+        if self.baseline is None:
+            return None
+        if self.baseline.value == 0:
+            if self.current.value == 0:
+                return 0.0
+            return float("inf") if not self.current.higher_is_better else float("-inf")
+        change = (self.current.value - self.baseline.value) / abs(self.baseline.value)
+        return -change if self.current.higher_is_better else change
+
+    @property
+    def regressed(self) -> bool:
+        return self.change is not None and self.change > self.threshold
+
+    def format(self) -> str:
+        baseline = f"{self.baseline.value:.3f}" if self.baseline else "-"
+        change = f"{self.change * 100:+.1f}%" if self.change is not None and abs(self.change) != float("inf") else "-"
+        status = "REGRESSED" if self.regressed else ("new" if self.baseline is None else "ok")
+        return (f"{self.scenario:<28} {self.metric:<20} {baseline:>12} {self.current.value:>12.3f} "
+                f"{self.current.unit:<8} {change:>9} {status}")
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, "r") as f:
+        data = json.load(f)
+    return {
+        scenario: {name: Metric.from_dict(m) for name, m in metrics.items()}
+        for scenario, metrics in data["scenarios"].items()
+    }
+
+
+def save_baseline(path: str, results: dict):
+    data = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "scenarios": {
+            scenario: {name: m.to_dict() for name, m in metrics.items()}
+            for scenario, metrics in results.items()
+        },
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def compare_to_baseline(results: dict, baseline: dict, scenarios: dict, threshold: float) -> list:
+    """results and baseline are {scenario name: {metric name: Metric}}, scenarios are the instances by name"""
+    comparisons = []
+    for scenario_name, metrics in results.items():
+        overrides = scenarios[scenario_name].thresholds
+        for metric_name, metric in metrics.items():
+            comparisons.append(Comparison(
+                scenario_name, metric_name, metric,
+                baseline.get(scenario_name, {}).get(metric_name),
+                overrides.get(metric_name, threshold),
+            ))
+    return comparisons
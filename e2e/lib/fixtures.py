@@ -0,0 +1,72 @@
+import random
+import string
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+
+class Dataset(ABC):
+    """
+    Declarative description of a bunch of posts to be seeded with TestCaseBase.seed()
+    Datasets also know what they contain, so tests don't have to count posts by hand.
+    """
+
+    @abstractmethod
+    def posts(self) -> Iterator[dict]:
+        pass
+
+    def __iter__(self):
+        return self.posts()
+
+
+class SlidingTagsDataset(Dataset):
+    """
+    Every author posts `repeat` posts for every `window` wide window of the tags list.
+    With authors ['a', 'b'] and tags ['a', 'b', 'c', 'd'] (window=3) author 'a' posts "#a #b #c" and "#b #c #d" then
+    author 'b' does the same. Authors get their ids in the order of the authors list.
+    """
+
+    def __init__(self, authors: list, tags: list, window: int = 3, repeat: int = 1):
+        assert len(tags) >= window
+        self.authors = authors
+        self.tags = tags
+        self.window = window
+        self.repeat = repeat
+
+        self.total_posts = 0
+        self.posts_by_authors = {}.fromkeys(authors, 0)
+        self.posts_by_tags = {}.fromkeys(tags, 0)
+        for author in authors:
+            for i in range(len(tags) - window + 1):
+                self.total_posts += repeat
+                self.posts_by_authors[author] += repeat
+                for tag in tags[i:i + window]:
+                    self.posts_by_tags[tag] += repeat
+
+    def posts(self) -> Iterator[dict]:
+        for author in self.authors:
+            for i in range(len(self.tags) - self.window + 1):
+                text = " ".join(f"#{tag}" for tag in self.tags[i:i + self.window])
+                for j in range(self.repeat):
+                    yield {
+                        "author": author,
+                        "text": f"{text} {j}" if self.repeat > 1 else text,
+                    }
+
+
+class UniqueAuthorsDataset(Dataset):
+    """
+    `count` posts, each one from a different author, with random text of `text_length` letters.
+    """
+
+    def __init__(self, count: int, text_length: int = 160, seed: int = None):
+        self.count = count
+        self.total_posts = count
+        self.text_length = text_length
+        self._random = random.Random(seed)
+
+    def posts(self) -> Iterator[dict]:
+        for i in range(self.count):
+            yield {
+                "author": f"seeded_{i}",
+                "text": ''.join(self._random.choices(string.ascii_letters, k=self.text_length)),
+            }
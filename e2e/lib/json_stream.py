@@ -0,0 +1,82 @@
+import codecs
+import json
+from typing import Iterator
+
+import requests
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+class JsonStreamError(Exception):
+    pass
+
+
+def iter_json_array(response: requests.Response, chunk_size: int = 65536) -> Iterator:
+    """
+    Incrementally parse a JSON array from a streamed response (stream=True), yielding its elements one-by-one.
+    Only the element being parsed is kept in memory, so responses of any size can be processed.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+    chunks = response.iter_content(chunk_size=chunk_size)
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buf = buf[pos:] + text_decoder.decode(b"", final=True)
+        else:
+            buf = buf[pos:] + text_decoder.decode(chunk)
+        pos = 0
+
+    def next_significant_char() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                raise JsonStreamError("unexpected end of stream")
+            fill()
+
+    if next_significant_char() != "[":
+        raise JsonStreamError("response is not a JSON array")
+    pos += 1
+
+    if next_significant_char() == "]":
+        return
+
+    while True:
+        next_significant_char()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+
+            if not eof and (end == len(buf) or buf[end] not in _DELIMITERS):
+                # numbers may continue in the next chunk, "456" decodes fine, but it could be "456.5" or "456e3".
+                # Anything valid is followed by a delimiter, so if it's not there (yet), read on
+                fill()
+                continue
+
+            pos = end
+            break
+
+        yield item
+
+        c = next_significant_char()
+        pos += 1
+        if c == "]":
+            return
+        if c != ",":
+            raise JsonStreamError(f"unexpected character in array: {c!r}")
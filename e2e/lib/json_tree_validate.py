@@ -1,10 +1,17 @@
 from abc import ABC, abstractmethod
+from typing import Any, Callable
 
 
 # Errors
 
 class JsonTreeError(Exception):
-    pass
+
+    def prefix_key_hint(self, prefix: str):
+        # key hints are built only when something fails, while the error bubbles up
+        if self.args:
+            self.args = (prefix + str(self.args[0]),) + self.args[1:]
+        else:
+            self.args = (prefix,)
 
 
 class JsonTreeValueMismatchError(JsonTreeError):
@@ -103,38 +110,80 @@ class MagicAnyOf(JsonTreeMagic):
 
 
 # main compare stuff
-def expect_json_tree(got, expected, key_hint=None):
-    if not key_hint:
-        key_hint = ""
-
-    if isinstance(expected, dict):
 
-        if not isinstance(got, dict):
-            raise JsonTreeValueMismatchError(key_hint, got, expected)
+def compile_json_tree(expected) -> Callable[[Any], None]:
+    """
+    Turn the expected tree into a validator function once, so it can be called many times cheaply.
+    The validator raises the same errors as expect_json_tree would.
+    """
 
+    if isinstance(expected, dict):
+        constants = []
+        nested = []
         for key, value in expected.items():
-            if key not in got.keys():
-                if isinstance(expected, JsonTreeMagic):
-                    expected.compare(f"{key_hint}.{key}", False, None)
-                else:
-                    raise JsonTreeMissingKeyError(key_hint, key)
+            if isinstance(value, (dict, list, JsonTreeMagic)):
+                nested.append((key, compile_json_tree(value)))
             else:
-                expect_json_tree(got[key], value, key_hint=f"{key_hint}.{key}")
+                constants.append((key, value))
+
+        def validate_dict(got):
+            if not isinstance(got, dict):
+                raise JsonTreeValueMismatchError("", got, expected)
+
+            for key, value in constants:
+                if key not in got:
+                    raise JsonTreeMissingKeyError("", key)
+                if got[key] != value:
+                    raise JsonTreeValueMismatchError(f".{key}", got[key], value)
+
+            for key, validator in nested:
+                if key not in got:
+                    raise JsonTreeMissingKeyError("", key)
+                try:
+                    validator(got[key])
+                except JsonTreeError as e:
+                    e.prefix_key_hint(f".{key}")
+                    raise
+
+        return validate_dict
 
     elif isinstance(expected, JsonTreeMagic):
-        expected.compare(key_hint, True, got)
+        compare = expected.compare
+
+        def validate_magic(got):
+            compare("", True, got)
+
+        return validate_magic
 
     elif isinstance(expected, list):
+        validators = [compile_json_tree(item) for item in expected]
+        expected_len = len(expected)
 
-        if not isinstance(got, list):
-            raise JsonTreeValueMismatchError(key_hint, got, expected)
+        def validate_list(got):
+            if not isinstance(got, list) or len(got) != expected_len:
+                raise JsonTreeValueMismatchError("", got, expected)
 
-        if len(got) != len(expected):
-            raise JsonTreeValueMismatchError(key_hint, got, expected)
+            for i, validator in enumerate(validators):
+                try:
+                    validator(got[i])
+                except JsonTreeError as e:
+                    e.prefix_key_hint(f"[{i}]")
+                    raise
 
-        for i, item in enumerate(expected):
-            expect_json_tree(got[i], item, key_hint=f"{key_hint}[{i}]")
+        return validate_list
 
     else:
-        if expected != got:
-            raise JsonTreeValueMismatchError(key_hint, got, expected)
+        def validate_value(got):
+            if expected != got:
+                raise JsonTreeValueMismatchError("", got, expected)
+
+        return validate_value
+
+
+def expect_json_tree(got, expected, key_hint=None):
+    try:
+        compile_json_tree(expected)(got)
+    except JsonTreeError as e:
+        if key_hint:
+            e.prefix_key_hint(key_hint)
+        raise
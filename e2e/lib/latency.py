@@ -0,0 +1,154 @@
+import re
+from urllib.parse import urlsplit
+
+from .stats import LatencyHistogram, format_ms
+
+# Concrete paths are grouped by the route they hit on the server, otherwise every post id would get its own histogram.
+# First match wins
+_ROUTE_TEMPLATES = [
+    (re.compile(r"^/api/post/[^/]+$"), "/api/post/{id}"),
+    (re.compile(r"^/api/author/[^/]+$"), "/api/author/{id}"),
+    (re.compile(r"^/api/tag/[^/]+$"), "/api/tag/{tag}"),
+    (re.compile(r"^/api/debug/setTrending/[^/]+$"), "/api/debug/setTrending/{tag}"),
+]
+
+
+def route_template(url: str) -> str:
+    """Strip the host and the query from the url, and replace path parameters with placeholders"""
+    path = urlsplit(url).path or "/"
+    for pattern, template in _ROUTE_TEMPLATES:
+        if pattern.match(path):
+            return template
+    return path
+
+
+def parse_server_timing(value: str) -> list:
+    """Parse a Server-Timing header into a list of (name, duration in seconds, description) tuples"""
+    entries = []
+    for metric in value.split(","):
+        parts = [p.strip() for p in metric.split(";")]
+        if not parts[0]:
+            continue
+        dur = 0.0
+        desc = ""
+        for param in parts[1:]:
+            key, _, val = param.partition("=")
+            if key == "dur":
+                dur = float(val) / 1000
+            elif key == "desc":
+                desc = val.strip('"')
+        entries.append((parts[0], dur, desc))
+    return entries
+
+
+class LatencyBudgetExceeded(Exception):
+    pass
+
+
+class LatencyRecorder:
+    """Latency histograms keyed by (method, route template, status). Recorders can be merged across tests and processes"""
+
+    def __init__(self):
+        self.histograms = {}
+        # server side phases from the Server-Timing header (only sent in debug mode): {(method, route): {phase: histogram}}
+        self.phases = {}
+        self.db_queries = {}  # {(method, route): [responses, queries]}
+
+    def record(self, method: str, url: str, status: int, seconds: float):
+        key = (method.upper(), route_template(url), status)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def record_server_timing(self, method: str, url: str, header: str):
+        key = (method.upper(), route_template(url))
+        phases = self.phases.setdefault(key, {})
+        queries = 0
+        for name, dur, desc in parse_server_timing(header):
+            if name.startswith("db-"):
+                # single round trips are grouped by the table they hit
+                queries += 1
+                name = f"db:{desc}"
+            if name not in phases:
+                phases[name] = LatencyHistogram()
+            phases[name].record(dur)
+
+        counts = self.db_queries.setdefault(key, [0, 0])
+        counts[0] += 1
+        counts[1] += queries
+
+    def merge(self, other: "LatencyRecorder"):
+        for key, histogram in other.histograms.items():
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            self.histograms[key].merge(histogram)
+        for key, phases in other.phases.items():
+            own = self.phases.setdefault(key, {})
+            for name, histogram in phases.items():
+                if name not in own:
+                    own[name] = LatencyHistogram()
+                own[name].merge(histogram)
+        for key, (responses, queries) in other.db_queries.items():
+            counts = self.db_queries.setdefault(key, [0, 0])
+            counts[0] += responses
+            counts[1] += queries
+
+    def __bool__(self):
+        return bool(self.histograms)
+
+    def for_endpoint(self, endpoint: str) -> LatencyHistogram:
+        """Histogram of an endpoint ("GET /api/post/{id}") with all the statuses merged"""
+        method, route = endpoint.split(" ", 1)
+        merged = LatencyHistogram()
+        for (m, r, _), histogram in self.histograms.items():
+            if m == method.upper() and r == route:
+                merged.merge(histogram)
+        return merged
+
+    def check_budgets(self, budgets: dict):
+        """
+        budgets look like {"GET /api/post/{id}": {"p99": 0.020}}, values are in seconds.
+        Endpoints that were not called are not checked.
+        """
+        breaches = []
+        for endpoint, limits in budgets.items():
+            histogram = self.for_endpoint(endpoint)
+            if histogram.count == 0:
+                continue
+            for percentile, limit in limits.items():
+                got = histogram.percentile(float(percentile.lstrip("p")))
+                if got > limit:
+                    breaches.append(f"{endpoint} {percentile} {format_ms(got)} > {format_ms(limit)}")
+
+        if breaches:
+            raise LatencyBudgetExceeded("Latency budget exceeded: " + ", ".join(breaches))
+
+    def format_table(self) -> str:
+        lines = [f"{'Endpoint':<44} {'Status':>6} {'Count':>8} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}"]
+        for key in sorted(self.histograms.keys()):
+            method, route, status = key
+            h = self.histograms[key]
+            lines.append(
+                f"{method + ' ' + route:<44} {status:>6} {h.count:>8} {format_ms(h.percentile(50)):>10} "
+                f"{format_ms(h.percentile(95)):>10} {format_ms(h.percentile(99)):>10} {format_ms(h.max or 0.0):>10}"
+            )
+        return "\n".join(lines)
+
+    def format_phase_table(self) -> str:
+        """Breakdown of the server side phases for each endpoint, empty if the server did not send Server-Timing headers"""
+        lines = []
+        for key in sorted(self.phases.keys()):
+            method, route = key
+            responses, queries = self.db_queries[key]
+            lines.append(f"{method} {route} ({responses} responses, {queries / responses:.2f} queries/response)")
+            for name in sorted(self.phases[key].keys()):
+                h = self.phases[key][name]
+                lines.append(
+                    f"  {name:<30} {h.count:>8} {format_ms(h.mean):>10} {format_ms(h.percentile(50)):>10} "
+                    f"{format_ms(h.percentile(95)):>10} {format_ms(h.percentile(99)):>10}"
+                )
+        if not lines:
+            return ""
+        header = f"  {'Phase':<30} {'Count':>8} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10}"
+        return "\n".join([header] + lines)
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from typing import Awaitable, Callable
+
+import aiohttp
+
+from .stats import LatencyHistogram, format_ms
+from .testcase import UnexpectedHTTPStatus
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+
+    def merge(self, other: "EndpointStats"):
+        self.latency.merge(other.latency)
+        self.errors += other.errors
+
+
+class LoadResponse:
+
+    def __init__(self, status: int, headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class LoadClient:
+    """
+    Thin wrapper around an aiohttp session, that records latency and errors per endpoint.
+    Jobs run by run_load() receive one of these.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, worker_id: int):
+        self.session = session
+        self.worker_id = worker_id
+        self.stats = {}
+
+    def _stats_for(self, endpoint: str) -> EndpointStats:
+        stats = self.stats.get(endpoint)
+        if stats is None:
+            stats = self.stats[endpoint] = EndpointStats()
+        return stats
+
+    async def request(self, method: str, url: str, expected_status: int, endpoint: str = None,
+                      **kwargs) -> LoadResponse:
+        """
+        endpoint is the name the results are grouped by, it should be the route template (e.g. GET /api/post/{id})
+        instead of the actual url, otherwise every request would end up in its own group.
+        """
+        if not endpoint:
+            endpoint = f"{method} {url}"
+        stats = self._stats_for(endpoint)
+
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method, url, **kwargs) as r:
+                body = await r.read()
+        except Exception:
+            stats.errors += 1
+            raise
+        stats.latency.record(time.perf_counter() - start)
+
+        if r.status != expected_status:
+            stats.errors += 1
+            raise UnexpectedHTTPStatus(url, expected_status, r.status)
+
+        return LoadResponse(r.status, r.headers, body)
+
+
+class LoadReport:
+    MAX_FAILURE_SAMPLES = 5
+
+    def __init__(self, name: str):
+        self.name = name
+        self.endpoints = {}
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.failure_samples = []
+        self.started = None
+        self.finished = None
+
+    def merge(self, other: "LoadReport"):
+        for endpoint, stats in other.endpoints.items():
+            self.endpoints.setdefault(endpoint, EndpointStats()).merge(stats)
+        self.jobs += other.jobs
+        self.failed_jobs += other.failed_jobs
+        self.failure_samples.extend(other.failure_samples[:self.MAX_FAILURE_SAMPLES - len(self.failure_samples)])
+        if other.started is not None and (self.started is None or other.started < self.started):
+            self.started = other.started
+        if other.finished is not None and (self.finished is None or other.finished > self.finished):
+            self.finished = other.finished
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def errors(self) -> int:
+        return sum(s.errors for s in self.endpoints.values())
+
+    def rps(self, endpoint: str = None) -> float:
+        if self.elapsed == 0:
+            return 0.0
+        if endpoint:
+            return self.endpoints[endpoint].latency.count / self.elapsed
+        return sum(s.latency.count for s in self.endpoints.values()) / self.elapsed
+
+    def format(self) -> str:
+        lines = [
+            f"Load report: {self.name} ({self.jobs} jobs in {self.elapsed:.3f}s, {self.failed_jobs} failed, {self.rps():.1f} req/s)",
+            f"{'endpoint':<32} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50':>10} {'p95':>10} {'p99':>10}",
+        ]
+        for endpoint, stats in sorted(self.endpoints.items()):
+            lines.append(
+                f"{endpoint:<32} {stats.latency.count:>9} {stats.errors:>7} {self.rps(endpoint):>9.1f} "
+                f"{format_ms(stats.latency.percentile(50)):>10} {format_ms(stats.latency.percentile(95)):>10} "
+                f"{format_ms(stats.latency.percentile(99)):>10}"
+            )
+        for sample in self.failure_samples:
+            lines.append(f"Failure sample: {sample}")
+        return "\n".join(lines)
+
+    def raise_for_errors(self):
+        if self.failed_jobs > 0 or self.errors > 0:
+            raise AssertionError("Load run had errors\n" + self.format())
+
+
+async def _run_process_async(job, indices: range, base_url: str, concurrency: int, worker_id: int) -> LoadReport:
+    report = LoadReport("")
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(base_url=base_url, connector=connector, timeout=timeout) as session:
+        client = LoadClient(session, worker_id)
+        it = iter(indices)
+
+        async def worker():
+            for index in it:  # the iterator is shared between the workers, so each index is run once
+                report.jobs += 1
+                try:
+                    await job(client, index)
+                except Exception as e:
+                    report.failed_jobs += 1
+                    if len(report.failure_samples) < LoadReport.MAX_FAILURE_SAMPLES:
+                        report.failure_samples.append(f"job {index}: {e!r}\n{traceback.format_exc()}")
+
+        report.started = time.time()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        report.finished = time.time()
+
+    report.endpoints = client.stats
+    return report
+
+
+def _run_process(job, indices: range, base_url: str, concurrency: int, worker_id: int) -> LoadReport:
+    return asyncio.run(_run_process_async(job, indices, base_url, concurrency, worker_id))
+
+
+def run_load(job: Callable[[LoadClient, int], Awaitable], total: int, base_url: str, name: str = None,
+             processes: int = None, concurrency: int = 16) -> LoadReport:
+    """
+    Run job(client, index) for every index in range(total), spread over multiple processes, each of them running
+    `concurrency` jobs at once on a keep-alive connection pool.
+    The job must be a module level async function, so that it can be passed to other processes.
+    """
+    if processes is None:
+        processes = int(os.environ.get("LOAD_PROCESSES", os.cpu_count() or 1))
+    processes = max(1, min(processes, total))
+
+    report = LoadReport(name or job.__name__)
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes) as pool:
+        args = [(job, range(i, total, processes), base_url, concurrency, i) for i in range(processes)]
+        for process_report in pool.starmap(_run_process, args):
+            report.merge(process_report)
+
+    return report
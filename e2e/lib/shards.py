@@ -0,0 +1,97 @@
+import os
+import socket
+import subprocess
+import tempfile
+import time
+
+import requests
+
+# Shards are either spawned from a Tutter binary, or pre-started by hand (each one must use its own database or schema!)
+TUTTER_BIN = os.environ.get("TUTTER_BIN")
+TUTTER_WORKDIR = os.environ.get("TUTTER_WORKDIR")  # apidoc/ and dist/ are served relative to this
+SHARD_BASE_URLS = os.environ.get("SHARD_BASE_URLS")  # comma separated
+SHARD_SCHEMA_PREFIX = os.environ.get("SHARD_SCHEMA_PREFIX", "tutter_e2e_shard_")
+SHARD_MAX_CONNECTIONS = os.environ.get("SHARD_MAX_CONNECTIONS", "10")  # psql allows only 100 connections by default
+
+
+class ShardError(Exception):
+    pass
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Shard:
+    """
+    A single isolated Tutter instance. If the instance is spawned by us, it gets its own Postgres schema,
+    so cleaning up the database on one shard does not affect the others.
+    """
+
+    def __init__(self, index, base_url: str = None, env: dict = None):
+        self.index = index
+        self.base_url = base_url
+        self.env = env or {}  # extra configuration of a spawned instance
+        self.process = None
+        self.log_path = None
+
+    def start(self, debug_pin: str, timeout: float = 30):
+        if self.base_url:
+            return  # pre-started, nothing to do
+
+        port = _free_port()
+        env = dict(os.environ)
+        env.update({
+            "DEBUG": "true",
+            "DEBUG_PIN": debug_pin,
+            "BIND_ADDR": f"127.0.0.1:{port}",
+            "POSTGRESQL_SCHEMA": f"{SHARD_SCHEMA_PREFIX}{self.index}",
+            "POSTGRESQL_MAX_CONNECTIONS": SHARD_MAX_CONNECTIONS,
+        })
+        env.update(self.env)
+
+        self.log_path = os.path.join(tempfile.gettempdir(), f"tutter-e2e-shard-{self.index}.log")
+        workdir = TUTTER_WORKDIR or os.path.dirname(os.path.abspath(TUTTER_BIN))
+        with open(self.log_path, "wb") as log:
+            self.process = subprocess.Popen([os.path.abspath(TUTTER_BIN)], env=env, cwd=workdir,
+                                            stdout=log, stderr=subprocess.STDOUT)
+
+        self.base_url = f"http://127.0.0.1:{port}"
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise ShardError(f"Shard {self.index} exited with {self.process.returncode}, see {self.log_path}")
+            try:
+                requests.get(self.base_url + "/api/trending", timeout=1).raise_for_status()
+                return
+            except requests.exceptions.RequestException:
+                time.sleep(0.1)
+
+        self.stop()
+        raise ShardError(f"Shard {self.index} did not become ready in {timeout}s, see {self.log_path}")
+
+    def stop(self):
+        if not self.process:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+def create_shards(count: int) -> list:
+    if TUTTER_BIN:
+        return [Shard(i) for i in range(count)]
+
+    if SHARD_BASE_URLS:
+        urls = [u.strip() for u in SHARD_BASE_URLS.split(",") if u.strip()]
+        if len(urls) < count:
+            raise ShardError(f"{count} jobs requested, but only {len(urls)} urls are defined in SHARD_BASE_URLS")
+        return [Shard(i, url) for i, url in enumerate(urls[:count])]
+
+    raise ShardError("Running tests in parallel requires either TUTTER_BIN or SHARD_BASE_URLS to be set")
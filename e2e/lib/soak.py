@@ -0,0 +1,295 @@
+import asyncio
+import multiprocessing
+import random
+import resource
+import time
+
+import aiohttp
+
+from .stats import LatencyHistogram, format_ms
+
+# Every post created during the soak is tagged and authored from these small pools, so filtered pollers have
+# something to match. Pollers are evenly split between these filters.
+SOAK_AUTHOR_PREFIX = "soak_"
+SOAK_TAG_PREFIX = "soak"
+
+
+class SoakError(Exception):
+    pass
+
+
+def _raise_fd_limit():
+    # holding 10k+ connections needs a lot of file descriptors
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class PollerStats:
+
+    def __init__(self):
+        self.delay = LatencyHistogram()
+        self.deliveries = 0
+        self.early_deliveries = 0  # received before the poster got its 201 response
+        self.polls = 0
+        self.empty_polls = 0
+        self.errors = 0
+
+    def merge(self, other: "PollerStats"):
+        self.delay.merge(other.delay)
+        self.deliveries += other.deliveries
+        self.early_deliveries += other.early_deliveries
+        self.polls += other.polls
+        self.empty_polls += other.empty_polls
+        self.errors += other.errors
+
+
+class _PollerProcess:
+
+    def __init__(self, base_url: str, filters: list, last_id: int, created_times, stop_event, ready_counter):
+        self.base_url = base_url
+        self.filters = filters
+        self.last_id = last_id
+        self.first_soak_id = last_id + 1
+        self.created_times = created_times  # shared array: monotonic time of the 201 response by (post id - first soak id)
+        self.stop_event = stop_event
+        self.ready_counter = ready_counter
+        self.stats = PollerStats()
+        self._pending = []  # (post id, receive time) pairs that could not be matched with a 201 yet
+
+    def _resolve_pending(self, final: bool = False):
+        still_pending = []
+        for post_id, received in self._pending:
+            idx = post_id - self.first_soak_id
+            created = self.created_times[idx] if 0 <= idx < len(self.created_times) else 0.0
+            if created == 0.0:
+                if not final:
+                    still_pending.append((post_id, received))
+                continue
+            if received < created:
+                self.stats.early_deliveries += 1
+            self.stats.delay.record(max(received - created, 0.0))
+        self._pending = still_pending
+
+    async def _poller(self, session: aiohttp.ClientSession, params: dict):
+        last = self.last_id
+        while True:
+            self.stats.polls += 1
+            try:
+                async with session.get("/api/poll", params={**params, "last": str(last)}) as r:
+                    if r.status == 204:
+                        self.stats.empty_polls += 1
+                        continue
+                    if r.status != 200:
+                        self.stats.errors += 1
+                        await asyncio.sleep(0.1)
+                        continue
+                    posts = await r.json()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats.errors += 1
+                await asyncio.sleep(0.1)
+                continue
+
+            received = time.monotonic()
+            for post in posts:
+                if post["id"] > last:
+                    last = post["id"]
+                self.stats.deliveries += 1
+                self._pending.append((post["id"], received))
+
+    async def run(self, drain: float):
+        _raise_fd_limit()
+        connector = aiohttp.TCPConnector(limit=0, keepalive_timeout=180)
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(base_url=self.base_url, connector=connector, timeout=timeout) as session:
+            tasks = [asyncio.create_task(self._poller(session, f)) for f in self.filters]
+            with self.ready_counter.get_lock():
+                self.ready_counter.value += len(tasks)
+
+            while not self.stop_event.is_set():
+                await asyncio.sleep(0.5)
+                self._resolve_pending()
+
+            await asyncio.sleep(drain)  # let the last posts arrive
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self._resolve_pending(final=True)
+        return self.stats
+
+
+# shared objects can only be passed to pool processes when they are started
+_shared = {}
+
+
+def _init_poller_process(created_times, stop_event, ready_counter):
+    _shared["created_times"] = created_times
+    _shared["stop_event"] = stop_event
+    _shared["ready_counter"] = ready_counter
+
+
+def _run_poller_process(base_url, filters, last_id, drain) -> PollerStats:
+    p = _PollerProcess(base_url, filters, last_id, _shared["created_times"], _shared["stop_event"],
+                       _shared["ready_counter"])
+    return asyncio.run(p.run(drain))
+
+
+class SoakReport:
+
+    def __init__(self):
+        self.pollers = 0
+        self.posts = 0
+        self.duration = 0.0
+        self.expected_deliveries = 0
+        self.post_latency = LatencyHistogram()
+        self.post_errors = 0
+        self.stats = PollerStats()
+
+    @property
+    def missed_deliveries(self) -> int:
+        return self.expected_deliveries - self.stats.deliveries
+
+    def format(self) -> str:
+        d = self.stats.delay
+        return "\n".join([
+            f"Long-poll soak: {self.pollers} pollers, {self.posts} posts in {self.duration:.1f}s "
+            f"({self.posts / self.duration if self.duration else 0:.1f} posts/s, {self.post_errors} post errors)",
+            f"Post latency: p50 {format_ms(self.post_latency.percentile(50))}, "
+            f"p99 {format_ms(self.post_latency.percentile(99))}",
+            f"Deliveries: {self.stats.deliveries}/{self.expected_deliveries} ({self.missed_deliveries} missed, "
+            f"{self.stats.early_deliveries} before 201), polls: {self.stats.polls}, empty polls: {self.stats.empty_polls}, "
+            f"poll errors: {self.stats.errors}",
+            f"Fan-out delay (201 -> poller): p50 {format_ms(d.percentile(50))}, p90 {format_ms(d.percentile(90))}, "
+            f"p95 {format_ms(d.percentile(95))}, p99 {format_ms(d.percentile(99))}, p99.9 {format_ms(d.percentile(99.9))}, "
+            f"max {format_ms(d.max or 0.0)}",
+            d.format_table(),
+        ])
+
+
+async def _post_at_rate(base_url: str, authors: list, tags: list, rate: float, duration: float,
+                        created_times, first_soak_id: int, report: SoakReport) -> list:
+    """Returns the (author id, tag) of each post in order"""
+    total = min(int(rate * duration), len(created_times))
+    posted = []
+    connector = aiohttp.TCPConnector(limit=64)
+    async with aiohttp.ClientSession(base_url=base_url, connector=connector) as session:
+
+        async def post_one(i: int):
+            author_name, author_id = authors[i % len(authors)]
+            tag = tags[(i // len(authors)) % len(tags)]
+            start = time.monotonic()
+            try:
+                async with session.post("/api/post", json={"author": author_name, "text": f"#{tag} soak {i}"}) as r:
+                    body = await r.json() if r.status == 201 else None
+            except Exception:
+                report.post_errors += 1
+                return
+            now = time.monotonic()
+            if body is None:
+                report.post_errors += 1
+                return
+            report.post_latency.record(now - start)
+            idx = body["id"] - first_soak_id
+            if 0 <= idx < len(created_times):
+                created_times[idx] = now
+            posted.append((author_id, tag))
+
+        started = time.monotonic()
+        tasks = []
+        for i in range(total):
+            # posts are scheduled to absolute times, so slow responses do not lower the rate
+            delay = started + i / rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(post_one(i)))
+        await asyncio.gather(*tasks)
+        report.duration = time.monotonic() - started
+
+    return posted
+
+
+def run_longpoll_soak(base_url: str, pollers: int = 10000, filtered_ratio: float = 0.5, rate: float = 20,
+                      duration: float = 60, processes: int = 4, authors: int = 10, tags: int = 10,
+                      warmup: float = 5, drain: float = 5, ready_timeout: float = 120) -> SoakReport:
+    """
+    Hold `pollers` concurrent long-polls (`filtered_ratio` of them filtered by tag or author_id), post `rate` posts per
+    second for `duration` seconds and measure the delay between each post's 201 response and each poller receiving it.
+    Expects a clean database, as post ids must be consecutive. Fails if the pollers are not all polling within
+    `ready_timeout` seconds (e.g. a poller process died).
+    """
+    import requests  # the setup is done synchronously
+    _raise_fd_limit()
+    report = SoakReport()
+    report.pollers = pollers
+
+    # create the authors first, so that their ids are known for the filters
+    author_pool = []
+    last_id = 0
+    for i in range(authors):
+        name = f"{SOAK_AUTHOR_PREFIX}{i}"
+        r = requests.post(base_url + "/api/post", json={"author": name, "text": "warming up"})
+        r.raise_for_status()
+        author_pool.append((name, r.json()["author"]["id"]))
+        last_id = r.json()["id"]
+    tag_pool = [f"{SOAK_TAG_PREFIX}{i}" for i in range(tags)]
+
+    rnd = random.Random(1)
+    filters = []
+    for i in range(pollers):
+        if rnd.random() >= filtered_ratio:
+            filters.append({})
+        elif i % 2 == 0:
+            filters.append({"tag": rnd.choice(tag_pool)})
+        else:
+            filters.append({"author_id": str(rnd.choice(author_pool)[1])})
+
+    ctx = multiprocessing.get_context("spawn")
+    created_times = ctx.Array("d", int(rate * duration) + 1, lock=False)
+    stop_event = ctx.Event()
+    ready_counter = ctx.Value("i", 0)
+    processes = max(1, min(processes, pollers))
+
+    with ctx.Pool(processes, initializer=_init_poller_process,
+                  initargs=(created_times, stop_event, ready_counter)) as pool:
+        async_results = [
+            pool.apply_async(_run_poller_process, (base_url, filters[i::processes], last_id, drain))
+            for i in range(processes)
+        ]
+
+        deadline = time.monotonic() + ready_timeout
+        while ready_counter.value < pollers:
+            for r in async_results:
+                if r.ready():
+                    # a poller process finished before posting even started, that's surely an error
+                    r.get()  # raises it, if there was an exception
+                    raise SoakError("A poller process exited before all pollers were ready")
+            if time.monotonic() > deadline:
+                # a process killed outright (e.g. by the OOM killer) never reports back, the pool just replaces it
+                raise SoakError(f"Only {ready_counter.value} of {pollers} pollers were ready after {ready_timeout}s, "
+                                f"did a poller process die?")
+            time.sleep(0.1)
+        time.sleep(warmup)  # let the polls actually reach the server
+
+        posted = asyncio.run(_post_at_rate(base_url, author_pool, tag_pool, rate, duration, created_times,
+                                           last_id + 1, report))
+        stop_event.set()
+
+        for r in async_results:
+            report.stats.merge(r.get())
+
+    report.posts = len(posted)
+    unfiltered = sum(1 for f in filters if not f)
+    by_tag = {}
+    by_author = {}
+    for f in filters:
+        if "tag" in f:
+            by_tag[f["tag"]] = by_tag.get(f["tag"], 0) + 1
+        elif "author_id" in f:
+            by_author[int(f["author_id"])] = by_author.get(int(f["author_id"]), 0) + 1
+    for author_id, tag in posted:
+        report.expected_deliveries += unfiltered + by_tag.get(tag, 0) + by_author.get(author_id, 0)
+
+    return report
@@ -0,0 +1,35 @@
+import json
+from typing import Iterator
+
+import requests
+
+
+def iter_sse_events(response: requests.Response) -> Iterator[dict]:
+    """
+    Parse a Server-Sent Events stream (a response opened with stream=True), yielding events as {"id", "event", "data"} dicts
+    as soon as they arrive. Comments (like heartbeats) are skipped. The data of "post" events is decoded from JSON.
+    """
+    event = {}
+    data_lines = []
+    for raw_line in response.iter_lines(chunk_size=None):  # None: hand over the data as it arrives, don't wait for a full chunk
+        line = raw_line.decode("utf-8")
+        if line == "":
+            if data_lines:
+                event["data"] = "\n".join(data_lines)
+                if event.get("event") == "post":
+                    event["data"] = json.loads(event["data"])
+                yield event
+            event = {}
+            data_lines = []
+            continue
+
+        if line.startswith(":"):
+            continue
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            data_lines.append(value)
+        elif field in ("id", "event"):
+            event[field] = value
@@ -0,0 +1,91 @@
+import math
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram with ~2% relative error, so that it can take millions of samples in constant memory.
+    Histograms can be merged, which is needed to collect results from multiple processes.
+    All values are in seconds.
+    """
+
+    _BASE = 1e-6  # anything below 1us goes to the first bucket
+    _GROWTH = 1.02
+    _LOG_GROWTH = math.log(_GROWTH)
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value: float):
+        if value <= self._BASE:
+            idx = 0
+        else:
+            idx = int(math.log(value / self._BASE) / self._LOG_GROWTH) + 1
+
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        for idx, cnt in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + cnt
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    @property
+    def mean(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, p: float) -> float:
+        """p is in the 0-100 range, returns the upper bound of the bucket the percentile falls in"""
+        if self.count == 0:
+            return 0.0
+
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for idx in sorted(self.buckets.keys()):
+            seen += self.buckets[idx]
+            if seen >= rank:
+                return min(self._BASE * (self._GROWTH ** idx), self.max)
+
+        return self.max
+
+    def format_table(self, bounds: list = None) -> str:
+        """Text histogram, bucket counts are approximate just like percentiles"""
+        if bounds is None:
+            bounds = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10]
+
+        counts = [0] * (len(bounds) + 1)
+        for idx, cnt in self.buckets.items():
+            upper = self._BASE * (self._GROWTH ** idx)
+            for i, bound in enumerate(bounds):
+                if upper <= bound:
+                    counts[i] += cnt
+                    break
+            else:
+                counts[-1] += cnt
+
+        lines = []
+        widest = max(counts) or 1
+        for i, cnt in enumerate(counts):
+            label = f"<= {format_ms(bounds[i])}" if i < len(bounds) else f"> {format_ms(bounds[-1])}"
+            share = cnt / self.count * 100 if self.count else 0.0
+            lines.append(f"{label:>14} {cnt:>10} {share:6.2f}% {'#' * int(40 * cnt / widest)}")
+        return "\n".join(lines)
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f}ms"
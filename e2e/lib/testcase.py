@@ -1,5 +1,12 @@
 import os
+import time
 from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Iterable
+
+from .json_stream import iter_json_array
+from .json_tree_validate import compile_json_tree, JsonTreeError
+from .latency import LatencyRecorder
 
 import requests
 from requests_toolbelt.sessions import BaseUrlSession
@@ -16,14 +23,22 @@ class UnexpectedHTTPStatus(Exception):
 class TestCaseBase(ABC):
     priority = 0
 
-    def __init__(self):
-        self.base_url = BASE_URL
+    # The test fails if any of these are exceeded, e.g. {"GET /api/post/{id}": {"p99": 0.020}} (in seconds)
+    latency_budgets = {}
+
+    def __init__(self, base_url: str = None):
+        self.base_url = base_url or BASE_URL
         self.session = BaseUrlSession(self.base_url)
+        self.reports = []
+        self.latency = LatencyRecorder()
 
     def __call__(self, *args, **kwargs):
+        self.reports = []
+        self.latency = LatencyRecorder()
         self.reset_database()
         try:
             self.run()
+            self.latency.check_budgets(self.latency_budgets)
         finally:
             self.reset_database()
 
@@ -48,15 +63,64 @@ class TestCaseBase(ABC):
                                   cert=None,
                                   json=None
                                   ) -> requests.Response:
+        # when streaming, this is the time until the headers arrived
+        started = time.perf_counter()
         r = self.session.request(method, url, params=params, data=data, headers=headers, cookies=cookies, files=files,
                                  auth=auth, timeout=timeout, allow_redirects=allow_redirects, proxies=proxies,
                                  hooks=hooks, stream=stream, verify=verify, cert=cert, json=json)
+        self.latency.record(method, url, r.status_code, time.perf_counter() - started)
+        server_timing = r.headers.get("Server-Timing")
+        if server_timing:
+            self.latency.record_server_timing(method, url, server_timing)
 
         if r.status_code != expected_status:
             raise UnexpectedHTTPStatus(url, expected_status, r.status_code)
 
         return r
 
+    def expect_not_modified(self, url: str, params=None) -> str:
+        """
+        Get a resource, then revalidate it with the returned ETag, which must give a 304 without a body.
+        Returns the ETag, so it can be checked later whether it changed.
+        """
+        r = self.request_and_expect_status("GET", url, 200, params=params)
+        etag = r.headers.get("ETag")
+        assert etag, f"{url} should have an ETag"
+
+        r = self.request_and_expect_status("GET", url, 304, params=params, headers={"If-None-Match": etag})
+        assert r.headers.get("ETag") == etag, "304 should have the same ETag"
+        assert not r.content, "304 should not have a body"
+        return etag
+
+    def add_report(self, report: str):
+        """Reports are printed by run.py after the result of the test"""
+        self.reports.append(report)
+
+    def stream_json_array(self, method: str, url: str, expected_status: int, expected_item=None, params=None,
+                          headers=None, timeout=None, chunk_size: int = 65536) -> int:
+        """
+        Stream a (possibly huge) JSON array response, and validate each element against expected_item
+        (an expect_json_tree style tree, or an already compiled validator) as it arrives.
+        Memory usage is constant regardless of the size of the response. Returns the number of elements.
+        """
+        validator = None
+        if expected_item is not None:
+            validator = expected_item if callable(expected_item) else compile_json_tree(expected_item)
+
+        count = 0
+        with self.request_and_expect_status(method, url, expected_status, params=params, headers=headers,
+                                            timeout=timeout, stream=True) as r:
+            for item in iter_json_array(r, chunk_size=chunk_size):
+                if validator:
+                    try:
+                        validator(item)
+                    except JsonTreeError as e:
+                        e.prefix_key_hint(f"[{count}]")
+                        raise
+                count += 1
+
+        return count
+
     def reset_database(self):
         headers = {
             "X-Debug-Pin": DEBUG_PIN
@@ -74,3 +138,29 @@ class TestCaseBase(ABC):
 
         r = self.session.request(method, f"/api/debug/setTrending/{tag}", headers=headers)
         r.raise_for_status()
+
+    def seed(self, posts: Iterable[dict], chunk_size: int = 20000) -> dict:
+        """
+        Bulk load posts (usually a lib.fixtures.Dataset) using the debug seed endpoint, which is orders of magnitude
+        faster than creating them one-by-one. Posts are stored in order, with ids growing.
+        Returns the number of created posts, and the id of the first and the last one.
+        """
+        headers = {
+            "X-Debug-Pin": DEBUG_PIN
+        }
+        result = {"count": 0, "first_id": None, "last_id": None}
+        posts = iter(posts)
+        while True:
+            chunk = list(islice(posts, chunk_size))
+            if not chunk:
+                break
+
+            r = self.session.post("/api/debug/seed", json={"posts": chunk}, headers=headers)
+            r.raise_for_status()
+
+            result["count"] += r.json()["count"]
+            if result["first_id"] is None:
+                result["first_id"] = r.json()["first_id"]
+            result["last_id"] = r.json()["last_id"]
+
+        return result
@@ -1,14 +1,20 @@
+import argparse
+import multiprocessing
+import queue
 import sys
 import time
 import traceback
 
 from lib import TestCaseBase
+from lib.testcase import DEBUG_PIN
+from lib.latency import LatencyRecorder
+from lib.shards import create_shards
 from inspect import isclass
 import pkgutil
 from importlib import import_module
 
 
-def load_tests() -> list:
+def load_tests(base_url: str = None) -> list:
     modules = []
 
     for _, name, is_pkg in pkgutil.walk_packages(["tests"]):
@@ -33,7 +39,7 @@ def load_tests() -> list:
                 # Add the class to this package's variables
                 globals()[attribute_name] = attribute
 
-                instance = attribute()  # create new instance
+                instance = attribute(base_url)  # create new instance
 
                 modules.append(
                     instance
@@ -44,65 +50,178 @@ def load_tests() -> list:
     return modules
 
 
-def main():
-    print("Running Tutter e2e tests...")
-    print("=============")
-    passed = 0
-    failed = 0
-    total = 0
-    tests = load_tests()
-    if len(sys.argv) > 1:
-        selected_tests = list(filter(lambda t: t.__class__.__name__ in sys.argv[1:], tests))
+def run_test(test) -> dict:
+    test_case_started = time.time()
+    success = True
+    post_info = None
+    try:
+        test()
+    except KeyboardInterrupt:
+        raise
+    except Exception as e:
+        success = False
+        tb = traceback.format_exc()
+        post_info = f"""
+Exception: {e}
+
+{tb}
+"""
+
+    return {
+        "name": test.__class__.__name__,
+        "success": success,
+        "time": time.time() - test_case_started,
+        "post_info": post_info,
+        "reports": list(test.reports),
+        "latency": test.latency,
+    }
+
+
+def print_result(result: dict, latency: bool = False):
+    if result["success"]:
+        print("PASS", end="")
     else:
-        selected_tests = tests
+        print("FAIL", end="")
 
-    assert len(selected_tests) <= len(tests)
+    print(f" ({result['time']:.3f}s)")
 
-    total_start_time = time.time()
+    for report in result["reports"]:
+        print(report)
+
+    if latency and result["latency"]:
+        print(result["latency"].format_table())
+        phases = result["latency"].format_phase_table()
+        if phases:
+            print(phases)
+
+    if result["post_info"]:
+        print(result["post_info"])
+        print("---------------------------------")
+
+
+def run_sequential(selected_tests: list, latency: bool = False) -> list:
+    results = []
     for test in selected_tests:
-        test_name = test.__class__.__name__
-        total += 1
-        print(f"[{total}/{len(selected_tests)}]", test_name, "...", end="", flush=True)
-        test_case_started = time.time()
-        success = True
-        post_info = None
-        try:
-            test()
-        except KeyboardInterrupt:
-            raise
-        except Exception as e:
-            success = False
-            tb = traceback.format_exc()
-            post_info = f"""
-Exception: {e}
+        print(f"[{len(results) + 1}/{len(selected_tests)}]", test.__class__.__name__, "...", end="", flush=True)
+        result = run_test(test)
+        print_result(result, latency)
+        results.append(result)
+    return results
+
+
+def shard_worker(shard_index: int, base_url: str, test_queue, result_queue):
+    tests = {t.__class__.__name__: t for t in load_tests(base_url)}
+    while True:
+        test_name = test_queue.get()
+        if test_name is None:
+            break
+        result = run_test(tests[test_name])
+        result["shard"] = shard_index
+        result_queue.put(result)
+
+
+def run_parallel(selected_tests: list, jobs: int, latency: bool = False) -> list:
+    shards = create_shards(jobs)
+    ctx = multiprocessing.get_context("spawn")
+    test_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    workers = []
+    results = []
+
+    try:
+        for shard in shards:
+            shard.start(DEBUG_PIN)
+            print(f"Shard {shard.index} is running at {shard.base_url}")
+        print("=============")
+
+        # tests are picked up by whichever worker is free first, but still in the order of their priority
+        for test in selected_tests:
+            test_queue.put(test.__class__.__name__)
+        for _ in shards:
+            test_queue.put(None)
+
+        for shard in shards:
+            w = ctx.Process(target=shard_worker, args=(shard.index, shard.base_url, test_queue, result_queue))
+            w.start()
+            workers.append(w)
+
+        while len(results) < len(selected_tests):
+            if not any(w.is_alive() for w in workers) and result_queue.empty():
+                raise RuntimeError("All shard workers exited before running all tests")
+            try:
+                result = result_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            results.append(result)
+            print(f"[{len(results)}/{len(selected_tests)}]", result["name"], f"(shard {result['shard']})", "...", end="")
+            print_result(result, latency)
+
+    finally:
+        for w in workers:
+            if w.is_alive():
+                w.terminate()
+            w.join()
+        for shard in shards:
+            shard.stop()
+
+    return results
 
-{tb}
-"""
 
-        test_case_time = time.time() - test_case_started
+def main():
+    parser = argparse.ArgumentParser(description="Run Tutter e2e tests")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of tests to run in parallel, each one against its own isolated instance")
+    parser.add_argument("-l", "--latency", action="store_true",
+                        help="print the latency table of each test too, not just the one of the whole run")
+    parser.add_argument("tests", nargs="*", help="name of the tests to run (default: all)")
+    args = parser.parse_args()
 
-        if success:
-            print("PASS", end="")
-            passed += 1
-        else:
-            print("FAIL", end="")
-            failed += 1
+    if args.jobs < 1:
+        parser.error("jobs must be a positive number")
 
-        print(f" ({test_case_time:.3f}s)")
+    print("Running Tutter e2e tests...")
+    print("=============")
+    tests = load_tests()
+    if args.tests:
+        selected_tests = list(filter(lambda t: t.__class__.__name__ in args.tests, tests))
+    else:
+        selected_tests = tests
 
-        if post_info:
-            print(post_info)
-            print("---------------------------------")
+    assert len(selected_tests) <= len(tests)
 
+    total_start_time = time.time()
+    if args.jobs > 1:
+        results = run_parallel(selected_tests, min(args.jobs, max(len(selected_tests), 1)), args.latency)
+    else:
+        results = run_sequential(selected_tests, args.latency)
     total_test_time = time.time() - total_start_time
+
+    total = len(results)
+    passed = len([r for r in results if r["success"]])
+    failed = total - passed
     assert total == len(selected_tests)
-    assert passed + failed == total
+
+    run_latency = LatencyRecorder()
+    for r in results:
+        run_latency.merge(r["latency"])
 
     print("=============")
+    if run_latency:
+        print(run_latency.format_table())
+        print("=============")
+    phases = run_latency.format_phase_table()
+    if phases:
+        print("Server side timings:")
+        print(phases)
+        print("=============")
     print(f"Total time: {total_test_time:.3f} seconds")
+    if args.jobs > 1:
+        print(f"Cumulative test time: {sum(r['time'] for r in results):.3f} seconds")
     print("Tests run:", total)
     print("Failed tests:", failed)
     print("Passed tests:", passed)
+    if failed > 0 and args.jobs > 1:
+        print("Failed:", ", ".join(r["name"] for r in results if not r["success"]))
     print("=============")
     if failed > 0:
         print("FAIL")
@@ -0,0 +1,107 @@
+import argparse
+import os
+import pkgutil
+import sys
+import time
+from importlib import import_module
+from inspect import isclass
+
+from lib.bench import BenchScenario, load_baseline, save_baseline, compare_to_baseline
+from run import run_test, print_result
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+
+def load_scenarios() -> list:
+    scenarios = []
+
+    for _, name, is_pkg in pkgutil.walk_packages(["bench"]):
+        if is_pkg or not name.startswith("scenario_"):
+            continue
+
+        module = import_module("bench." + name)
+
+        for attribute_name in dir(module):
+            attribute = getattr(module, attribute_name)
+            if isclass(attribute) and issubclass(attribute, BenchScenario) and attribute is not BenchScenario:
+                scenarios.append(attribute())
+
+    scenarios.sort(key=lambda s: s.__class__.__name__)
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Tutter benchmarks and compare them to a stored baseline")
+    parser.add_argument("-i", "--iterations", type=int, default=None,
+                        help="number of measured iterations per scenario (default: set by the scenario)")
+    parser.add_argument("-b", "--baseline", default=DEFAULT_BASELINE, help="path of the baseline file")
+    parser.add_argument("-s", "--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("-t", "--threshold", type=float, default=0.15,
+                        help="relative change of a metric in the wrong direction that counts as a regression")
+    parser.add_argument("scenarios", nargs="*", help="name of the scenarios to run (default: all)")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios()
+    if args.scenarios:
+        scenarios = [s for s in scenarios if s.__class__.__name__ in args.scenarios]
+    if args.iterations is not None:
+        if args.iterations < 1:
+            parser.error("iterations must be a positive number")
+        for s in scenarios:
+            s.iterations = args.iterations
+
+    print("Running Tutter benchmarks...")
+    print("=============")
+    total_start_time = time.time()
+    failed = []
+    for i, scenario in enumerate(scenarios):
+        print(f"[{i + 1}/{len(scenarios)}]", scenario.__class__.__name__, "...", end="", flush=True)
+        result = run_test(scenario)
+        print_result(result)
+        if not result["success"]:
+            failed.append(result["name"])
+
+    results = {s.__class__.__name__: s.results for s in scenarios if s.__class__.__name__ not in failed}
+    baseline = load_baseline(args.baseline) if os.path.exists(args.baseline) else {}
+    comparisons = compare_to_baseline(results, baseline, {s.__class__.__name__: s for s in scenarios},
+                                      args.threshold)
+
+    print("=============")
+    print(f"Total time: {time.time() - total_start_time:.3f} seconds")
+    if not baseline:
+        print(f"No baseline found at {args.baseline}, nothing to compare to")
+    print(f"{'Scenario':<28} {'Metric':<20} {'Baseline':>12} {'Current':>12} {'Unit':<8} {'Change':>9} Status")
+    for c in comparisons:
+        print(c.format())
+
+    regressions = [c for c in comparisons if c.regressed]
+    print("=============")
+    if failed:
+        print("Failed scenarios:", ", ".join(failed))
+    if regressions:
+        print("Regressed metrics:", ", ".join(f"{c.scenario}.{c.metric}" for c in regressions))
+
+    if args.save:
+        if failed:
+            print("Not saving baseline, because some scenarios failed")
+        else:
+            # keep the metrics of the scenarios that were not run this time
+            baseline.update(results)
+            save_baseline(args.baseline, baseline)
+            print(f"Baseline saved to {args.baseline}")
+
+    # saving a new baseline means the regressions were accepted
+    success = not failed and (not regressions or args.save)
+    print("=============")
+    if not success:
+        print("FAIL")
+    else:
+        print("GREAT SUCCESS")
+    print("=============")
+
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import argparse
+
+from lib import TestCaseBase
+from lib.soak import run_longpoll_soak
+
+
+class _Cleaner(TestCaseBase):
+    def run(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-poll soak benchmark: measures the fan-out delay of new posts")
+    parser.add_argument("--pollers", type=int, default=10000, help="number of concurrent long-polls")
+    parser.add_argument("--filtered-ratio", type=float, default=0.5,
+                        help="ratio of the pollers filtered by tag or author_id")
+    parser.add_argument("--rate", type=float, default=20, help="posts per second")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to post for")
+    parser.add_argument("--processes", type=int, default=4, help="number of processes holding the pollers")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds to wait after all pollers are started")
+    args = parser.parse_args()
+
+    print("Running Tutter long-poll soak...")
+    print("=============")
+    cleaner = _Cleaner()
+    cleaner.reset_database()  # post ids must be consecutive during the soak
+    try:
+        report = run_longpoll_soak(cleaner.base_url, pollers=args.pollers, filtered_ratio=args.filtered_ratio,
+                                   rate=args.rate, duration=args.duration, processes=args.processes,
+                                   warmup=args.warmup)
+    finally:
+        cleaner.reset_database()
+    print(report.format())
+    print("=============")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+from lib.json_tree_validate import JsonTreeValueMismatchError
+from lib.load import run_load, LoadClient
+from lib import TestCaseBase
+
+SHARED_AUTHORS = 8
+SHARED_TAGS = 8
+ROUNDS = 50
+
+
+# Jobs of the load engine must be module level functions, so they can be run in other processes.
+# Every job of a round uses the same authors and tags, and the first round uses all of them for the first time at once
+async def create_post_with_shared_names(client: LoadClient, i: int):
+    author = f"shared{i % SHARED_AUTHORS}"
+    tags = sorted({f"fresh{i % SHARED_TAGS}", f"fresh{(i + 3) % SHARED_TAGS}", "everyone"})
+    post = {
+        "author": author,
+        "text": f"post {i} " + " ".join(f"#{t}" for t in tags),
+    }
+
+    r = await client.request("POST", "/api/post", 201, endpoint="POST /api/post", json=post)
+    created = r.json()
+    if created["author"]["name"] != author:
+        raise JsonTreeValueMismatchError(".author.name", created["author"]["name"], author)
+    if sorted(created["tags"]) != tags:
+        raise JsonTreeValueMismatchError(".tags", sorted(created["tags"]), tags)
+
+
+class ConcurrentFirstUse(TestCaseBase):
+    priority = -1
+
+    def run(self):
+        total = SHARED_AUTHORS * ROUNDS
+
+        report = run_load(create_post_with_shared_names, total, self.base_url, name="create posts with shared names")
+        self.add_report(report.format())
+        report.raise_for_errors()
+
+        # every author and tag must exist exactly once
+        r = self.request_and_expect_status("GET", "/api/author", 200)
+        names = [a['name'] for a in r.json()]
+        assert sorted(names) == sorted(f"shared{i}" for i in range(SHARED_AUTHORS)), names
+
+        r = self.request_and_expect_status("GET", "/api/tag", 200)
+        tags = [t['tag'] for t in r.json()]
+        assert sorted(tags) == sorted([f"fresh{i}" for i in range(SHARED_TAGS)] + ["everyone"]), tags
+
+        # and have all of their posts
+        for i in range(SHARED_AUTHORS):
+            r = self.request_and_expect_status("GET", "/api/author", 200, params={"name": f"shared{i}"})
+            author_id = r.json()[0]['id']
+            r = self.request_and_expect_status("GET", f"/api/author/{author_id}", 200)
+            assert len(r.json()['posts']) == total // SHARED_AUTHORS
+
+        r = self.request_and_expect_status("GET", "/api/tag/everyone", 200)
+        assert len(r.json()['posts']) == total
+
+        for i in range(SHARED_TAGS):
+            expected = sum(1 for j in range(total) if f"fresh{i}" in {f"fresh{j % SHARED_TAGS}", f"fresh{(j + 3) % SHARED_TAGS}"})
+            r = self.request_and_expect_status("GET", f"/api/tag/fresh{i}", 200)
+            assert len(r.json()['posts']) == expected
+
+        r = self.request_and_expect_status("GET", "/api/post", 200)
+        assert len(r.json()) == total
@@ -0,0 +1,48 @@
+from lib import TestCaseBase
+
+
+class TestConditionalGet(TestCaseBase):
+
+    def create_post(self, author: str, text: str) -> dict:
+        return self.request_and_expect_status("POST", "/api/post", 201, json={"author": author, "text": text}).json()
+
+    def run(self):
+        first = self.create_post("etag", "first #cached")
+
+        listing = self.expect_not_modified("/api/post")
+        filtered = self.expect_not_modified("/api/post", params={"tag": "cached", "order": "desc"})
+        tag = self.expect_not_modified("/api/tag/cached")
+        author = self.expect_not_modified(f"/api/author/{first['author']['id']}")
+        trending = self.expect_not_modified("/api/trending")
+
+        # every listing is validated on its own
+        assert len({listing, filtered, tag, author}) == 4
+
+        # the order of the query params does not matter
+        r = self.request_and_expect_status("GET", "/api/post?order=desc&tag=cached", 200)
+        assert r.headers["ETag"] == filtered
+        r = self.request_and_expect_status("GET", "/api/post?tag=cached&order=desc", 304,
+                                           headers={"If-None-Match": filtered})
+
+        # one of multiple ETags matching is enough
+        self.request_and_expect_status("GET", "/api/post", 304, headers={"If-None-Match": f'W/"nope", {listing}'})
+        self.request_and_expect_status("GET", "/api/post", 200, headers={"If-None-Match": 'W/"nope"'})
+
+        # a new post changes the listings, even the ones it does not appear in
+        self.create_post("somebody", "second #other")
+        for url, etag in [("/api/post", listing), ("/api/tag/cached", tag), (f"/api/author/{first['author']['id']}", author)]:
+            r = self.request_and_expect_status("GET", url, 200, headers={"If-None-Match": etag})
+            assert r.headers["ETag"] != etag
+        r = self.request_and_expect_status("GET", "/api/post", 200, headers={"If-None-Match": listing})
+        assert len(r.json()) == 2
+
+        # the trending tags have their own version, which changes with the list
+        self.request_and_expect_status("GET", "/api/trending", 304, headers={"If-None-Match": trending})
+        self.set_trending_tag("cached", True)
+        r = self.request_and_expect_status("GET", "/api/trending", 200, headers={"If-None-Match": trending})
+        assert r.json() == ["cached"]
+        assert r.headers["ETag"] != trending
+
+        # errors are not validated
+        r = self.request_and_expect_status("GET", "/api/tag/nonexistent", 404)
+        assert "ETag" not in r.headers
@@ -1,8 +1,61 @@
 import random
 import string
-from lib.json_tree_validate import expect_json_tree, MagicExists, MagicAnyNumeric
+from lib.json_tree_validate import compile_json_tree, JsonTreeValueMismatchError, MagicExists, MagicAnyNumeric, \
+    MagicAnyString
+from lib.load import run_load, LoadClient
 from lib import TestCaseBase
-import threading
+
+# Jobs of the load engine must be module level functions, so they can be run in other processes.
+# The shapes are compiled only once, the values that change between posts are checked by hand
+_validate_created_post = compile_json_tree({
+    "id": MagicAnyNumeric(),  # we can not verify it because we are running concurrently
+    "created_at": MagicExists(),
+    "text": MagicAnyString(),
+    "author": {
+        "id": MagicAnyNumeric(),
+        "name": MagicAnyString(),
+        "first_seen": MagicExists()
+    },
+    "tags": MagicExists()
+})
+
+_validate_verified_post = compile_json_tree({
+    "id": MagicAnyNumeric(),
+    "created_at": MagicExists(),
+    "text": MagicExists(),
+    "author": {
+        "id": MagicAnyNumeric(),
+        "name": MagicExists(),
+        "first_seen": MagicExists()
+    },
+    "tags": MagicExists()
+})
+
+
+async def create_post(client: LoadClient, i: int):
+    unique_author_name = str(i) + "_" + ''.join(random.choices(string.ascii_lowercase + string.digits, k=15))
+
+    post = {
+        "author": unique_author_name,
+        "text": ''.join(random.choices(string.ascii_letters, k=160))
+    }
+
+    r = await client.request("POST", "/api/post", 201, endpoint="POST /api/post", json=post)
+    created = r.json()
+    _validate_created_post(created)
+    if created["text"] != post["text"]:
+        raise JsonTreeValueMismatchError(".text", created["text"], post["text"])
+    if created["author"]["name"] != post["author"]:
+        raise JsonTreeValueMismatchError(".author.name", created["author"]["name"], post["author"])
+
+
+async def verify_post(client: LoadClient, i: int):
+    id_ = i + 1
+    r = await client.request("GET", f"/api/post/{id_}", 200, endpoint="GET /api/post/{id}")
+    got = r.json()
+    _validate_verified_post(got)
+    if got["id"] != id_:
+        raise JsonTreeValueMismatchError(".id", got["id"], id_)
 
 
 class CreateHugeAmountOfPosts(TestCaseBase):
@@ -12,113 +65,18 @@ class CreateHugeAmountOfPosts(TestCaseBase):
 
     priority = -2
 
-    class CreatorThread(threading.Thread):
-        def __init__(self, testcase, id, amount:int):
-            super().__init__()
-            self._amount = amount
-            self._id = id
-
-            self.testcase: TestCaseBase = testcase
-
-            self.exc = None
-
-        def _protected_run(self):
-            for i in range(self._amount):
-                unique_author_name = str(self._id) + "_" + str(i) + "_" + ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(15))
-
-                post = {
-                    "author": unique_author_name,
-                    "text": ''.join(random.choice(string.ascii_letters) for _ in range(160))
-                }
-
-                expected_author = {
-                    "id": MagicAnyNumeric(),
-                    "name": post['author'],
-                    "first_seen": MagicExists()
-                }
-
-                expected_post = {
-                    "id": MagicAnyNumeric(),  # we can no longer verify it because we are running multi-threaded
-                    "created_at": MagicExists(),
-                    "text": post['text'],
-                    "author": expected_author,
-                    "tags": MagicExists()
-                }
-
-                r = self.testcase.request_and_expect_status("POST", "/api/post", 201, json=post)
-                expect_json_tree(r.json(), expected_post)
-
-        def run(self):
-            try:
-                self._protected_run()
-            except Exception as e:
-                self.exc = e
-
-    class VerifierThread(threading.Thread):
-        def __init__(self, testcase, id, start:int, end:int):
-            super().__init__()
-            self._start = start # incl
-            self._end = end # excl
-            self._id = id
-
-            self.testcase: TestCaseBase = testcase
-
-            self.exc = None
-
-        def _protected_run(self):
-            for i in range(self._start, self._end):
-                id_ = i + 1
-                expected_post = {
-                    "id": id_,
-                    "created_at": MagicExists(),
-                    "text": MagicExists(),
-                    "author": {
-                        "id": MagicAnyNumeric(),
-                        "name": MagicExists(),
-                        "first_seen": MagicExists()
-                    },
-                    "tags": MagicExists()
-                }
-                r = self.testcase.request_and_expect_status("GET", f"/api/post/{id_}", 200)
-                expect_json_tree(r.json(), expected_post)
-
-        def run(self):
-            try:
-                self._protected_run()
-            except Exception as e:
-                self.exc = e
-
-
     def run(self):
-        expected_number = 65536 + 64 # should break stuff
-        thread_count = 16
-        chunk_size = int(expected_number / thread_count)
-
-        assert chunk_size*thread_count == expected_number
-
-        threads = []
-        for i in range(thread_count):
-            t = CreateHugeAmountOfPosts.CreatorThread(self, i, chunk_size)
-            threads.append(t)
-            t.start()
-
-        for t in threads:
-            t.join()
-            if t.exc:
-                raise t.exc
-
-        threads = []
-        for i in range(thread_count):
-            t = CreateHugeAmountOfPosts.VerifierThread(self, i, i*chunk_size, (i+1)*chunk_size)
-            threads.append(t)
-            t.start()
+        expected_number = 65536 + 64  # should break stuff
 
-        for t in threads:
-            t.join()
-            if t.exc:
-                raise t.exc
+        report = run_load(create_post, expected_number, self.base_url, name="create posts")
+        self.add_report(report.format())
+        report.raise_for_errors()
 
+        report = run_load(verify_post, expected_number, self.base_url, name="verify posts")
+        self.add_report(report.format())
+        report.raise_for_errors()
 
         for _ in range(5):
-            r = self.request_and_expect_status("GET", f"/api/post", 200)
-            assert len(r.json()) == expected_number, "Could not retrieve all posts created"
+            # the response is validated as it arrives, instead of loading all the posts in memory
+            count = self.stream_json_array("GET", f"/api/post", 200, expected_item=_validate_verified_post)
+            assert count == expected_number, "Could not retrieve all posts created"
@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+
+import requests
+from requests_toolbelt.sessions import BaseUrlSession
+
+from lib import TestCaseBase
+from lib.json_tree_validate import expect_json_tree
+from lib.testcase import DEBUG_PIN
+
+# A second Tutter instance using the same database (and schema), e.g. started with BIND_ADDR=:8081
+REPLICA_BASE_URL = os.environ.get("REPLICA_BASE_URL")
+
+
+class CrossReplicaLongPoll(TestCaseBase):
+    priority = -1
+
+    # way below the safety net DB polling interval, so this only passes if the replicas notify each other
+    max_delivery_time = 5
+
+    def run(self):
+        if not REPLICA_BASE_URL:
+            self.add_report("Skipped: REPLICA_BASE_URL is not set")
+            return
+
+        replica = BaseUrlSession(REPLICA_BASE_URL)
+        # the replica's observer remembers the last post from before the cleanup, it has to be reset as well
+        replica.post("/api/debug/cleanup", headers={"X-Debug-Pin": DEBUG_PIN}).raise_for_status()
+
+        polled_r: requests.Response | None = None
+        polled_at = None
+
+        def long_wait():
+            nonlocal polled_r, polled_at
+            polled_r = replica.get("/api/poll?last=0", timeout=self.max_delivery_time + 10)
+            polled_at = time.monotonic()
+
+        t = threading.Thread(target=long_wait)
+        t.start()
+        time.sleep(1)
+
+        post = {
+            "author": "replicated",
+            "text": "hello from the other side #replica"
+        }
+        r = self.request_and_expect_status("POST", "/api/post", 201, json=post)
+        created_at = time.monotonic()
+        created_post = r.json()
+
+        t.join()
+        assert polled_r.status_code == 200, f"Unexpected status from the replica: {polled_r.status_code}"
+        assert len(polled_r.json()) == 1
+        expect_json_tree(polled_r.json()[0], created_post)
+        delay = polled_at - created_at
+        assert delay < self.max_delivery_time, f"Post reached the replica in {delay:.2f}s"
+        self.add_report(f"Post reached the replica in {delay * 1000:.1f}ms")
+
+        # a filtered poll on the replica should only wake up for the matching post
+        polled_r = None
+
+        def filtered_wait():
+            nonlocal polled_r
+            polled_r = replica.get(f"/api/poll?last={created_post['id']}&tag=replica2",
+                                   timeout=self.max_delivery_time + 10)
+
+        t = threading.Thread(target=filtered_wait)
+        t.start()
+        time.sleep(1)
+
+        self.request_and_expect_status("POST", "/api/post", 201, json={"author": "replicated", "text": "no tags"})
+        r = self.request_and_expect_status("POST", "/api/post", 201,
+                                           json={"author": "replicated", "text": "tagged #replica2"})
+        matching_post = r.json()
+
+        t.join()
+        assert polled_r.status_code == 200
+        assert len(polled_r.json()) == 1
+        expect_json_tree(polled_r.json()[0], matching_post)
+
+        replica.post("/api/debug/cleanup", headers={"X-Debug-Pin": DEBUG_PIN}).raise_for_status()
@@ -8,5 +8,6 @@ class TestDebugInaccessible(TestCaseBase):
     def run(self):
         # Debug pin is not set for the request_and_expect_status, so debug calls should fail
         self.request_and_expect_status("POST", "/api/debug/cleanup", 401)
+        self.request_and_expect_status("POST", "/api/debug/seed", 401, json={"posts": [{"author": "a", "text": "a"}]})
         self.request_and_expect_status("PUT", "/api/debug/setTrending/asd", 401)
         self.request_and_expect_status("DELETE", "/api/debug/setTrending/asd", 401)
@@ -1,5 +1,6 @@
 from lib.json_tree_validate import expect_json_tree
 from lib import TestCaseBase
+from lib.fixtures import SlidingTagsDataset
 
 
 class FillFilter(TestCaseBase):
@@ -8,22 +9,11 @@ class FillFilter(TestCaseBase):
 
         authors = ['a', 'b', 'c']
         tags = ['a', 'b', 'c', 'd', 'e', 'f']
-        total_posts = 0
-        posts_by_authors = {}.fromkeys(authors, 0)
-        posts_by_tags = {}.fromkeys(tags, 0)
-
-        for author in authors:
-            for i in range(len(tags) - 2):
-                total_posts += 1
-                posts_by_authors[author] += 1
-                posts_by_tags[tags[i]] += 1
-                posts_by_tags[tags[i + 1]] += 1
-                posts_by_tags[tags[i + 2]] += 1
-                post = {
-                    "author": author,
-                    "text": f"#{tags[i]} #{tags[i + 1]} #{tags[i + 2]}"
-                }
-                self.request_and_expect_status("POST", "/api/post", 201, json=post)
+        dataset = SlidingTagsDataset(authors, tags)
+        self.seed(dataset)
+        total_posts = dataset.total_posts
+        posts_by_authors = dataset.posts_by_authors
+        posts_by_tags = dataset.posts_by_tags
 
         r = self.request_and_expect_status("GET", "/api/post", 200)
         assert len(r.json()) == total_posts
@@ -0,0 +1,92 @@
+import os
+import threading
+
+from requests_toolbelt.sessions import BaseUrlSession
+
+from lib import TestCaseBase
+from lib.json_tree_validate import JsonTreeValueMismatchError
+from lib.load import run_load, LoadClient
+from lib.shards import Shard, TUTTER_BIN
+from lib.sse import iter_sse_events
+from lib.testcase import DEBUG_PIN
+
+# An instance with group commit enabled, either started by hand (with its own database or schema!),
+# or spawned from TUTTER_BIN with its own schema
+BATCH_BASE_URL = os.environ.get("BATCH_BASE_URL")
+BATCH_ENV = {"POST_BATCH_WINDOW": "20", "POST_BATCH_SIZE": "50"}
+
+POSTS = 600
+
+
+# Jobs of the load engine must be module level functions, so they can be run in other processes.
+# The id returned must belong to the post that was sent, the ids of a batch must not get mixed up
+async def create_and_check_post(client: LoadClient, i: int):
+    text = f"batched post {i} #batch{i % 7}"
+    r = await client.request("POST", "/api/post", 201, endpoint="POST /api/post",
+                             json={"author": f"batcher{i % 13}", "text": text})
+    created = r.json()
+    if created["text"] != text:
+        raise JsonTreeValueMismatchError(".text", created["text"], text)
+
+    r = await client.request("GET", f"/api/post/{created['id']}", 200, endpoint="GET /api/post/{id}")
+    stored = r.json()
+    if stored["text"] != text:
+        raise JsonTreeValueMismatchError(".text", stored["text"], text)
+
+
+class GroupCommit(TestCaseBase):
+    priority = -1
+
+    def run(self):
+        shard = None
+        if BATCH_BASE_URL:
+            base_url = BATCH_BASE_URL
+        elif TUTTER_BIN:
+            shard = Shard("group_commit", env=BATCH_ENV)
+            shard.start(DEBUG_PIN)
+            base_url = shard.base_url
+        else:
+            self.add_report("Skipped: neither BATCH_BASE_URL nor TUTTER_BIN is set")
+            return
+
+        try:
+            self.run_batched(base_url)
+        finally:
+            if shard:
+                shard.stop()
+
+    def run_batched(self, base_url: str):
+        batched = BaseUrlSession(base_url)
+        batched.post("/api/debug/cleanup", headers={"X-Debug-Pin": DEBUG_PIN}).raise_for_status()
+
+        # everything committed must reach the observer, in id order
+        streamed_ids = []
+        stream = batched.get("/api/stream?last=0", stream=True, timeout=30)
+        stream.raise_for_status()
+
+        def follow():
+            for event in iter_sse_events(stream):
+                if event.get("event") == "post":
+                    streamed_ids.append(event["data"]["id"])
+                    if len(streamed_ids) == POSTS:
+                        return
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+
+        report = run_load(create_and_check_post, POSTS, base_url, name="create posts in batches", concurrency=32)
+        self.add_report(report.format())
+        report.raise_for_errors()
+
+        follower.join(timeout=30)
+        stream.close()
+        assert streamed_ids == list(range(1, POSTS + 1)), f"{len(streamed_ids)} posts were streamed, out of order or with gaps"
+
+        # every post got its own id, with nothing lost or stored twice
+        r = batched.get("/api/post", params={"order": "asc"})
+        r.raise_for_status()
+        posts = r.json()
+        assert [p["id"] for p in posts] == list(range(1, POSTS + 1))
+        assert sorted(p["text"] for p in posts) == sorted(f"batched post {i} #batch{i % 7}" for i in range(POSTS))
+
+        batched.post("/api/debug/cleanup", headers={"X-Debug-Pin": DEBUG_PIN}).raise_for_status()
@@ -0,0 +1,27 @@
+import json
+
+from lib import TestCaseBase
+from lib.json_stream import iter_json_array
+
+# Values that decode fine when cut short, so they must not be decoded until the delimiter after them is read
+VALUES = [456.5, -0.25, 1e-7, 12345678901234567890, 3.0e10, True, False, None, 0, "a, string", {"x": [1.5, None]}, [True, -2]]
+
+
+class _FakeResponse:
+    encoding = "utf-8"
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class JsonStreamChunkBoundaries(TestCaseBase):
+    def run(self):
+        for separators in [(",", ":"), (", ", ": ")]:
+            body = json.dumps(VALUES, separators=separators).encode()
+            for chunk_size in range(1, len(body) + 1):
+                got = list(iter_json_array(_FakeResponse(body), chunk_size=chunk_size))
+                assert got == VALUES, f"chunk size {chunk_size} ({separators!r}): {got!r}"
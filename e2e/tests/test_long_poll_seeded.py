@@ -0,0 +1,40 @@
+from lib import TestCaseBase
+import threading
+import requests
+import time
+
+
+class LongPollSeeded(TestCaseBase):
+    priority = -1
+
+    def run(self):
+        # Seeded posts arrive all at once, the filtered pollers must be woken up by the ones they match, even if that's not the last one
+        results = {}
+
+        def poll(name: str, url: str):
+            try:
+                results[name] = self.request_and_expect_status("GET", url, 200, timeout=5).json()
+            except requests.Timeout:
+                results[name] = None
+
+        threads = [
+            threading.Thread(target=poll, args=("tag", "/api/poll?last=0&tag=needle")),
+            threading.Thread(target=poll, args=("author", "/api/poll?last=0&author_id=1")),
+        ]
+        for t in threads:
+            t.start()
+
+        time.sleep(1)
+
+        posts = [{"author": "seeder", "text": "#needle in a"}]  # the seeded authors get their ids in order
+        posts += [{"author": "haymaker", "text": f"#hay stack {i}"} for i in range(20)]
+        self.seed(posts)
+
+        for t in threads:
+            t.join()
+
+        for name in ["tag", "author"]:
+            assert results[name] is not None, f"{name} filtered poller was not woken up"
+            assert len(results[name]) == 1, results[name]
+            assert results[name][0]["id"] == 1
+            assert results[name][0]["text"] == "#needle in a"
@@ -0,0 +1,120 @@
+from lib import TestCaseBase
+from lib.fixtures import SlidingTagsDataset
+
+
+class PaginateByCursor(TestCaseBase):
+    latency_budgets = {
+        "GET /api/post": {"p95": 0.100, "p99": 0.250},
+    }
+
+    def walk(self, first_url: str, key=None) -> list:
+        """Follow the next cursors from the first page, then the prev cursors back, and return the pages seen forward"""
+        pages = []
+        r = self.request_and_expect_status("GET", first_url, 200)
+        while True:
+            page = key(r.json()) if key else r.json()
+            pages.append([p['id'] for p in page])
+            if "X-Next-Cursor" not in r.headers:
+                break
+            assert len(page) > 0
+            url = first_url.split("?")[0]
+            r = self.request_and_expect_status("GET", url, 200, params={"cursor": r.headers["X-Next-Cursor"]})
+
+        # and now go back the same way
+        back_pages = [pages[-1]]
+        while "X-Prev-Cursor" in r.headers:
+            url = first_url.split("?")[0]
+            r = self.request_and_expect_status("GET", url, 200, params={"cursor": r.headers["X-Prev-Cursor"]})
+            page = key(r.json()) if key else r.json()
+            back_pages.insert(0, [p['id'] for p in page])
+
+        assert back_pages == pages, "walking backward returned different pages than walking forward"
+        return pages
+
+    @staticmethod
+    def check_walk(pages: list, limit: int, order: str, expected_count: int):
+        ids = [i for page in pages for i in page]
+        assert len(ids) == expected_count
+        assert len(set(ids)) == expected_count, "pages overlap"
+        for page in pages:
+            assert len(page) <= limit
+        if order == 'desc':
+            assert ids == sorted(ids, reverse=True)
+        else:
+            assert ids == sorted(ids)
+
+    def run(self):
+        authors = ['a', 'b', 'c']
+        tags = ['a', 'b', 'c', 'd', 'e', 'f']
+        dataset = SlidingTagsDataset(authors, tags, repeat=10)
+        self.seed(dataset)
+        total_posts = dataset.total_posts
+        posts_by_authors = dataset.posts_by_authors
+        posts_by_tags = dataset.posts_by_tags
+
+        # no limit, no cursors
+        r = self.request_and_expect_status("GET", "/api/post", 200)
+        assert len(r.json()) == total_posts
+        assert "X-Next-Cursor" not in r.headers
+        assert "X-Prev-Cursor" not in r.headers
+
+        for order in [None, 'asc', 'desc']:
+            for limit in [1, 7, total_posts, total_posts + 1]:
+                order_param = f"&order={order}" if order else ""
+
+                pages = self.walk(f"/api/post?limit={limit}{order_param}")
+                self.check_walk(pages, limit, order, total_posts)
+
+                for i, author in enumerate(authors):
+                    pages = self.walk(f"/api/post?author_id={i + 1}&limit={limit}{order_param}")
+                    self.check_walk(pages, limit, order, posts_by_authors[author])
+
+                    pages = self.walk(f"/api/author/{i + 1}?limit={limit}{order_param}", key=lambda a: a['posts'])
+                    self.check_walk(pages, limit, order, posts_by_authors[author])
+
+                for tag in tags:
+                    pages = self.walk(f"/api/post?tag={tag}&limit={limit}{order_param}")
+                    self.check_walk(pages, limit, order, posts_by_tags[tag])
+
+                    pages = self.walk(f"/api/tag/{tag}?limit={limit}{order_param}", key=lambda t: t['posts'])
+                    self.check_walk(pages, limit, order, posts_by_tags[tag])
+
+        # the filters are kept in the cursor
+        r = self.request_and_expect_status("GET", "/api/post?tag=a&after_id=5&limit=2", 200)
+        while "X-Next-Cursor" in r.headers:
+            for post in r.json():
+                assert 'a' in post['tags']
+                assert post['id'] > 5
+            r = self.request_and_expect_status("GET", "/api/post", 200, params={"cursor": r.headers["X-Next-Cursor"]})
+
+        # the page size may be changed along the way
+        r = self.request_and_expect_status("GET", "/api/post?limit=2", 200)
+        r = self.request_and_expect_status("GET", "/api/post", 200,
+                                           params={"cursor": r.headers["X-Next-Cursor"], "limit": 5})
+        assert [p['id'] for p in r.json()] == [3, 4, 5, 6, 7]
+
+        # offset may be used for the first page, then there's a previous page too
+        r = self.request_and_expect_status("GET", "/api/post?limit=2&offset=2", 200)
+        assert [p['id'] for p in r.json()] == [3, 4]
+        r = self.request_and_expect_status("GET", "/api/post", 200, params={"cursor": r.headers["X-Prev-Cursor"]})
+        assert [p['id'] for p in r.json()] == [1, 2]
+        assert "X-Prev-Cursor" not in r.headers
+
+        # but nothing else goes with the cursor
+        r = self.request_and_expect_status("GET", "/api/post?limit=2", 200)
+        cursor = r.headers["X-Next-Cursor"]
+        for param in ["tag=a", "author_id=1", "after_id=1", "before_id=100", "order=asc", "offset=1"]:
+            self.request_and_expect_status("GET", f"/api/post?cursor={cursor}&{param}", 400)
+
+        self.request_and_expect_status("GET", "/api/post?cursor=garbage", 400)
+
+        # cursors only work on the listing they were returned for
+        r = self.request_and_expect_status("GET", "/api/tag/a?limit=2", 200)
+        tag_cursor = r.headers["X-Next-Cursor"]
+        self.request_and_expect_status("GET", "/api/tag/b", 400, params={"cursor": tag_cursor})
+        self.request_and_expect_status("GET", "/api/author/1", 400, params={"cursor": tag_cursor})
+        self.request_and_expect_status("GET", "/api/post", 400, params={"cursor": tag_cursor})
+        self.request_and_expect_status("GET", "/api/tag/a", 400, params={"cursor": cursor})
+        self.request_and_expect_status("GET", "/api/tag/a", 400, params={"cursor": tag_cursor, "fill": "false"})
+        self.request_and_expect_status("GET", "/api/tag/a", 400, params={"cursor": tag_cursor, "order": "desc"})
+        self.request_and_expect_status("GET", "/api/tag/a", 200, params={"cursor": tag_cursor})
@@ -1,7 +1,12 @@
 from lib import TestCaseBase
+from lib.fixtures import SlidingTagsDataset
 
 
 class PaginateByIdAndLimit(TestCaseBase):
+    # pages are small, even on a slow CI runner this should be plenty
+    latency_budgets = {
+        "GET /api/post": {"p95": 0.100, "p99": 0.250},
+    }
 
     @staticmethod
     def assert_asc(l: list, key):
@@ -40,23 +45,11 @@ class PaginateByIdAndLimit(TestCaseBase):
 
         authors = ['a', 'b', 'c']
         tags = ['a', 'b', 'c', 'd', 'e', 'f']
-        total_posts = 0
-        posts_by_authors = {}.fromkeys(authors, 0)
-        posts_by_tags = {}.fromkeys(tags, 0)
-
-        for author in authors:
-            for i in range(len(tags) - 2):
-                for j in range(50):
-                    total_posts += 1
-                    posts_by_authors[author] += 1
-                    posts_by_tags[tags[i]] += 1
-                    posts_by_tags[tags[i + 1]] += 1
-                    posts_by_tags[tags[i + 2]] += 1
-                    post = {
-                        "author": author,
-                        "text": f"#{tags[i]} #{tags[i + 1]} #{tags[i + 2]} {j}"
-                    }
-                    self.request_and_expect_status("POST", "/api/post", 201, json=post)
+        dataset = SlidingTagsDataset(authors, tags, repeat=50)
+        self.seed(dataset)
+        total_posts = dataset.total_posts
+        posts_by_authors = dataset.posts_by_authors
+        posts_by_tags = dataset.posts_by_tags
 
         r = self.request_and_expect_status("GET", "/api/post", 200)
         assert len(r.json()) == total_posts
@@ -1,4 +1,5 @@
 from lib import TestCaseBase
+from lib.fixtures import SlidingTagsDataset
 
 
 class PostFiltersByAssociation(TestCaseBase):
@@ -7,22 +8,11 @@ class PostFiltersByAssociation(TestCaseBase):
 
         authors = ['a', 'b']
         tags = ['a', 'b', 'c', 'd', 'e', 'f', 'g']
-        total_posts = 0
-        posts_by_authors = {}.fromkeys(authors, 0)
-        posts_by_tags = {}.fromkeys(tags, 0)
-
-        for author in authors:
-            for i in range(len(tags) - 2):
-                total_posts += 1
-                posts_by_authors[author] += 1
-                posts_by_tags[tags[i]] += 1
-                posts_by_tags[tags[i + 1]] += 1
-                posts_by_tags[tags[i + 2]] += 1
-                post = {
-                    "author": author,
-                    "text": f"#{tags[i]} #{tags[i + 1]} #{tags[i + 2]}"
-                }
-                self.request_and_expect_status("POST", "/api/post", 201, json=post)
+        dataset = SlidingTagsDataset(authors, tags)
+        self.seed(dataset)
+        total_posts = dataset.total_posts
+        posts_by_authors = dataset.posts_by_authors
+        posts_by_tags = dataset.posts_by_tags
 
         r = self.request_and_expect_status("GET", "/api/post", 200)
         assert len(r.json()) == total_posts
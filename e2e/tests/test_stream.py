@@ -0,0 +1,67 @@
+from lib import TestCaseBase
+from lib.json_tree_validate import expect_json_tree
+from lib.sse import iter_sse_events
+
+
+class StreamBasic(TestCaseBase):
+    priority = -1
+
+    def open_stream(self, url: str, headers: dict = None):
+        # the read timeout is below the heartbeat interval, so a missing post fails the test instead of hanging
+        r = self.request_and_expect_status("GET", url, 200, headers=headers, stream=True, timeout=10)
+        assert r.headers["Content-Type"].startswith("text/event-stream")
+        return r, iter_sse_events(r)
+
+    def create_post(self, text: str) -> dict:
+        r = self.request_and_expect_status("POST", "/api/post", 201, json={"author": "streamer", "text": text})
+        return r.json()
+
+    def expect_post_event(self, events, post: dict):
+        event = next(events)
+        assert event["event"] == "post"
+        assert event["id"] == str(post["id"])
+        expect_json_tree(event["data"], post)
+
+    def run(self):
+        post_1 = self.create_post("first")
+
+        # posts after `last` are sent first, then the new ones as they are posted
+        r, events = self.open_stream("/api/stream?last=0")
+        with r:
+            self.expect_post_event(events, post_1)
+            post_2 = self.create_post("second")
+            self.expect_post_event(events, post_2)
+            post_3 = self.create_post("third")
+            self.expect_post_event(events, post_3)
+
+        # reconnecting with Last-Event-ID resumes where the client left off, even if `last` says otherwise
+        r, events = self.open_stream("/api/stream?last=0", headers={"Last-Event-ID": str(post_1["id"])})
+        with r:
+            self.expect_post_event(events, post_2)
+            self.expect_post_event(events, post_3)
+
+        # without `last`, only new posts are sent
+        r, events = self.open_stream("/api/stream")
+        with r:
+            post_4 = self.create_post("fourth")
+            self.expect_post_event(events, post_4)
+
+        # filtered streams skip the posts that do not match, both when catching up and when streaming
+        tagged_1 = self.create_post("tagged #streamtag")
+        r, events = self.open_stream(f"/api/stream?tag=streamtag&last={post_4['id']}")
+        with r:
+            self.expect_post_event(events, tagged_1)
+            self.create_post("not tagged")
+            self.create_post("other tag #othertag")
+            tagged_2 = self.create_post("tagged again #streamtag")
+            self.expect_post_event(events, tagged_2)
+
+        r, events = self.open_stream(f"/api/stream?author_id={post_1['author']['id']}&last={tagged_2['id']}")
+        with r:
+            self.request_and_expect_status("POST", "/api/post", 201, json={"author": "someoneelse", "text": "hello"})
+            own_post = self.create_post("by the streamer")
+            self.expect_post_event(events, own_post)
+
+        # same validation as /poll
+        self.request_and_expect_status("GET", "/api/stream?tag=a&author_id=1", 400)
+        self.request_and_expect_status("GET", "/api/stream", 400, headers={"Last-Event-ID": "not a number"})
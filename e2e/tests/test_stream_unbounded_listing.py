@@ -0,0 +1,59 @@
+from lib import TestCaseBase
+from lib.fixtures import SlidingTagsDataset
+from lib.json_tree_validate import compile_json_tree, MagicAnyNumeric, MagicAnyString, MagicExists
+
+AUTHORS = [f"streamer{i}" for i in range(5)]
+TAGS = [f"chunk{i}" for i in range(10)]
+
+_validate_post = compile_json_tree({
+    "id": MagicAnyNumeric(),
+    "created_at": MagicExists(),
+    "text": MagicAnyString(),
+    "author": {
+        "id": MagicAnyNumeric(),
+        "name": MagicAnyString(),
+        "first_seen": MagicExists()
+    },
+    "tags": MagicExists()
+})
+
+
+class StreamUnboundedListing(TestCaseBase):
+    priority = -1
+
+    def list_ids(self, params: dict = None) -> list:
+        # unbounded listings are streamed in chunks (1000 posts by default), these span several of them
+        ids = []
+
+        def collect(post):
+            _validate_post(post)
+            ids.append(post["id"])
+
+        self.stream_json_array("GET", "/api/post", 200, expected_item=collect, params=params)
+        return ids
+
+    def run(self):
+        # an empty listing is still a valid array
+        assert self.list_ids() == []
+
+        dataset = SlidingTagsDataset(AUTHORS, TAGS, repeat=100)  # 4000 posts
+        self.seed(dataset)
+        total = dataset.total_posts
+
+        assert self.list_ids() == list(range(1, total + 1))
+        assert self.list_ids({"order": "desc"}) == list(range(total, 0, -1))
+        assert self.list_ids({"after_id": 1500}) == list(range(1501, total + 1))
+        assert self.list_ids({"before_id": 2500}) == list(range(2499, 0, -1))  # implicitly descending
+        assert self.list_ids({"after_id": 10, "before_id": 2010}) == list(range(11, 2010))
+
+        ids = self.list_ids({"tag": "chunk0"})
+        assert len(ids) == dataset.posts_by_tags["chunk0"]
+        assert ids == sorted(ids)
+
+        ids = self.list_ids({"author_id": 2, "order": "desc"})
+        assert len(ids) == dataset.posts_by_authors[AUTHORS[1]]
+        assert ids == sorted(ids, reverse=True)
+
+        # an offset or a limit still goes the usual way
+        r = self.request_and_expect_status("GET", "/api/post", 200, params={"offset": 3990, "order": "asc"})
+        assert [p["id"] for p in r.json()] == list(range(3991, total + 1))
@@ -0,0 +1,44 @@
+import time
+
+from lib import TestCaseBase
+
+
+class TestTrendingFromPosts(TestCaseBase):
+
+    def wait_for_trending(self, expected: list, timeout: float = 5.0) -> list:
+        # the trending tags are recomputed about every second, so we have to wait a bit
+        deadline = time.monotonic() + timeout
+        while True:
+            r = self.request_and_expect_status("GET", "/api/trending", 200)
+            if r.json() == expected or time.monotonic() > deadline:
+                return r.json()
+            time.sleep(0.2)
+
+    def run(self):
+        # used by plenty of posts (more than the default minimum of 5), so it should trend on its own
+        for i in range(8):
+            post = {
+                "author": f"trendsetter{i % 3}",
+                "text": f"post {i} #hot #warm" if i % 2 else f"post {i} #hot"
+            }
+            self.request_and_expect_status("POST", "/api/post", 201, json=post)
+
+        # used only a few times, so not trending
+        self.request_and_expect_status("POST", "/api/post", 201, json={"author": "loner", "text": "#cold"})
+
+        trending = self.wait_for_trending(["hot"])
+        assert trending == ["hot"], trending
+
+        # the manual flag still works, and pinned tags come first
+        self.set_trending_tag("cold", True)
+        r = self.request_and_expect_status("GET", "/api/trending", 200)
+        assert r.json() == ["cold", "hot"], r.json()
+
+        self.set_trending_tag("cold", False)
+        r = self.request_and_expect_status("GET", "/api/trending", 200)
+        assert r.json() == ["hot"], r.json()
+
+        # cleaning up forgets everything
+        self.reset_database()
+        r = self.request_and_expect_status("GET", "/api/trending", 200)
+        assert r.json() == [], r.json()
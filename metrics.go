@@ -6,38 +6,59 @@ import (
 	"github.com/prometheus/client_golang/prometheus/promauto"
 )
 
+// These are maintained in memory by the db package, so scraping them does not hit the database
 var (
 	_ = promauto.NewCounterFunc(prometheus.CounterOpts{
 		Name: "tutter_posts_count",
 		Help: "Count of posts",
 	}, func() float64 {
-		cnt, err := db.GetPostCount()
-		if err != nil {
-			// it may be that there is no record in the table
-			return 0 // ?
-		}
-		return float64(cnt)
+		return float64(db.PostCount())
 	})
 	_ = promauto.NewCounterFunc(prometheus.CounterOpts{
 		Name: "tutter_authors_count",
 		Help: "Count of authors",
 	}, func() float64 {
-		cnt, err := db.GetAuthorCount()
-		if err != nil {
-			// it may be that there is no record in the table
-			return 0 // ?
-		}
-		return float64(cnt)
+		return float64(db.AuthorCount())
 	})
 	_ = promauto.NewCounterFunc(prometheus.CounterOpts{
 		Name: "tutter_tags_count",
 		Help: "Count of tags",
 	}, func() float64 {
-		cnt, err := db.GetTagCount()
-		if err != nil {
-			// it may be that there is no record in the table
-			return 0 // ?
+		return float64(db.TagCount())
+	})
+
+	_ = promauto.NewCounterFunc(prometheus.CounterOpts{
+		Name: "tutter_post_cache_hits_total",
+		Help: "Number of posts served from the encoded post cache",
+	}, func() float64 {
+		return float64(db.GetPostCacheStats().Hits)
+	})
+	_ = promauto.NewCounterFunc(prometheus.CounterOpts{
+		Name: "tutter_post_cache_misses_total",
+		Help: "Number of posts that had to be encoded, because they were not in the encoded post cache",
+	}, func() float64 {
+		return float64(db.GetPostCacheStats().Misses)
+	})
+	_ = promauto.NewGaugeFunc(prometheus.GaugeOpts{
+		Name: "tutter_post_cache_hit_ratio",
+		Help: "Ratio of posts served from the encoded post cache since start",
+	}, func() float64 {
+		stats := db.GetPostCacheStats()
+		if stats.Hits+stats.Misses == 0 {
+			return 0
 		}
-		return float64(cnt)
+		return float64(stats.Hits) / float64(stats.Hits+stats.Misses)
+	})
+	_ = promauto.NewGaugeFunc(prometheus.GaugeOpts{
+		Name: "tutter_post_cache_bytes",
+		Help: "Memory used by the encoded post cache (estimated)",
+	}, func() float64 {
+		return float64(db.GetPostCacheStats().Bytes)
+	})
+	_ = promauto.NewGaugeFunc(prometheus.GaugeOpts{
+		Name: "tutter_post_cache_entries",
+		Help: "Number of posts in the encoded post cache",
+	}, func() float64 {
+		return float64(db.GetPostCacheStats().Entries)
 	})
 )
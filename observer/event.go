@@ -0,0 +1,55 @@
+package observer
+
+import (
+	"fmt"
+	"github.com/pproj/tutter/db"
+	"sync"
+)
+
+// Event is what subscribers receive about a new post. The same Event is shared by all of them, so anything expensive to
+// compute from the post should be done here, once.
+type Event struct {
+	Post *db.Post
+
+	payloadOnce sync.Once
+	payload     []byte
+	payloadErr  error
+
+	sseOnce sync.Once
+	sse     []byte
+	sseErr  error
+}
+
+func newEvent(post *db.Post) *Event {
+	return &Event{Post: post}
+}
+
+// Payload returns the JSON encoded one element array containing the post, exactly what a long-poller expects as response.
+// It is only encoded when it's first needed, and the same bytes are returned to everyone after that. Do not modify it!
+func (e *Event) Payload() ([]byte, error) {
+	e.payloadOnce.Do(func() {
+		e.payload, e.payloadErr = db.MarshalPosts([]db.Post{*e.Post})
+	})
+	return e.payload, e.payloadErr
+}
+
+// FormatSSE formats a post as a Server-Sent Event, with the id of the post as the event id if withID is set.
+// Without an id the client keeps the one it got before, and resumes from that when reconnecting
+func FormatSSE(post *db.Post, withID bool) ([]byte, error) {
+	data, err := post.MarshalJSON() // cached, and that one is compact already, so it's fine on a single line
+	if err != nil {
+		return nil, err
+	}
+	if !withID {
+		return []byte(fmt.Sprintf("event: post\ndata: %s\n\n", data)), nil
+	}
+	return []byte(fmt.Sprintf("id: %d\nevent: post\ndata: %s\n\n", post.ID, data)), nil
+}
+
+// SSE returns the post formatted as a Server-Sent Event, encoded once and shared the same way as Payload. Do not modify it!
+func (e *Event) SSE() ([]byte, error) {
+	e.sseOnce.Do(func() {
+		e.sse, e.sseErr = FormatSSE(e.Post, true)
+	})
+	return e.sse, e.sseErr
+}
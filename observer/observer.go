@@ -4,61 +4,157 @@ import (
 	"context"
 	"fmt"
 	"github.com/pproj/tutter/db"
-	"sync"
 	"sync/atomic"
 )
 
 type NewPostObserver struct {
-	lastPost  atomic.Pointer[db.Post] // This is only updated in the run function.
+	lastEvent atomic.Pointer[Event] // This is only updated in the run function.
 	inputChan chan *db.Post
 
-	// Using a mutex isn't really efficient, but it is what it is
-	outputChanMutex sync.Mutex // RWLock would not make much sense as notify is the only read, and it's called from a single gorutine only
-	outputChans     map[chan *db.Post]interface{}
+	// Subscribing and un-subscribing is done by the run function too, so the subscriber sets are owned by that single goroutine, no locking needed
+	// Both go through the same channel, so an un-subscribe can never overtake the subscribe it belongs to
+	subscriptionChan chan subscriptionChange
+
+	// Subscribers are indexed by their filter, so a new post only wakes up those who may be interested in it
+	unfilteredChans map[chan *Event]interface{}
+	chansByAuthorID map[uint]map[chan *Event]interface{}
+	chansByTag      map[string]map[chan *Event]interface{}
+
+	recentPosts *postRing
 
 	allowDebug bool
 }
 
-func NewNewPostObserver(lastPost *db.Post, allowDebug bool) *NewPostObserver {
+type subscriptionChange struct {
+	ch          chan *Event
+	filter      SubscriptionFilter
+	unsubscribe bool
+}
+
+// SubscriptionFilter selects the posts a subscriber is interested in. At most one of the fields should be set, an empty filter matches every post
+type SubscriptionFilter struct {
+	AuthorID *uint
+	Tag      *string
+}
+
+// Matches tells if the post should be delivered to someone using this filter
+func (f SubscriptionFilter) Matches(p *db.Post) bool {
+	if f.AuthorID != nil {
+		return p.AuthorID == *f.AuthorID
+	}
+	if f.Tag != nil {
+		for _, tag := range p.Tags { // posts don't have many tags, linear search is fine
+			if tag.Tag == *f.Tag {
+				return true
+			}
+		}
+		return false
+	}
+	return true
+}
+
+// NewNewPostObserver creates a new observer. The last ringSize posts are kept in memory (see PostsAfter), 0 disables this
+func NewNewPostObserver(lastPost *db.Post, allowDebug bool, ringSize int) *NewPostObserver {
 	if lastPost == nil {
 		// TODO: log Warning!
 	}
 
 	o := NewPostObserver{
-		inputChan:   make(chan *db.Post, 10),
-		outputChans: make(map[chan *db.Post]interface{}),
-		allowDebug:  allowDebug,
+		inputChan:        make(chan *db.Post, 10),
+		subscriptionChan: make(chan subscriptionChange, 1024), // when lots of polls time out at once, they pile up here
+		unfilteredChans:  make(map[chan *Event]interface{}),
+		chansByAuthorID:  make(map[uint]map[chan *Event]interface{}),
+		chansByTag:       make(map[string]map[chan *Event]interface{}),
+		recentPosts:      newPostRing(ringSize),
+		allowDebug:       allowDebug,
+	}
+	if lastPost != nil {
+		o.lastEvent.Store(newEvent(lastPost))
+		o.recentPosts.put(lastPost)
 	}
-	o.lastPost.Store(lastPost) // THIS MAY BE NIL!!
 	go o.run()
 	return &o
 }
 
-// Subscribe is a complex function, but it basically just returns with a channel that will pump out ids of new posts
-// the ids may not be in sequence!
-// The ID of the last post is always put on the channel upon subscribing, so the race condition with check-before-subscribe can be eliminated
+// Subscribe is a complex function, but it basically just returns with a channel that will pump out events of new posts
+// the ids may not be in sequence! A post committed late may arrive after one with a higher id, even after the last post sent upon subscribing
+// The last post is always put on the channel first (if there is one), so the race condition with check-before-subscribe can be eliminated.
+// This is done by the run function, so no post can slip through between reading the last post and starting to receive the new ones
 // If the context is cancelled along the way, the channel will be closed, and un-subscribed automagically
-func (o *NewPostObserver) Subscribe(ctx context.Context) (<-chan *db.Post, error) {
-	subscriberChan := make(chan *db.Post, 3)
-	lastPost := o.lastPost.Load()
-	if lastPost != nil { // only send if there's something to send
-		subscriberChan <- lastPost
-	}
-	o.outputChanMutex.Lock()
-	o.outputChans[subscriberChan] = nil
-	o.outputChanMutex.Unlock()
-
-	go func() { // Yes, this allocates an extra goroutine for each subscriber... but it won't be easy to wait on this many contexts
-		<-ctx.Done()
-		o.outputChanMutex.Lock()
-		delete(o.outputChans, subscriberChan)
-		o.outputChanMutex.Unlock()
-		close(subscriberChan)
-	}()
+// Only posts matching the filter are put on the channel, except the last post sent upon subscribing, that one is sent regardless
+func (o *NewPostObserver) Subscribe(ctx context.Context, filter SubscriptionFilter) (<-chan *Event, error) {
+	if filter.AuthorID != nil && filter.Tag != nil {
+		return nil, fmt.Errorf("filtering for both author and tag is not supported")
+	}
+
+	subscriberChan := make(chan *Event, 3)
+	o.subscriptionChan <- subscriptionChange{ch: subscriberChan, filter: filter}
+
+	// This used to be a goroutine per subscriber waiting for the context... with 50k pollers that's a lot of stacks
+	// AfterFunc only starts a goroutine when the context is actually done, and that one exits right after queueing the un-subscribe
+	context.AfterFunc(ctx, func() {
+		o.subscriptionChan <- subscriptionChange{ch: subscriberChan, filter: filter, unsubscribe: true}
+	})
 
 	return subscriberChan, nil
 }
 
+// indexFor returns the set of channels where the subscribers with the given filter are stored, creating it if needed. Must be called from the run function only
+func (o *NewPostObserver) indexFor(filter SubscriptionFilter) map[chan *Event]interface{} {
+	var index map[chan *Event]interface{}
+	var ok bool
+	switch {
+	case filter.AuthorID != nil:
+		index, ok = o.chansByAuthorID[*filter.AuthorID]
+		if !ok {
+			index = make(map[chan *Event]interface{})
+			o.chansByAuthorID[*filter.AuthorID] = index
+		}
+	case filter.Tag != nil:
+		index, ok = o.chansByTag[*filter.Tag]
+		if !ok {
+			index = make(map[chan *Event]interface{})
+			o.chansByTag[*filter.Tag] = index
+		}
+	default:
+		index = o.unfilteredChans
+	}
+	return index
+}
+
+// dropEmptyIndex removes the set of a filter if there are no subscribers left in it, so that the maps would not grow indefinitely. Must be called from the run function only
+func (o *NewPostObserver) dropEmptyIndex(filter SubscriptionFilter, index map[chan *Event]interface{}) {
+	if len(index) != 0 {
+		return
+	}
+	switch {
+	case filter.AuthorID != nil:
+		delete(o.chansByAuthorID, *filter.AuthorID)
+	case filter.Tag != nil:
+		delete(o.chansByTag, *filter.Tag)
+	}
+}
+
+// notifyAll does a non-blocking send of the post to all the channels. Must be called from the run function only
+func notifyAll(chans map[chan *Event]interface{}, event *Event) {
+	for ch := range chans {
+		select { // This is a non-blocking send in golang
+		case ch <- event: // This would panic if any of the channels were closed, but the subscriber should make sure that no closed channels are in this list
+		default:
+			// TODO: log warning
+		}
+	}
+}
+
+// notifySubscribers sends the event to everyone whose filter it matches. Must be called from the run function only
+func (o *NewPostObserver) notifySubscribers(event *Event) {
+	notifyAll(o.unfilteredChans, event)
+	notifyAll(o.chansByAuthorID[event.Post.AuthorID], event) // ranging over a nil map is fine
+	for _, tag := range event.Post.Tags {                    // tags are de-duplicated, so nobody gets the same post twice
+		notifyAll(o.chansByTag[tag.Tag], event)
+	}
+}
+
 func (o *NewPostObserver) Notify(post *db.Post) error {
 	if post == nil {
 		return fmt.Errorf("can not use Notify() with nil")
@@ -67,22 +163,57 @@ func (o *NewPostObserver) Notify(post *db.Post) error {
 	return nil
 }
 
+// PostsAfter returns the posts after the given id (up to the last post), that match the filter, from memory.
+// The second return value is false if those posts are not all in memory anymore (or never were), then the database should be queried
+func (o *NewPostObserver) PostsAfter(id uint64, filter SubscriptionFilter) ([]*db.Post, bool) {
+	lastEvent := o.lastEvent.Load()
+	if lastEvent == nil {
+		return nil, id == 0
+	}
+	return o.recentPosts.between(id, lastEvent.Post.ID, filter)
+}
+
 // LastPost returns the last post or nil if there weren't any posts posted yet
 func (o *NewPostObserver) LastPost() *db.Post {
-	return o.lastPost.Load()
+	lastEvent := o.lastEvent.Load()
+	if lastEvent == nil {
+		return nil
+	}
+	return lastEvent.Post
 }
 
 func (o *NewPostObserver) DebugCleanup() {
 	if !o.allowDebug {
 		return
 	}
-	o.lastPost.Store(nil)
+	o.lastEvent.Store(nil)
+	o.recentPosts.clear() // ids start from 1 again
+}
+
+func (o *NewPostObserver) handleSubscriptionChange(change subscriptionChange) {
+	index := o.indexFor(change.filter)
+
+	if change.unsubscribe {
+		delete(index, change.ch)
+		o.dropEmptyIndex(change.filter, index)
+		close(change.ch) // it's not in any of the sets anymore, so nobody will send on it
+		return
+	}
+
+	lastEvent := o.lastEvent.Load()
+	if lastEvent != nil { // only send if there's something to send
+		change.ch <- lastEvent // the channel is brand new, so this never blocks
+	}
+	index[change.ch] = nil
 }
 
 func (o *NewPostObserver) run() {
 
 	for {
 		select {
+		case change := <-o.subscriptionChan:
+			o.handleSubscriptionChange(change)
+
 		case inputPost := <-o.inputChan:
 
 			if inputPost == nil {
@@ -90,22 +221,20 @@ func (o *NewPostObserver) run() {
 				// TODO: log warning?
 			}
 
-			currentLastPost := o.lastPost.Load()
-			if currentLastPost == nil || inputPost.ID > currentLastPost.ID {
-				if !o.lastPost.CompareAndSwap(currentLastPost, inputPost) {
+			// Every post goes in the ring, even the ones arriving late, to keep it contiguous.
+			// This must happen before the last post is updated, so anyone who sees the new last post would find it in the ring too
+			o.recentPosts.put(inputPost)
+
+			event := newEvent(inputPost) // shared by every subscriber, so the response is encoded only once
+			currentLastEvent := o.lastEvent.Load()
+			if currentLastEvent == nil || inputPost.ID > currentLastEvent.Post.ID {
+				if !o.lastEvent.CompareAndSwap(currentLastEvent, event) {
 					panic("race condition while storing last id (should not be updated outside this goroutine)")
 				}
-				o.outputChanMutex.Lock()
-				for ch := range o.outputChans {
-					select { // This is a non-blocking send in golang
-					case ch <- inputPost: // This would panic if any of the channels were closed, but the subscriber should make sure that no closed channels are in this list
-					default:
-						// TODO: log warning
-					}
-				}
-				o.outputChanMutex.Unlock()
-
 			}
+			// Posts may be committed (and so notified) out of order, one arriving late is still delivered, just without becoming the last one.
+			// A filtered subscriber is only woken up by posts it's interested in, so nothing else would tell it about this one
+			o.notifySubscribers(event)
 
 		}
 	}
@@ -0,0 +1,127 @@
+package observer
+
+import (
+	"context"
+	"fmt"
+	"github.com/pproj/tutter/db"
+	"runtime"
+	"testing"
+	"time"
+)
+
+const heldSubscribers = 100000
+
+// holdSubscribers subscribes a lot of long-poller lookalikes (a third of them unfiltered, the rest filtered by author or tag),
+// and waits until the observer registered all of them
+func holdSubscribers(b *testing.B, o *NewPostObserver, ctx context.Context) {
+	tags := make([]string, 1000)
+	for i := range tags {
+		tags[i] = fmt.Sprintf("tag%d", i)
+	}
+
+	for i := 0; i < heldSubscribers; i++ {
+		var filter SubscriptionFilter
+		switch i % 3 {
+		case 1:
+			authorID := uint(i % 1000)
+			filter.AuthorID = &authorID
+		case 2:
+			filter.Tag = &tags[i%len(tags)]
+		}
+		_, err := o.Subscribe(ctx, filter)
+		if err != nil {
+			b.Fatal(err)
+		}
+	}
+
+	// every subscriber gets the last post when it's registered, so once this one has it, all the previous ones are registered too
+	ch, err := o.Subscribe(ctx, SubscriptionFilter{})
+	if err != nil {
+		b.Fatal(err)
+	}
+	<-ch
+}
+
+// BenchmarkSubscribeUnsubscribe measures a full subscribe-cancel-close cycle while 100k other subscribers are being held,
+// and reports how many goroutines holding those subscribers costs
+func BenchmarkSubscribeUnsubscribe(b *testing.B) {
+	o := NewNewPostObserver(&db.Post{ID: 1}, false, 1024)
+	ctx, cancel := context.WithCancel(context.Background())
+	defer cancel()
+
+	goroutinesBefore := runtime.NumGoroutine()
+	holdSubscribers(b, o, ctx)
+	goroutinesHolding := runtime.NumGoroutine() - goroutinesBefore
+
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		subCtx, subCancel := context.WithCancel(context.Background())
+		ch, err := o.Subscribe(subCtx, SubscriptionFilter{})
+		if err != nil {
+			b.Fatal(err)
+		}
+		subCancel()
+		for range ch { // drain until closed, which means the un-subscribe is done
+		}
+	}
+	b.StopTimer()
+
+	b.ReportMetric(float64(goroutinesHolding), "goroutines") // ResetTimer would clear this, so it's reported at the end
+}
+
+// BenchmarkSubscribeUnsubscribeParallel is the same as above, but with many subscribers coming and going concurrently, like when a lot of polls time out at once
+func BenchmarkSubscribeUnsubscribeParallel(b *testing.B) {
+	o := NewNewPostObserver(&db.Post{ID: 1}, false, 1024)
+	ctx, cancel := context.WithCancel(context.Background())
+	defer cancel()
+
+	holdSubscribers(b, o, ctx)
+
+	b.ResetTimer()
+	b.RunParallel(func(pb *testing.PB) {
+		for pb.Next() {
+			subCtx, subCancel := context.WithCancel(context.Background())
+			ch, err := o.Subscribe(subCtx, SubscriptionFilter{})
+			subCancel()
+			if err != nil {
+				b.Error(err)
+				return
+			}
+			for range ch {
+			}
+		}
+	})
+}
+
+// TestLatePostReachesFilteredSubscriber notifies a post after one with a higher id, like when concurrent creates commit out of order.
+// The late one is the only one matching the subscriber, nothing else would wake it up
+func TestLatePostReachesFilteredSubscriber(t *testing.T) {
+	o := NewNewPostObserver(&db.Post{ID: 1}, false, 16)
+	ctx, cancel := context.WithCancel(context.Background())
+	defer cancel()
+
+	tag := "x"
+	ch, err := o.Subscribe(ctx, SubscriptionFilter{Tag: &tag})
+	if err != nil {
+		t.Fatal(err)
+	}
+	if event := <-ch; event.Post.ID != 1 { // the last post is sent upon subscribing, so we know we are registered from now on
+		t.Fatalf("got post %d upon subscribing instead of the last one", event.Post.ID)
+	}
+
+	_ = o.Notify(&db.Post{ID: 3, Tags: []*db.Tag{{Tag: "y"}}})
+	_ = o.Notify(&db.Post{ID: 2, Tags: []*db.Tag{{Tag: "x"}}})
+
+	select {
+	case event := <-ch:
+		if event.Post.ID != 2 {
+			t.Fatalf("got post %d instead of the late one", event.Post.ID)
+		}
+	case <-time.After(5 * time.Second):
+		t.Fatal("the post arriving late was not delivered")
+	}
+
+	if last := o.LastPost(); last.ID != 3 {
+		t.Fatalf("the last post is %d, a late post must not replace it", last.ID)
+	}
+}
@@ -0,0 +1,63 @@
+package observer
+
+import (
+	"github.com/pproj/tutter/db"
+	"sync/atomic"
+)
+
+// postRing keeps the last N posts (fully loaded, with author and tags) in memory, so pollers that are only a few posts behind
+// can be served without going to the database.
+// Posts are stored in the slot of their id modulo the size, so there's no need for locking: a reader either finds the post it
+// is looking for, or something else (an older or a newer post) in which case it simply falls back to the database.
+type postRing struct {
+	slots []atomic.Pointer[db.Post]
+}
+
+func newPostRing(size int) *postRing {
+	return &postRing{slots: make([]atomic.Pointer[db.Post], size)}
+}
+
+func (r *postRing) size() uint64 {
+	return uint64(len(r.slots))
+}
+
+func (r *postRing) put(post *db.Post) {
+	if len(r.slots) == 0 {
+		return
+	}
+	slot := &r.slots[post.ID%r.size()]
+	if current := slot.Load(); current != nil && current.ID > post.ID {
+		return // a post arriving very late must not overwrite a newer one (there's only one writer, so no need for CAS)
+	}
+	slot.Store(post)
+}
+
+func (r *postRing) clear() {
+	for i := range r.slots {
+		r.slots[i].Store(nil)
+	}
+}
+
+// between returns the posts with afterID < id <= untilID that match the filter, in order.
+// The second return value is false if not all of those posts are in the ring (some of them were overwritten or never got here),
+// in that case the database should be asked instead
+func (r *postRing) between(afterID, untilID uint64, filter SubscriptionFilter) ([]*db.Post, bool) {
+	if untilID <= afterID {
+		return nil, true
+	}
+	if untilID-afterID > r.size() {
+		return nil, false
+	}
+
+	var posts []*db.Post
+	for id := afterID + 1; id <= untilID; id++ {
+		post := r.slots[id%r.size()].Load()
+		if post == nil || post.ID != id { // ids are expected to be contiguous, a gap means we don't know what's there
+			return nil, false
+		}
+		if filter.Matches(post) {
+			posts = append(posts, post)
+		}
+	}
+	return posts, true
+}
@@ -0,0 +1,116 @@
+package timing
+
+import (
+	"context"
+	"fmt"
+	"strings"
+	"sync"
+	"time"
+)
+
+// Timings collects the duration of the phases of serving a single request, so they can be sent back in a Server-Timing header.
+// All methods are safe to be called on a nil *Timings, in that case they do nothing. This way the views do not have to care whether timing is enabled or not.
+type Timings struct {
+	mu         sync.Mutex
+	start      time.Time
+	phases     []phase
+	roundTrips int
+}
+
+type phase struct {
+	name  string
+	desc  string
+	dur   time.Duration
+	count int // number of times this phase was recorded
+}
+
+type contextKey struct{}
+
+func New() *Timings {
+	return &Timings{start: time.Now()}
+}
+
+// NewContext returns a copy of ctx that carries t
+func NewContext(ctx context.Context, t *Timings) context.Context {
+	return context.WithValue(ctx, contextKey{}, t)
+}
+
+// FromContext returns the Timings carried by ctx, or nil if there is none
+func FromContext(ctx context.Context) *Timings {
+	if ctx == nil {
+		return nil
+	}
+	t, _ := ctx.Value(contextKey{}).(*Timings)
+	return t
+}
+
+// Add records a phase. Recording the same phase multiple times sums up their durations
+func (t *Timings) Add(name string, d time.Duration) {
+	if t == nil {
+		return
+	}
+	t.mu.Lock()
+	defer t.mu.Unlock()
+	for i := range t.phases {
+		if t.phases[i].name == name {
+			t.phases[i].dur += d
+			t.phases[i].count++
+			return
+		}
+	}
+	t.phases = append(t.phases, phase{name: name, dur: d, count: 1})
+}
+
+// Start starts measuring a phase, the returned function stops it
+func (t *Timings) Start(name string) func() {
+	if t == nil {
+		return func() {}
+	}
+	started := time.Now()
+	return func() {
+		t.Add(name, time.Since(started))
+	}
+}
+
+// AddRoundTrip records a single DB round trip, each one of them gets its own entry (db-1, db-2, ...) with the table in the description
+func (t *Timings) AddRoundTrip(table string, d time.Duration) {
+	if t == nil {
+		return
+	}
+	t.mu.Lock()
+	defer t.mu.Unlock()
+	t.roundTrips++
+	t.phases = append(t.phases, phase{name: fmt.Sprintf("db-%d", t.roundTrips), desc: table, dur: d, count: 1})
+}
+
+func formatDur(d time.Duration) string {
+	return fmt.Sprintf("%.3f", float64(d)/float64(time.Millisecond)) // milliseconds, as the spec says
+}
+
+// Header formats the collected phases as a Server-Timing header value.
+// Besides the recorded phases, the sum of the DB round trips and the total time elapsed since New are always included
+func (t *Timings) Header() string {
+	if t == nil {
+		return ""
+	}
+	t.mu.Lock()
+	defer t.mu.Unlock()
+
+	entries := make([]string, 0, len(t.phases)+2)
+	var dbTotal time.Duration
+	for _, p := range t.phases {
+		entry := p.name + ";dur=" + formatDur(p.dur)
+		if p.desc != "" {
+			entry += fmt.Sprintf(";desc=%q", p.desc)
+		} else if p.count > 1 {
+			entry += fmt.Sprintf(";desc=\"%dx\"", p.count)
+		}
+		if strings.HasPrefix(p.name, "db-") {
+			dbTotal += p.dur
+		}
+		entries = append(entries, entry)
+	}
+	entries = append(entries, fmt.Sprintf("db;dur=%s;desc=\"%d queries\"", formatDur(dbTotal), t.roundTrips))
+	entries = append(entries, "total;dur="+formatDur(time.Since(t.start)))
+	return strings.Join(entries, ", ")
+}
@@ -0,0 +1,81 @@
+package trending
+
+import "container/heap"
+
+// spaceSaving is the Space-Saving heavy hitters summary: it has at most capacity counters, and when a new item arrives
+// while all of them are taken, the new item takes over the counter of the least frequent one.
+// An item's count is overestimated by at most its err, and frequent items never lose their counter, so memory stays bounded
+// no matter how many distinct items there are, while the top ones are still counted (almost) exactly
+type spaceSaving struct {
+	capacity int
+	counters map[string]*counter
+	minHeap  counterHeap // to find the least frequent one quickly
+}
+
+type counter struct {
+	item  string
+	count uint64
+	err   uint64 // the count of the item this counter was taken over from
+	index int    // in the heap
+}
+
+func newSpaceSaving(capacity int) *spaceSaving {
+	return &spaceSaving{
+		capacity: capacity,
+		counters: make(map[string]*counter, capacity),
+		minHeap:  make(counterHeap, 0, capacity),
+	}
+}
+
+func (s *spaceSaving) add(item string) {
+	if c, ok := s.counters[item]; ok {
+		c.count++
+		heap.Fix(&s.minHeap, c.index)
+		return
+	}
+
+	if len(s.minHeap) < s.capacity {
+		c := &counter{item: item, count: 1}
+		s.counters[item] = c
+		heap.Push(&s.minHeap, c)
+		return
+	}
+
+	// take over the counter of the least frequent item
+	c := s.minHeap[0]
+	delete(s.counters, c.item)
+	c.item = item
+	c.err = c.count
+	c.count++
+	s.counters[item] = c
+	heap.Fix(&s.minHeap, 0)
+}
+
+func (s *spaceSaving) reset() {
+	s.counters = make(map[string]*counter, s.capacity)
+	s.minHeap = s.minHeap[:0]
+}
+
+type counterHeap []*counter
+
+func (h counterHeap) Len() int           { return len(h) }
+func (h counterHeap) Less(i, j int) bool { return h[i].count < h[j].count }
+func (h counterHeap) Swap(i, j int) {
+	h[i], h[j] = h[j], h[i]
+	h[i].index = i
+	h[j].index = j
+}
+
+func (h *counterHeap) Push(x any) {
+	c := x.(*counter)
+	c.index = len(*h)
+	*h = append(*h, c)
+}
+
+func (h *counterHeap) Pop() any {
+	old := *h
+	c := old[len(old)-1]
+	old[len(old)-1] = nil
+	*h = old[:len(old)-1]
+	return c
+}
@@ -0,0 +1,235 @@
+package trending
+
+import (
+	"context"
+	"github.com/pproj/tutter/db"
+	"github.com/pproj/tutter/observer"
+	"slices"
+	"sort"
+	"sync"
+	"sync/atomic"
+	"time"
+)
+
+// number of time slices the window is split into, the window slides by one slice at a time
+const bucketCount = 60
+
+// Engine keeps track of which tags were used the most in the recent posts, by following the new posts through the observer.
+// The window is split into buckets, each of them counting the tags of the posts of its time slice in a spaceSaving summary,
+// so memory stays bounded no matter how many distinct tags show up. The trending tags are recomputed every now and then,
+// and requests are served from the last snapshot, without touching the DB or waiting for any locks.
+// Tags pinned by hand (the trending flag in the DB) are always in the list, before the ones that trend on their own
+type Engine struct {
+	mu          sync.Mutex // guards everything except the snapshot
+	buckets     []*spaceSaving
+	current     int // index of the bucket of the current time slice
+	bucketStart time.Time
+	bucketLen   time.Duration
+	lastID      uint64 // the last post counted, so none is counted twice
+	pinned      map[string]interface{}
+
+	size     int
+	minPosts uint64
+
+	snapshot atomic.Pointer[snapshot]
+}
+
+// snapshot is what requests are served from, the version is only bumped when the tags change, so it can be used to validate caches
+type snapshot struct {
+	tags    []string
+	version uint64
+}
+
+// NewEngine creates an engine that reports at most size tags (plus the pinned ones) used in at least minPosts posts during the window.
+// capacity is the number of distinct tags counted in a single bucket, the rare ones may be forgotten beyond that
+func NewEngine(window time.Duration, size int, minPosts uint64, capacity int) *Engine {
+	e := &Engine{
+		buckets:     make([]*spaceSaving, bucketCount),
+		bucketStart: time.Now(),
+		bucketLen:   window / bucketCount,
+		pinned:      make(map[string]interface{}),
+		size:        size,
+		minPosts:    minPosts,
+	}
+	for i := range e.buckets {
+		e.buckets[i] = newSpaceSaving(capacity)
+	}
+	e.snapshot.Store(&snapshot{tags: []string{}})
+	return e
+}
+
+// Trending returns the current trending tags, pinned ones first, and the version of the list.
+// The version only changes when the list does (but it's not persisted, it starts over with every run). The returned slice is shared, do not modify it!
+func (e *Engine) Trending() ([]string, uint64) {
+	s := e.snapshot.Load()
+	return s.tags, s.version
+}
+
+// Run follows the new posts of the observer, and refreshes the snapshot every interval, so tags fall out as the window slides. It never returns
+func (e *Engine) Run(o *observer.NewPostObserver, interval time.Duration) {
+	// Posts from before we started are not counted. The last one of those is sent again upon subscribing, this makes sure it's skipped
+	e.mu.Lock()
+	if lastPost := o.LastPost(); lastPost != nil {
+		e.lastID = lastPost.ID
+	}
+	e.mu.Unlock()
+
+	events, err := o.Subscribe(context.Background(), observer.SubscriptionFilter{})
+	if err != nil {
+		panic(err) // an empty filter is always fine
+	}
+
+	ticker := time.NewTicker(interval)
+	defer ticker.Stop()
+
+	for {
+		select {
+		case event := <-events:
+			e.record(o, event.Post)
+
+		case <-ticker.C:
+			e.mu.Lock()
+			e.rotate(time.Now())
+			e.refresh()
+			e.mu.Unlock()
+		}
+	}
+}
+
+// record counts the tags of a new post, and of those in between that we missed. Our channel is not waited for by the observer,
+// so if we fall behind some events are dropped, the ring of recent posts is used to find them
+func (e *Engine) record(o *observer.NewPostObserver, post *db.Post) {
+	e.mu.Lock()
+	defer e.mu.Unlock()
+
+	if post.ID <= e.lastID {
+		return // already counted with an earlier gap
+	}
+
+	posts := []*db.Post{post}
+	if post.ID > e.lastID+1 {
+		// if they are not in memory anymore (or were seeded in bulk), only this one is counted, it's an estimate anyway
+		missed, ok := o.PostsAfter(e.lastID, observer.SubscriptionFilter{})
+		if ok && len(missed) != 0 {
+			posts = missed
+		}
+	}
+
+	e.rotate(time.Now())
+	bucket := e.buckets[e.current]
+	for _, p := range posts {
+		for _, tag := range p.Tags { // tags of a post are de-duplicated already
+			bucket.add(tag.Tag)
+		}
+		if p.ID > e.lastID {
+			e.lastID = p.ID
+		}
+	}
+}
+
+// rotate moves to the bucket of the current time slice, clearing the ones that fell out of the window. Must be called with the lock held
+func (e *Engine) rotate(now time.Time) {
+	elapsed := int(now.Sub(e.bucketStart) / e.bucketLen)
+	if elapsed <= 0 {
+		return
+	}
+	if elapsed >= len(e.buckets) {
+		// nothing happened for longer than the window, everything is out of it
+		for _, b := range e.buckets {
+			b.reset()
+		}
+		e.bucketStart = now
+		return
+	}
+	for i := 0; i < elapsed; i++ {
+		e.current = (e.current + 1) % len(e.buckets)
+		e.buckets[e.current].reset()
+	}
+	e.bucketStart = e.bucketStart.Add(time.Duration(elapsed) * e.bucketLen)
+}
+
+// refresh sums the buckets and stores the new snapshot. Must be called with the lock held
+func (e *Engine) refresh() {
+	type tagCount struct {
+		tag      string
+		count    uint64 // may be overestimated...
+		minCount uint64 // ...but it's at least this much
+	}
+	counts := make(map[string]*tagCount)
+	for _, b := range e.buckets {
+		for tag, c := range b.counters {
+			tc, ok := counts[tag]
+			if !ok {
+				tc = &tagCount{tag: tag}
+				counts[tag] = tc
+			}
+			tc.count += c.count
+			tc.minCount += c.count - c.err
+		}
+	}
+
+	candidates := make([]*tagCount, 0, len(counts))
+	for _, tc := range counts {
+		if _, ok := e.pinned[tc.tag]; ok {
+			continue // those are in the list anyway
+		}
+		if tc.minCount >= e.minPosts { // only the ones that surely made it, not those that just took over a big counter
+			candidates = append(candidates, tc)
+		}
+	}
+	sort.Slice(candidates, func(i, j int) bool {
+		if candidates[i].count != candidates[j].count {
+			return candidates[i].count > candidates[j].count
+		}
+		return candidates[i].tag < candidates[j].tag // so the order does not flicker between refreshes
+	})
+	if len(candidates) > e.size {
+		candidates = candidates[:e.size]
+	}
+
+	trending := make([]string, 0, len(e.pinned)+len(candidates))
+	for tag := range e.pinned {
+		trending = append(trending, tag)
+	}
+	sort.Strings(trending)
+	for _, tc := range candidates {
+		trending = append(trending, tc.tag)
+	}
+
+	current := e.snapshot.Load()
+	if slices.Equal(current.tags, trending) {
+		return // nothing changed, the version stays the same
+	}
+	e.snapshot.Store(&snapshot{tags: trending, version: current.version + 1})
+}
+
+// Refresh recomputes the snapshot right away, instead of waiting for the next tick
+func (e *Engine) Refresh() {
+	e.mu.Lock()
+	defer e.mu.Unlock()
+	e.rotate(time.Now())
+	e.refresh()
+}
+
+// SetPinned replaces the set of pinned tags, used to pick up the flags set on other replicas
+func (e *Engine) SetPinned(tags []string) {
+	e.mu.Lock()
+	defer e.mu.Unlock()
+	e.pinned = make(map[string]interface{}, len(tags))
+	for _, tag := range tags {
+		e.pinned[tag] = nil
+	}
+	e.refresh()
+}
+
+// DebugCleanup forgets everything, ids start from 1 again after the DB is cleaned up
+func (e *Engine) DebugCleanup() {
+	e.mu.Lock()
+	defer e.mu.Unlock()
+	for _, b := range e.buckets {
+		b.reset()
+	}
+	e.lastID = 0
+	e.pinned = make(map[string]interface{})
+	e.refresh()
+}
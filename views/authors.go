@@ -9,6 +9,7 @@ import (
 
 func listAuthors(ctx *gin.Context) {
 	var queryParams db.AuthorFilterParams
+	stopBind := startPhase(ctx, "bind")
 	err := ctx.ShouldBindQuery(&queryParams)
 	if err != nil {
 		handleUserError(ctx, err)
@@ -20,13 +21,14 @@ func listAuthors(ctx *gin.Context) {
 		handleUserError(ctx, err)
 		return
 	}
+	stopBind()
 
-	authors, err := db.GetAuthors(&queryParams)
+	authors, err := db.GetAuthors(ctx.Request.Context(), &queryParams)
 	if err != nil {
 		handleInternalError(ctx, err)
 		return
 	}
-	ctx.JSON(200, authors)
+	respondJSON(ctx, 200, authors)
 
 }
 
@@ -38,6 +40,7 @@ func getAuthor(ctx *gin.Context) {
 	}
 
 	var queryParams db.AuthorFillFilterParams
+	stopBind := startPhase(ctx, "bind")
 	err = ctx.ShouldBindQuery(&queryParams)
 	if err != nil {
 		handleUserError(ctx, err)
@@ -49,19 +52,27 @@ func getAuthor(ctx *gin.Context) {
 		handleUserError(ctx, err)
 		return
 	}
+	stopBind()
 
-	author, err := db.GetAuthorById(uint(id), &queryParams)
+	etag := listingETag(ctx)
+	if notModified(ctx, etag) {
+		return
+	}
+
+	author, page, err := db.GetAuthorById(ctx.Request.Context(), uint(id), &queryParams)
 	if err != nil {
 		if err == gorm.ErrRecordNotFound {
 			ctx.AbortWithStatus(404)
 			return
 		}
-		handleInternalError(ctx, err)
+		handlePageError(ctx, err)
 		return
 	}
 
 	author.JSONIncludePosts = queryParams.IsFill()
+	setPageHeaders(ctx, page)
+	setETag(ctx, etag)
 
-	ctx.JSON(200, author)
+	respondJSON(ctx, 200, author)
 
 }
@@ -1,8 +1,11 @@
 package views
 
 import (
+	"errors"
 	"github.com/gin-gonic/gin"
+	"github.com/pproj/tutter/db"
 	"github.com/pproj/tutter/observer"
+	"github.com/pproj/tutter/trending"
 )
 
 // handleError create a 500 response for error
@@ -15,4 +18,29 @@ func handleUserError(ctx *gin.Context, err error) {
 	ctx.AbortWithStatusJSON(400, gin.H{"reason": err.Error()})
 }
 
+// handlePageError creates a 400 response for bad cursors, and a 500 for anything else
+func handlePageError(ctx *gin.Context, err error) {
+	if errors.Is(err, db.ErrInvalidCursor) {
+		handleUserError(ctx, err)
+		return
+	}
+	handleInternalError(ctx, err)
+}
+
+// setPageHeaders hands out the cursors of the neighbouring pages, so the client can simply follow them
+func setPageHeaders(ctx *gin.Context, page db.Page) {
+	if page.Next != "" {
+		ctx.Header("X-Next-Cursor", page.Next)
+	}
+	if page.Prev != "" {
+		ctx.Header("X-Prev-Cursor", page.Prev)
+	}
+}
+
 var newPostObserver *observer.NewPostObserver = nil
+
+var postBatcher *db.PostBatcher = nil // only used if enabled
+
+var trendingEngine *trending.Engine = nil
+
+var postStreamChunkSize uint = 1000 // number of posts fetched at once when streaming unbounded listings
@@ -0,0 +1,195 @@
+package views
+
+import (
+	"compress/gzip"
+	"github.com/gin-gonic/gin"
+	"io"
+	"strconv"
+	"strings"
+	"sync"
+)
+
+// Responses are compressed with gzip, if the client accepts it. Zstd would be cheaper on the CPU, but that needs a
+// third party package, and every client speaks gzip anyway
+
+const (
+	compressUndecided = iota
+	compressGzip
+	compressPassThrough
+)
+
+// compressWriter holds back the beginning of the response until it's clear whether it's worth compressing:
+// small responses (long poll replies, single posts) are sent as they are, gzip would only add latency and its header to those.
+// Anything flushed (Server-Sent Events) is sent as it is too, compression would hold back the events
+type compressWriter struct {
+	gin.ResponseWriter
+	pool    *sync.Pool
+	minSize int
+	state   int
+	buf     *[]byte // the beginning of the response, while undecided
+	gz      *gzip.Writer
+}
+
+var compressBufPool = sync.Pool{}
+
+func (w *compressWriter) Written() bool {
+	return w.state != compressUndecided || (w.buf != nil && len(*w.buf) != 0) || w.ResponseWriter.Written()
+}
+
+// compressible tells if the response is something we should compress, once its headers are all set
+func (w *compressWriter) compressible() bool {
+	header := w.Header()
+	if header.Get("Content-Encoding") != "" || header.Get("Content-Range") != "" {
+		return false // encoded already, or a part of something
+	}
+	if strings.HasPrefix(header.Get("Content-Type"), "text/event-stream") {
+		return false
+	}
+	status := w.Status()
+	return status != 204 && status != 206 && status != 304
+}
+
+// decide picks compression or pass-through, and writes out what was held back
+func (w *compressWriter) decide(compress bool) error {
+	if compress && w.compressible() {
+		w.state = compressGzip
+		header := w.Header()
+		header.Set("Content-Encoding", "gzip")
+		header.Del("Content-Length") // that was for the uncompressed body
+		w.gz = w.pool.Get().(*gzip.Writer)
+		w.gz.Reset(w.ResponseWriter)
+	} else {
+		w.state = compressPassThrough
+	}
+
+	if w.buf == nil {
+		return nil
+	}
+	held := *w.buf
+	var err error
+	if len(held) != 0 {
+		if w.state == compressGzip {
+			_, err = w.gz.Write(held)
+		} else {
+			_, err = w.ResponseWriter.Write(held)
+		}
+	}
+	*w.buf = held[:0]
+	compressBufPool.Put(w.buf)
+	w.buf = nil
+	return err
+}
+
+func (w *compressWriter) Write(data []byte) (int, error) {
+	switch w.state {
+	case compressGzip:
+		return w.gz.Write(data)
+	case compressPassThrough:
+		return w.ResponseWriter.Write(data)
+	}
+
+	held := 0
+	if w.buf != nil {
+		held = len(*w.buf)
+	}
+	if held+len(data) >= w.minSize {
+		// big enough, most responses are written at once, so this is usually reached without copying anything
+		err := w.decide(true)
+		if err != nil {
+			return 0, err
+		}
+		return w.Write(data)
+	}
+
+	if w.buf == nil {
+		buf, ok := compressBufPool.Get().(*[]byte)
+		if !ok {
+			b := make([]byte, 0, w.minSize)
+			buf = &b
+		}
+		w.buf = buf
+	}
+	*w.buf = append(*w.buf, data...)
+	return len(data), nil
+}
+
+func (w *compressWriter) WriteString(s string) (int, error) {
+	return w.Write([]byte(s))
+}
+
+func (w *compressWriter) WriteHeaderNow() {
+	if w.state == compressUndecided {
+		_ = w.decide(false) // the headers are going out, it's too late to say it's compressed
+	}
+	w.ResponseWriter.WriteHeaderNow()
+}
+
+func (w *compressWriter) Flush() {
+	switch w.state {
+	case compressUndecided:
+		_ = w.decide(false) // someone is in a hurry, don't hold back anything
+	case compressGzip:
+		_ = w.gz.Flush()
+	}
+	w.ResponseWriter.Flush()
+}
+
+// finish writes out whatever is left, must be called once the handlers are done
+func (w *compressWriter) finish() {
+	switch w.state {
+	case compressUndecided:
+		_ = w.decide(false) // it stayed under the limit
+	case compressGzip:
+		_ = w.gz.Close()
+		w.gz.Reset(io.Discard) // so the pool does not hold on to the connection
+		w.pool.Put(w.gz)
+		w.gz = nil
+	}
+}
+
+// acceptsGzip checks the Accept-Encoding header of the request, q=0 means the client refuses it
+func acceptsGzip(acceptEncoding string) bool {
+	for _, part := range strings.Split(acceptEncoding, ",") {
+		coding, params, _ := strings.Cut(part, ";")
+		coding = strings.ToLower(strings.TrimSpace(coding))
+		if coding != "gzip" && coding != "x-gzip" && coding != "*" {
+			continue
+		}
+		params = strings.TrimSpace(params)
+		if q, ok := strings.CutPrefix(params, "q="); ok {
+			if value, err := strconv.ParseFloat(q, 64); err == nil && value == 0 {
+				return false
+			}
+		}
+		return true
+	}
+	return false
+}
+
+// compressionMiddleware gzips responses of at least minSize bytes for clients that accept it.
+// The encoders are pooled, setting one up is expensive
+func compressionMiddleware(level, minSize int) (gin.HandlerFunc, error) {
+	// fail early on a bad level, instead of on the first request
+	_, err := gzip.NewWriterLevel(io.Discard, level)
+	if err != nil {
+		return nil, err
+	}
+	pool := &sync.Pool{New: func() any {
+		gz, _ := gzip.NewWriterLevel(io.Discard, level) // checked above
+		return gz
+	}}
+
+	return func(ctx *gin.Context) {
+		ctx.Writer.Header().Add("Vary", "Accept-Encoding") // caches must not hand out the compressed version to those who can't take it
+		if !acceptsGzip(ctx.GetHeader("Accept-Encoding")) || ctx.Request.Method == "HEAD" {
+			ctx.Next()
+			return
+		}
+
+		w := &compressWriter{ResponseWriter: ctx.Writer, pool: pool, minSize: minSize}
+		ctx.Writer = w
+		ctx.Next()
+		w.finish()
+		ctx.Writer = w.ResponseWriter // the middlewares before us may expect their own writer back
+	}, nil
+}
@@ -31,6 +31,8 @@ func debugCleanup(ctx *gin.Context) {
 
 	db.CleanUpEverything()
 	newPostObserver.DebugCleanup()
+	trendingEngine.DebugCleanup()
+	resetValidators()
 
 	ctx.Status(200)
 
@@ -58,6 +60,72 @@ func debugSetTrending(ctx *gin.Context) {
 		return
 	}
 
+	// reloaded instead of just pinning it, so tags that don't exist are not pinned, same as in the DB
+	err = loadPinnedTags(ctx.Request.Context())
+	if err != nil {
+		handleInternalError(ctx, err)
+		return
+	}
+
 	ctx.Status(200)
 
 }
+
+func debugSeed(ctx *gin.Context) {
+	l, ok := ctx.Get("l")
+	if !ok {
+		panic("could not access logger")
+	}
+	logger := l.(*zap.Logger)
+
+	type seedPostType struct {
+		Author string `json:"author" binding:"required"`
+		Text   string `json:"text" binding:"required"`
+	}
+	type seedParamsType struct {
+		Posts []seedPostType `json:"posts" binding:"required"`
+	}
+	var seedParams seedParamsType
+	err := ctx.ShouldBindJSON(&seedParams)
+	if err != nil {
+		handleUserError(ctx, err)
+		return
+	}
+
+	if len(seedParams.Posts) == 0 {
+		handleUserError(ctx, fmt.Errorf("posts should not be empty"))
+		return
+	}
+
+	logger.Info("DEBUG SEED ENDPOINT IS USED!", zap.Int("posts", len(seedParams.Posts)))
+
+	// Posts are validated the same way as they would be when created normally, so that the seeded data would be the same
+	posts := make([]*db.Post, len(seedParams.Posts))
+	for i, p := range seedParams.Posts {
+		posts[i], err = compileNewPost(p.Author, p.Text)
+		if err != nil {
+			handleUserError(ctx, fmt.Errorf("post %d: %w", i, err))
+			return
+		}
+	}
+
+	firstId, lastId, err := db.SeedPosts(ctx.Request.Context(), posts)
+	if err != nil {
+		handleInternalError(ctx, err)
+		return
+	}
+	sawPost(lastId)
+
+	// Let the long polling fellas know about every one of them, filtered ones only wake up for the posts they match
+	err = notifyNewPosts(ctx.Request.Context())
+	if err != nil {
+		handleInternalError(ctx, err)
+		return
+	}
+
+	ctx.JSON(201, gin.H{
+		"count":    len(posts),
+		"first_id": firstId,
+		"last_id":  lastId,
+	})
+}
@@ -0,0 +1,96 @@
+package views
+
+import (
+	"fmt"
+	"github.com/gin-gonic/gin"
+	"hash/fnv"
+	"strings"
+	"sync/atomic"
+	"time"
+)
+
+// Posts never change, and authors and tags only come with new posts, so as long as no new post was created,
+// every listing returns the same thing. The id of the last post is all it takes to tell if a client's copy is still good,
+// and we know that without asking the database.
+// The ETags are weak, as the same JSON may be sent with different encodings.
+//
+// This relies on post ids being committed in order, the same way long polling does. If a post with a lower id commits
+// after a higher one was seen, a listing cached in between misses it until the next post comes along.
+
+var (
+	// etagEpoch changes when the ids start over. It's the start time in debug mode, where the DB may be cleaned up
+	// between runs, otherwise the same for every replica, so their ETags match too
+	etagEpoch atomic.Int64
+
+	// bootID tells runs apart, used where the version is only known in memory (the trending tags)
+	bootID = time.Now().UnixNano()
+
+	// lastCreatedPostID is the last post created here. The observer learns about those asynchronously, but a client
+	// that created a post expects to see it right away
+	lastCreatedPostID atomic.Uint64
+)
+
+// sawPost makes sure the validators change once a post was created
+func sawPost(id uint64) {
+	for {
+		current := lastCreatedPostID.Load()
+		if id <= current || lastCreatedPostID.CompareAndSwap(current, id) {
+			return
+		}
+	}
+}
+
+// resetValidators is used when the DB is cleaned up, so ids start over
+func resetValidators() {
+	etagEpoch.Add(1)
+	lastCreatedPostID.Store(0)
+}
+
+// listingETag derives the ETag of a listing from the last post id and the normalized query of the request
+func listingETag(ctx *gin.Context) string {
+	lastID := lastCreatedPostID.Load()
+	if lastPost := newPostObserver.LastPost(); lastPost != nil && lastPost.ID > lastID {
+		lastID = lastPost.ID
+	}
+
+	h := fnv.New64a()
+	_, _ = h.Write([]byte(ctx.Request.URL.Path))
+	_, _ = h.Write([]byte{'?'})
+	_, _ = h.Write([]byte(ctx.Request.URL.Query().Encode())) // sorted by key, so the order of the params does not matter
+	return fmt.Sprintf(`W/"%x.%x.%x"`, etagEpoch.Load(), lastID, h.Sum64())
+}
+
+// trendingETag derives the ETag of the trending tags from the version of the snapshot
+func trendingETag(version uint64) string {
+	return fmt.Sprintf(`W/"t%x.%x"`, bootID, version)
+}
+
+// notModified answers with 304 if the client has the current version already, returns true if it did so.
+// Otherwise the ETag should be set on the response with setETag, once it's sure that it will be a 200
+func notModified(ctx *gin.Context, etag string) bool {
+	if !etagMatches(ctx.GetHeader("If-None-Match"), etag) {
+		return false
+	}
+	setETag(ctx, etag)
+	ctx.AbortWithStatus(304)
+	return true
+}
+
+func setETag(ctx *gin.Context, etag string) {
+	ctx.Header("ETag", etag)
+}
+
+// etagMatches does the weak comparison of If-None-Match, which may list multiple ETags, or be a *
+func etagMatches(ifNoneMatch, etag string) bool {
+	if ifNoneMatch == "" {
+		return false
+	}
+	etag = strings.TrimPrefix(etag, "W/")
+	for _, candidate := range strings.Split(ifNoneMatch, ",") {
+		candidate = strings.TrimSpace(candidate)
+		if candidate == "*" || strings.TrimPrefix(candidate, "W/") == etag {
+			return true
+		}
+	}
+	return false
+}
@@ -5,6 +5,7 @@ import (
 	"fmt"
 	"github.com/gin-gonic/gin"
 	"github.com/pproj/tutter/db"
+	"github.com/pproj/tutter/observer"
 	"gorm.io/gorm"
 	"time"
 )
@@ -31,27 +32,15 @@ func (l longPollQueryParams) Evaluate(p *db.Post) bool {
 	if p == nil { // Would this ever happen?
 		return false
 	}
+	return l.SubscriptionFilter().Matches(p)
+}
 
-	if l.AuthorId != nil { // filtering for author_id
-		if p.AuthorID != *l.AuthorId {
-			return false
-		}
-	} else if l.Tag != nil { // filtering for tag (should not filter for both, so else-if is fine
-
-		found := false
-		for _, tag := range p.Tags { // very lame linear search
-			if tag.Tag == *l.Tag {
-				found = true
-				break
-			}
-		}
-		if !found {
-			return false
-		}
-
+// SubscriptionFilter makes sure we are only woken up by posts that we may be interested in
+func (l longPollQueryParams) SubscriptionFilter() observer.SubscriptionFilter {
+	return observer.SubscriptionFilter{
+		AuthorID: l.AuthorId,
+		Tag:      l.Tag,
 	}
-
-	return true
 }
 
 func (l longPollQueryParams) ConvertToStandard() db.PostFilterParams { // oh Lord forgive me...
@@ -72,6 +61,7 @@ func longPoll(ctx *gin.Context) {
 	defer cancel() // <- This will cause ctx2.Done() channel to return
 
 	var queryParams longPollQueryParams
+	stopBind := startPhase(ctx, "bind")
 	err := ctx.ShouldBindQuery(&queryParams)
 	if err != nil {
 		handleUserError(ctx, err)
@@ -83,6 +73,7 @@ func longPoll(ctx *gin.Context) {
 		handleUserError(ctx, err)
 		return
 	}
+	stopBind()
 
 	var lastID uint64
 	if queryParams.Last != nil {
@@ -99,7 +90,11 @@ func longPoll(ctx *gin.Context) {
 		// TODO: Document somewhere that it's unlikely the best option
 	}
 
-	newPostChan, err := newPostObserver.Subscribe(ctx2)
+	newPostChan, err := newPostObserver.Subscribe(ctx2, queryParams.SubscriptionFilter())
+	if err != nil {
+		handleInternalError(ctx, err)
+		return
+	}
 
 	var posts *[]db.Post
 
@@ -111,11 +106,12 @@ BigWait:
 	SmallWait:
 		for { // This is looped if we receive something on the channel, but it's not what we are looking for...
 			select {
-			case newPost := <-newPostChan: // The last post is always put in the channel when it's created
+			case event := <-newPostChan: // The last post is always put in the channel when it's created
 
-				if newPost == nil || newPost.ID <= lastID {
+				if event == nil || event.Post.ID <= lastID {
 					continue SmallWait
 				}
+				newPost := event.Post
 
 				// The user does not know about this post...
 
@@ -128,6 +124,16 @@ BigWait:
 						lastID = newPost.ID // wait for the next post, since this one did not match
 						continue SmallWait
 					}
+
+					// The user is up-to-date and this post matched, so it is exactly what we should respond with.
+					// The response is encoded once for everyone waiting, we just have to write the same bytes
+					payload, err := event.Payload()
+					if err != nil {
+						handleInternalError(ctx, err)
+						return
+					}
+					ctx.Data(200, "application/json; charset=utf-8", payload)
+					return
 				}
 
 				// The user is more than one post behind OR the latest post matched
@@ -150,6 +156,24 @@ BigWait:
 			}
 		} // end of SmallWait
 
+		// Most of the time the posts the user missed are still in memory, so there's no need to bother the DB
+		recentPosts, ok := newPostObserver.PostsAfter(lastID, queryParams.SubscriptionFilter())
+		if ok {
+			if len(recentPosts) == 0 {
+				if lastPostIdReceivedOnTheChannel != 0 {
+					lastID = lastPostIdReceivedOnTheChannel // wait for the next post, since this one did not match
+				}
+				continue BigWait
+			}
+
+			memPosts := make([]db.Post, len(recentPosts))
+			for i, p := range recentPosts {
+				memPosts[i] = *p
+			}
+			posts = &memPosts
+			break BigWait
+		}
+
 		// We MIGHT have something in the DB for the user...
 		magicQueryParams := queryParams.ConvertToStandard()
 		magicQueryParams.AfterId = &lastID // update the last id that we optimized (it isn't actually needed*)
@@ -163,7 +187,7 @@ BigWait:
 			But (if everything works correctly) incrementing the ID should not change the result returned from the DB,
 			so there is no point of incrementing it, other than maybe having the DB do less work we already did locally
 		*/
-		posts, err = db.GetPosts(&magicQueryParams)
+		posts, err = db.GetPosts(ctx.Request.Context(), &magicQueryParams)
 		if err != nil {
 
 			if err == gorm.ErrRecordNotFound {
@@ -189,6 +213,6 @@ BigWait:
 
 	}
 
-	ctx.JSON(200, posts)
+	respondJSON(ctx, 200, posts)
 
 }
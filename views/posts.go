@@ -1,6 +1,7 @@
 package views
 
 import (
+	"bytes"
 	"fmt"
 	"github.com/gin-gonic/gin"
 	"github.com/microcosm-cc/bluemonday"
@@ -31,32 +32,20 @@ func init() {
 	blueMondayPolicy = bluemonday.StrictPolicy()
 }
 
-func createPost(ctx *gin.Context) {
-
-	// First, parse json
-
-	type newPostParamsType struct {
-		Author string `json:"author" binding:"required"` // length binding requirement removed, as it was not working
-		Text   string `json:"text" binding:"required"`
-	}
-	var newPostParams newPostParamsType
-	err := ctx.ShouldBindJSON(&newPostParams)
-	if err != nil {
-		handleUserError(ctx, err)
-		return
-	}
+// compileNewPost validates and sanitizes the author and text of a new post, and then compiles it into a post object with tags extracted.
+// The returned error is always the user's fault
+func compileNewPost(author, text string) (*db.Post, error) {
 
 	// initial length check
-	if utf8.RuneCountInString(newPostParams.Text) > TEXT_MAX_LEN || utf8.RuneCountInString(newPostParams.Author) > AUTHOR_MAX_LEN {
-		handleUserError(ctx, fmt.Errorf("text or author too long"))
-		return
+	if utf8.RuneCountInString(text) > TEXT_MAX_LEN || utf8.RuneCountInString(author) > AUTHOR_MAX_LEN {
+		return nil, fmt.Errorf("text or author too long")
 	}
 
 	// Then sanitize and check text
 	sanitizedText := strings.TrimSpace(
 		html.UnescapeString( // <- This is another ugly hack* https://github.com/microcosm-cc/bluemonday/issues/39
 			blueMondayPolicy.Sanitize(
-				newPostParams.Text,
+				text,
 			),
 		),
 	)
@@ -70,35 +59,30 @@ func createPost(ctx *gin.Context) {
 	if utf8.RuneCountInString(sanitizedText) == 0 || len(sanitizedText) == 0 {
 		// rune count and len should both be zero if the other one is zero, as a zero length string can not contain any rune
 		// But I'm too stupid for unicode, so I make sure... if this really is unnecessary the compiler will optimize it out anyway
-		handleUserError(ctx, fmt.Errorf("text empty"))
-		return
+		return nil, fmt.Errorf("text empty")
 	}
 
 	if utf8.RuneCountInString(sanitizedText) > TEXT_MAX_LEN {
 		// This should not happen either, but whatever
-		handleUserError(ctx, fmt.Errorf("text too long"))
-		return
+		return nil, fmt.Errorf("text too long")
 	}
 
 	// then validate author
 
-	if len(newPostParams.Author) == 0 {
-		handleUserError(ctx, fmt.Errorf("author empty"))
-		return
+	if len(author) == 0 {
+		return nil, fmt.Errorf("author empty")
 	}
 
-	if len(newPostParams.Author) > AUTHOR_MAX_LEN {
-		handleUserError(ctx, fmt.Errorf("author too long"))
-		return
+	if len(author) > AUTHOR_MAX_LEN {
+		return nil, fmt.Errorf("author too long")
 	}
 
-	sanitizedAuthor := strings.TrimSpace(blueMondayPolicy.Sanitize(newPostParams.Author))
+	sanitizedAuthor := strings.TrimSpace(blueMondayPolicy.Sanitize(author))
 
 	if (!authorRegex.MatchString(sanitizedAuthor)) || // only lowercase and numbers
-		sanitizedAuthor != newPostParams.Author ||
-		len(newPostParams.Author) != utf8.RuneCountInString(newPostParams.Author) {
-		handleUserError(ctx, fmt.Errorf("author invalid"))
-		return
+		sanitizedAuthor != author ||
+		len(author) != utf8.RuneCountInString(author) {
+		return nil, fmt.Errorf("author invalid")
 	}
 
 	// Then extract tags from sanitized data
@@ -136,37 +120,75 @@ func createPost(ctx *gin.Context) {
 	newPost := db.Post{
 		Text: sanitizedText,
 		Author: &db.Author{
-			Name: newPostParams.Author, // we already validated that author name must match the sanitized author name, otherwise we would refuse posting
+			Name: author, // we already validated that author name must match the sanitized author name, otherwise we would refuse posting
 		},
 		Tags: tags,
 	}
 
-	// Submit to db
-	err = db.CreatePost(&newPost)
+	return &newPost, nil
+}
+
+func createPost(ctx *gin.Context) {
+
+	// First, parse json
+
+	type newPostParamsType struct {
+		Author string `json:"author" binding:"required"` // length binding requirement removed, as it was not working
+		Text   string `json:"text" binding:"required"`
+	}
+	var newPostParams newPostParamsType
+	stopBind := startPhase(ctx, "bind")
+	err := ctx.ShouldBindJSON(&newPostParams)
 	if err != nil {
-		handleInternalError(ctx, err)
+		handleUserError(ctx, err)
 		return
 	}
 
-	// Broadcast to all long polling fellas
-	err = newPostObserver.Notify(&newPost)
+	// Then validate, sanitize and compile the post
+	newPost, err := compileNewPost(newPostParams.Author, newPostParams.Text)
 	if err != nil {
-		l, ok := ctx.Get("l")
-		if !ok {
-			panic("could not access logger")
+		handleUserError(ctx, err)
+		return
+	}
+	stopBind()
+
+	if postBatcher != nil {
+		// Submit to db along with the others posting right now, the batcher lets the long polling fellas know too
+		err = postBatcher.Create(ctx.Request.Context(), newPost)
+		if err != nil {
+			handleInternalError(ctx, err)
+			return
+		}
+	} else {
+		// Submit to db
+		err = db.CreatePost(ctx.Request.Context(), newPost)
+		if err != nil {
+			handleInternalError(ctx, err)
+			return
+		}
+		sawPost(newPost.ID)
+
+		// Broadcast to all long polling fellas
+		err = newPostObserver.Notify(newPost)
+		if err != nil {
+			l, ok := ctx.Get("l")
+			if !ok {
+				panic("could not access logger")
+			}
+			logger := l.(*zap.Logger)
+			logger.Error("Error while notifying observers", zap.Error(err))
 		}
-		logger := l.(*zap.Logger)
-		logger.Error("Error while notifying observers", zap.Error(err))
 	}
 
 	// return 201
-	ctx.JSON(201, newPost)
+	respondJSON(ctx, 201, newPost)
 
 }
 
 func listPosts(ctx *gin.Context) {
 
 	var queryParams db.PostFilterParams
+	stopBind := startPhase(ctx, "bind")
 	err := ctx.ShouldBindQuery(&queryParams)
 	if err != nil {
 		handleUserError(ctx, err)
@@ -178,25 +200,96 @@ func listPosts(ctx *gin.Context) {
 		handleUserError(ctx, err)
 		return
 	}
+	stopBind()
+
+	etag := listingETag(ctx)
+	if notModified(ctx, etag) {
+		return // nothing new since the client got it, no need to ask the DB
+	}
 
-	posts, err := db.GetPosts(&queryParams)
+	if queryParams.Unbounded() {
+		// this may be millions of posts, they are not loaded all at once
+		streamPosts(ctx, &queryParams, etag)
+		return
+	}
+
+	posts, page, err := db.GetPostsPage(ctx.Request.Context(), &queryParams)
 	if err != nil {
-		handleInternalError(ctx, err)
+		handlePageError(ctx, err)
 		return
 	}
 
-	ctx.JSON(200, posts)
+	setPageHeaders(ctx, page)
+	setETag(ctx, etag)
+	respondJSON(ctx, 200, posts)
+
+}
 
+// streamPosts writes an unbounded listing as it is read from the DB chunk by chunk, so memory use does not grow with the number of posts.
+// Nothing is written until the first chunk is there, so most errors still end up as a proper 500. Once the response has started,
+// there's no way to tell the client about an error, other than cutting the response short (leaving it invalid JSON)
+func streamPosts(ctx *gin.Context, queryParams *db.PostFilterParams, etag string) {
+	started := false
+	var buf bytes.Buffer // reused for every chunk
+	err := db.StreamPosts(ctx.Request.Context(), queryParams, postStreamChunkSize, func(posts []db.Post) error {
+		stop := startPhase(ctx, "encode")
+		buf.Reset()
+		for i := range posts {
+			data, err := posts[i].MarshalJSON() // cached
+			if err != nil {
+				return err
+			}
+			if started {
+				buf.WriteByte(',')
+			} else {
+				buf.WriteByte('[')
+				started = true
+			}
+			buf.Write(data)
+		}
+		stop()
+
+		if !ctx.Writer.Written() {
+			setETag(ctx, etag)
+			ctx.Header("Content-Type", "application/json; charset=utf-8")
+			ctx.Status(200)
+		}
+		_, err := ctx.Writer.Write(buf.Bytes())
+		return err // the client went away, no need to go on
+	})
+
+	if err != nil {
+		if !ctx.Writer.Written() {
+			handleInternalError(ctx, err)
+			return
+		}
+		l, ok := ctx.Get("l")
+		if !ok {
+			panic("could not access logger")
+		}
+		logger := l.(*zap.Logger)
+		logger.Warn("Error while streaming posts, the response is cut short", zap.Error(err))
+		return
+	}
+
+	if !started {
+		setETag(ctx, etag)
+		ctx.Data(200, "application/json; charset=utf-8", []byte("[]"))
+		return
+	}
+	_, _ = ctx.Writer.Write([]byte{']'})
 }
 
 func getPost(ctx *gin.Context) { // This one does not take any query params
+	stopBind := startPhase(ctx, "bind")
 	id, err := strconv.ParseUint(ctx.Param("id"), 10, 64)
 	if err != nil {
 		handleUserError(ctx, err)
 		return
 	}
+	stopBind()
 
-	post, err := db.GetPostById(id)
+	post, err := db.GetPostById(ctx.Request.Context(), id)
 
 	if err != nil {
 
@@ -210,6 +303,6 @@ func getPost(ctx *gin.Context) { // This one does not take any query params
 
 	}
 
-	ctx.JSON(200, post)
+	respondJSON(ctx, 200, post)
 
 }
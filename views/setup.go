@@ -1,43 +1,156 @@
 package views
 
 import (
+	"context"
+	"fmt"
 	"github.com/gin-gonic/gin"
 	"github.com/pproj/tutter/db"
 	"github.com/pproj/tutter/observer"
+	"github.com/pproj/tutter/trending"
+	"gitlab.com/MikeTTh/env"
 	"go.uber.org/zap"
 	"gorm.io/gorm"
 	"time"
 )
 
+// catchUpWithDB notifies the observer of the posts in the DB that are newer than the last one it knows about, every one of them in order
+func catchUpWithDB(logger *zap.Logger) {
+	err := notifyNewPosts(context.Background())
+	if err != nil {
+		logger.Warn("Error while catching up with the posts in the DB", zap.Error(err))
+	}
+}
+
 // dbIdPoller is used to give subscribers that missed an event a second chance of catching it.
-// This is also useful when the application is running in multiple replicas and the shared sync thing does not work for some reason
-func dbIdPoller(logger *zap.Logger) {
+// Posts created on other replicas are announced by Postgres (see newPostListener), so this is only a slow safety net in case that does not work for some reason
+func dbIdPoller(logger *zap.Logger, interval time.Duration) {
 	for {
-		time.Sleep(time.Second * 30)
-		lastPostInDB, err := db.GetLastPost()
-		if err != nil {
+		time.Sleep(interval)
+		catchUpWithDB(logger)
+	}
+}
 
-			if err == gorm.ErrRecordNotFound {
-				continue // ignore without warning
+// notifyNewPosts loads every post after the last one the observer knows about, and notifies the observer of each of them in order.
+// Notifying only the newest one is not enough: subscribers are indexed by their filters, so a post only wakes up those it matches,
+// and the ring of recent posts (used by the pollers and the trending engine) would have a hole
+func notifyNewPosts(ctx context.Context) error {
+	var lastID uint64
+	if lastPost := newPostObserver.LastPost(); lastPost != nil {
+		lastID = lastPost.ID
+	}
+	return notifyPosts(ctx, lastID, nil)
+}
+
+// notifyPosts loads the posts after afterID (and before beforeID, if set), and notifies the observer of each of them in order
+func notifyPosts(ctx context.Context, afterID uint64, beforeID *uint64) error {
+	order := db.FilterParamOrderAscending
+	filter := db.PostFilterParams{
+		CommonPaginationParams: db.CommonPaginationParams{Order: &order},
+		AfterId:                &afterID,
+		BeforeId:               beforeID,
+	}
+	// streamed, as there may be a lot of them after a bulk seed
+	return db.StreamPosts(ctx, &filter, postStreamChunkSize, func(posts []db.Post) error {
+		for i := range posts {
+			err := newPostObserver.Notify(&posts[i])
+			if err != nil {
+				return err
 			}
+		}
+		return nil
+	})
+}
 
-			logger.Warn("Error during periodic query for the last post id", zap.Error(err))
-			continue // ignore
+// notifyAnnouncedPosts loads the posts another replica committed with ids from firstID to lastID
+func notifyAnnouncedPosts(ctx context.Context, firstID, lastID uint64) error {
+	var knownID uint64
+	if lastPost := newPostObserver.LastPost(); lastPost != nil {
+		knownID = lastPost.ID
+	}
+	if firstID <= knownID {
+		// Committed after some posts with higher ids were announced already, the observer still delivers them (as late posts).
+		// Any of them we knew about already are delivered again, the subscribers skip what they have seen
+		beforeID := min(lastID, knownID) + 1
+		err := notifyPosts(ctx, firstID-1, &beforeID)
+		if err != nil {
+			return err
 		}
+	}
+	if lastID > knownID {
+		return notifyNewPosts(ctx)
+	}
+	return nil
+}
 
-		lastPostInMemory := newPostObserver.LastPost()
-		if lastPostInMemory == nil || lastPostInDB.ID > lastPostInMemory.ID { // <- this is not atomic, but post ids only expected to grow, so this should not be an issue
-			err = newPostObserver.Notify(lastPostInDB)
-			if err != nil {
-				logger.Warn("Error while notifying observers of the result of a periodic query", zap.Error(err))
-				continue // ignore
-			}
+// newPostListener wakes up the long pollers waiting on this replica when a post is created on another one
+func newPostListener(logger *zap.Logger) {
+	db.ListenForNewPosts(context.Background(), logger, func(firstID, lastID uint64) {
+		err := notifyAnnouncedPosts(context.Background(), firstID, lastID)
+		if err != nil {
+			logger.Warn("Error while loading the posts created on another replica", zap.Uint64("firstID", firstID), zap.Uint64("lastID", lastID), zap.Error(err))
+		}
+	}, func() {
+		// we may have missed something while we weren't listening
+		catchUpWithDB(logger)
+	})
+}
+
+// loadPinnedTags hands the tags flagged as trending in the DB to the trending engine, those are always trending
+func loadPinnedTags(ctx context.Context) error {
+	tags, err := db.GetTrendingTags(ctx)
+	if err != nil {
+		return err
+	}
+	names := make([]string, len(*tags))
+	for i, tag := range *tags {
+		names[i] = tag.Tag
+	}
+	trendingEngine.SetPinned(names)
+	return nil
+}
+
+// pinnedTagPoller picks up the trending flags set on other replicas
+func pinnedTagPoller(logger *zap.Logger, interval time.Duration) {
+	for {
+		time.Sleep(interval)
+		err := loadPinnedTags(context.Background())
+		if err != nil {
+			logger.Warn("Error while loading the pinned trending tags", zap.Error(err))
 		}
 	}
 }
 
 func SetupEndpoints(routerGroup *gin.RouterGroup, logger *zap.Logger, debug bool, debugPin string) error {
 
+	if debug {
+		// must be registered before the endpoints, otherwise gin would not apply it to them
+		routerGroup.Use(serverTimingMiddleware())
+
+		// the DB may be cleaned up by the debug endpoints, and the ids start over, so the ETags of earlier runs must not match
+		etagEpoch.Store(time.Now().UnixNano())
+	}
+
+	// Compress big responses, registered before the endpoints for the same reason as the Server-Timing middleware
+	compressionLevel := env.Int("COMPRESSION_LEVEL", 1)
+	if compressionLevel != 0 {
+		compressionMinSize := env.Int("COMPRESSION_MIN_SIZE", 1024)
+		if compressionMinSize < 0 {
+			return fmt.Errorf("compression min size must not be negative")
+		}
+		compression, err := compressionMiddleware(compressionLevel, compressionMinSize)
+		if err != nil {
+			return fmt.Errorf("invalid compression level: %w", err)
+		}
+		routerGroup.Use(compression)
+	}
+
+	// Unbounded post listings are streamed in chunks of this many posts (catching up with the DB is done the same way)
+	chunkSize := env.Int("POST_STREAM_CHUNK_SIZE", 1000)
+	if chunkSize <= 0 {
+		return fmt.Errorf("post stream chunk size must be a positive number")
+	}
+	postStreamChunkSize = uint(chunkSize)
+
 	// First, setup observer for the long polling thing
 	lastPost, err := db.GetLastPost()
 	if err == gorm.ErrRecordNotFound {
@@ -45,9 +158,68 @@ func SetupEndpoints(routerGroup *gin.RouterGroup, logger *zap.Logger, debug bool
 	} else if err != nil {
 		return err
 	}
-	newPostObserver = observer.NewNewPostObserver(lastPost, debug)
+	ringSize := env.Int("LONGPOLL_RING_SIZE", 1024)
+	if ringSize < 0 {
+		return fmt.Errorf("long poll ring size must not be negative")
+	}
+	newPostObserver = observer.NewNewPostObserver(lastPost, debug, ringSize)
 	routerGroup.GET("/poll", longPoll)
-	go dbIdPoller(logger)
+	routerGroup.GET("/stream", stream)
+
+	pollInterval := env.Int("LONGPOLL_DB_POLL_INTERVAL", 300)
+	if pollInterval <= 0 {
+		return fmt.Errorf("long poll db poll interval must be a positive number")
+	}
+	go dbIdPoller(logger, time.Duration(pollInterval)*time.Second)
+	if env.Bool("POSTGRESQL_LISTEN", true) {
+		go newPostListener(logger)
+	}
+
+	// Group commit of new posts, disabled by default
+	batchWindow := env.Int("POST_BATCH_WINDOW", 0)
+	if batchWindow < 0 {
+		return fmt.Errorf("post batch window must not be negative")
+	}
+	if batchWindow > 0 {
+		batchSize := env.Int("POST_BATCH_SIZE", 100)
+		if batchSize <= 0 {
+			return fmt.Errorf("post batch size must be a positive number")
+		}
+		postBatcher = db.NewPostBatcher(logger, time.Duration(batchWindow)*time.Millisecond, batchSize, func(posts []*db.Post) {
+			for _, post := range posts { // they are in id order already
+				sawPost(post.ID)
+				err := newPostObserver.Notify(post)
+				if err != nil {
+					logger.Error("Error while notifying observers", zap.Error(err))
+				}
+			}
+		})
+	}
+
+	// Trending tags are counted from the stream of new posts
+	trendingWindow := env.Int("TRENDING_WINDOW", 3600)
+	if trendingWindow <= 0 {
+		return fmt.Errorf("trending window must be a positive number")
+	}
+	trendingSize := env.Int("TRENDING_SIZE", 10)
+	if trendingSize < 0 {
+		return fmt.Errorf("trending size must not be negative")
+	}
+	trendingMinPosts := env.Int("TRENDING_MIN_POSTS", 5)
+	if trendingMinPosts <= 0 {
+		return fmt.Errorf("trending min posts must be a positive number")
+	}
+	trendingCapacity := env.Int("TRENDING_CAPACITY", 1000)
+	if trendingCapacity <= 0 || trendingCapacity < trendingSize {
+		return fmt.Errorf("trending capacity must be a positive number, and at least the trending size")
+	}
+	trendingEngine = trending.NewEngine(time.Duration(trendingWindow)*time.Second, trendingSize, uint64(trendingMinPosts), trendingCapacity)
+	err = loadPinnedTags(context.Background())
+	if err != nil {
+		return err
+	}
+	go trendingEngine.Run(newPostObserver, time.Second)
+	go pinnedTagPoller(logger, time.Minute)
 
 	// Then the REST
 	routerGroup.POST("/post", createPost)
@@ -66,6 +238,7 @@ func SetupEndpoints(routerGroup *gin.RouterGroup, logger *zap.Logger, debug bool
 		debugGroup := routerGroup.Group("/debug")
 		debugGroup.Use(createDebugAuth(debugPin))
 		debugGroup.POST("/cleanup", debugCleanup)
+		debugGroup.POST("/seed", debugSeed)
 		debugGroup.PUT("/setTrending/:tag", debugSetTrending)
 		debugGroup.DELETE("/setTrending/:tag", debugSetTrending)
 	}
@@ -0,0 +1,240 @@
+package views
+
+import (
+	"fmt"
+	"github.com/gin-gonic/gin"
+	"github.com/pproj/tutter/db"
+	"github.com/pproj/tutter/observer"
+	"go.uber.org/zap"
+	"gorm.io/gorm"
+	"strconv"
+	"time"
+)
+
+// sseHeartbeatInterval is how often a comment is sent on an idle stream, so that proxies and load balancers would not cut it
+const sseHeartbeatInterval = 15 * time.Second
+
+// streamCatchUp returns the posts after lastID up to untilID that match the filters, along with the ids of every post in that range
+// (matching or not), so the ones not committed yet can be told apart from the ones filtered out. Memory is tried first, then the DB
+func streamCatchUp(ctx *gin.Context, queryParams longPollQueryParams, lastID, untilID uint64) ([]*db.Post, []uint64, error) {
+	if untilID <= lastID {
+		return nil, nil, nil
+	}
+
+	var posts []*db.Post
+	var ids []uint64
+	recentPosts, ok := newPostObserver.PostsAfter(lastID, observer.SubscriptionFilter{}) // every post, for the ids
+	if ok {
+		for _, post := range recentPosts {
+			if post.ID > untilID {
+				break // posts after untilID are not needed yet, they will arrive on the channel anyway
+			}
+			ids = append(ids, post.ID)
+			if queryParams.Evaluate(post) {
+				posts = append(posts, post)
+			}
+		}
+		return posts, ids, nil
+	}
+
+	// the ids first, whatever is committed by then is surely in the listing too
+	ids, err := db.GetPostIds(ctx.Request.Context(), lastID, untilID)
+	if err != nil {
+		return nil, nil, err
+	}
+	order := db.FilterParamOrderAscending
+	beforeID := untilID + 1
+	dbQueryParams := queryParams.ConvertToStandard()
+	dbQueryParams.Order = &order
+	dbQueryParams.AfterId = &lastID
+	dbQueryParams.BeforeId = &beforeID
+	dbPosts, err := db.GetPosts(ctx.Request.Context(), &dbQueryParams)
+	if err != nil && err != gorm.ErrRecordNotFound {
+		return nil, nil, err
+	}
+	if dbPosts != nil {
+		posts = make([]*db.Post, len(*dbPosts))
+		for i := range *dbPosts {
+			posts[i] = &(*dbPosts)[i]
+		}
+	}
+	return posts, ids, nil
+}
+
+// stream is a Server-Sent Events alternative of the long polling endpoint: the connection is kept open, and new posts are pushed as they arrive.
+// It accepts the same parameters as /poll, and the standard Last-Event-ID header (which takes precedence over `last`) when reconnecting
+func stream(ctx *gin.Context) {
+	var queryParams longPollQueryParams
+	err := ctx.ShouldBindQuery(&queryParams)
+	if err != nil {
+		handleUserError(ctx, err)
+		return
+	}
+
+	err = queryParams.Validate()
+	if err != nil {
+		handleUserError(ctx, err)
+		return
+	}
+
+	if lastEventID := ctx.GetHeader("Last-Event-ID"); lastEventID != "" {
+		var id uint64
+		id, err = strconv.ParseUint(lastEventID, 10, 64)
+		if err != nil {
+			handleUserError(ctx, err)
+			return
+		}
+		queryParams.Last = &id
+	}
+
+	// Subscribe before catching up, so nothing can slip through between the two
+	newPostChan, err := newPostObserver.Subscribe(ctx.Request.Context(), queryParams.SubscriptionFilter())
+	if err != nil {
+		handleInternalError(ctx, err)
+		return
+	}
+
+	// lastID is where the client is at, everything after it is sent if it matches (see streamCursor)
+	var lastID uint64
+	if queryParams.Last != nil {
+		lastID = *queryParams.Last
+	} else if lastPost := newPostObserver.LastPost(); lastPost != nil {
+		lastID = lastPost.ID // same as /poll: only new posts from now on
+	}
+	cursor := newStreamCursor(lastID, streamGapTimeout)
+
+	var catchUpPosts []*db.Post
+	var catchUpIDs []uint64
+	if queryParams.Last != nil {
+		if lastPost := newPostObserver.LastPost(); lastPost != nil {
+			catchUpPosts, catchUpIDs, err = streamCatchUp(ctx, queryParams, lastID, lastPost.ID)
+			if err != nil {
+				handleInternalError(ctx, err)
+				return
+			}
+		}
+	}
+
+	logger := ctx.MustGet("l").(*zap.Logger)
+
+	ctx.Header("Content-Type", "text/event-stream")
+	ctx.Header("Cache-Control", "no-cache")
+	ctx.Header("Connection", "keep-alive")
+	ctx.Header("X-Accel-Buffering", "no") // nginx would buffer it otherwise
+	ctx.Status(200)
+
+	writeEvent := func(data []byte) bool {
+		_, err := ctx.Writer.Write(data)
+		if err != nil {
+			return false // client gone
+		}
+		ctx.Writer.Flush()
+		return true
+	}
+
+	// announce tells the client where to resume from, once every post before the ones sent without an event id is done with.
+	// An event with nothing but an id is not dispatched, but the client remembers the id
+	announce := func() bool {
+		if id, ok := cursor.resumeID(); ok {
+			return writeEvent([]byte(fmt.Sprintf("id: %d\n\n", id)))
+		}
+		return true
+	}
+
+	// send records the post as seen, and sends it if it matches. event is the shared event of the post, if there's one
+	send := func(post *db.Post, event *observer.Event) bool {
+		inOrder := cursor.see(post.ID, time.Now())
+		if queryParams.Evaluate(post) { // the last post sent upon subscribing is not filtered, so check it here
+			var data []byte
+			var err error
+			if inOrder && event != nil {
+				data, err = event.SSE() // encoded once for everyone
+			} else {
+				data, err = observer.FormatSSE(post, inOrder)
+			}
+			if err != nil {
+				logger.Error("Error while encoding post for streaming", zap.Error(err))
+				return false
+			}
+			if !writeEvent(data) {
+				return false
+			}
+		}
+		return announce()
+	}
+
+	// sendCaughtUp sends the posts returned by streamCatchUp we have not seen yet, and records the ids of the ones that did not match
+	sendCaughtUp := func(posts []*db.Post, ids []uint64) bool {
+		i := 0
+		for _, id := range ids {
+			for ; i < len(posts) && posts[i].ID <= id; i++ {
+				if cursor.fresh(posts[i].ID) && !send(posts[i], nil) {
+					return false
+				}
+			}
+			if cursor.fresh(id) {
+				cursor.see(id, time.Now()) // did not match
+			}
+		}
+		for ; i < len(posts); i++ { // committed while we were looking
+			if cursor.fresh(posts[i].ID) && !send(posts[i], nil) {
+				return false
+			}
+		}
+		cursor.advance(time.Now()) // some may be given up on by now
+		return announce()
+	}
+
+	// catchUp looks up the posts up to untilID we have not seen, either because they were filtered out, missed, or committed late
+	catchUp := func(untilID uint64) bool {
+		posts, ids, err := streamCatchUp(ctx, queryParams, cursor.lastID, untilID)
+		if err != nil {
+			logger.Error("Error while catching up stream", zap.Error(err))
+			return false // the client will reconnect with Last-Event-ID
+		}
+		return sendCaughtUp(posts, ids)
+	}
+
+	// Let the client know that the stream is up, even if there's nothing to send yet
+	if !writeEvent([]byte(": connected\n\n")) || !sendCaughtUp(catchUpPosts, catchUpIDs) {
+		return
+	}
+
+	heartbeat := time.NewTicker(sseHeartbeatInterval)
+	defer heartbeat.Stop()
+
+	for {
+		select {
+		case event, ok := <-newPostChan:
+			if !ok {
+				return // the request context is done
+			}
+			newPost := event.Post
+			if !cursor.fresh(newPost.ID) {
+				continue
+			}
+
+			// Some posts in between were either filtered out, or missed, look them up.
+			// A post arriving late (with an id lower than the highest one seen) is not looked up, it's right here
+			if cursor.skipsAhead(newPost.ID) && !catchUp(newPost.ID) {
+				return
+			}
+			if cursor.fresh(newPost.ID) && !send(newPost, event) {
+				return
+			}
+
+		case <-heartbeat.C:
+			// Posts that were skipped, but turned up since without us noticing (those that don't match are not delivered to us),
+			// or are waited for long enough, are done with, so a reconnecting client does not have to go back for them
+			if cursor.waiting() && !catchUp(cursor.highID) {
+				return
+			}
+			if !writeEvent([]byte(": heartbeat\n\n")) {
+				return
+			}
+
+		case <-ctx.Request.Context().Done():
+			return
+		}
+	}
+}
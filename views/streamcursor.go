@@ -0,0 +1,111 @@
+package views
+
+import "time"
+
+// streamGapTimeout is how long a stream waits for a post that was skipped. Posts may be committed (and so notified) out of id order,
+// but an id may also be lost for good: the transaction that took it from the sequence may have been rolled back
+const streamGapTimeout = 10 * time.Second
+
+// streamCursor keeps track of what a stream has sent. Since posts may turn up out of order, there are two marks:
+// every post up to lastID is done with (sent, or did not match), this is where a reconnecting client should resume from,
+// while highID is the highest id seen so far. The ids in between that were not seen yet are waited for, for a while
+type streamCursor struct {
+	lastID  uint64
+	highID  uint64
+	missing map[uint64]time.Time // the ids between lastID and highID that were not seen yet, and since when they are waited for
+	seen    map[uint64]struct{}  // the ids between lastID and highID that were seen already
+	ahead   bool                 // posts were sent while some before them were missing, the client does not know where to resume from
+	timeout time.Duration
+}
+
+func newStreamCursor(lastID uint64, timeout time.Duration) *streamCursor {
+	return &streamCursor{
+		lastID:  lastID,
+		highID:  lastID,
+		missing: make(map[uint64]time.Time),
+		seen:    make(map[uint64]struct{}),
+		timeout: timeout,
+	}
+}
+
+// fresh tells if the post with the given id was not seen yet
+func (c *streamCursor) fresh(id uint64) bool {
+	if id <= c.lastID {
+		return false
+	}
+	_, ok := c.seen[id]
+	return !ok
+}
+
+// skipsAhead tells if there are ids between the highest one seen and the given one, those have to be looked up
+func (c *streamCursor) skipsAhead(id uint64) bool {
+	return id > c.highID+1
+}
+
+// waiting tells if there are posts that were skipped, and not seen yet
+func (c *streamCursor) waiting() bool {
+	return len(c.missing) != 0
+}
+
+// see records that the post with the given id exists, the caller sends it if it matches.
+// The ids skipped before it are waited for from now on. It returns whether everything up to this post is done with,
+// only then may the post be sent with its id as the event id, otherwise a reconnecting client would resume after the missing ones
+func (c *streamCursor) see(id uint64, now time.Time) bool {
+	for skipped := c.highID + 1; skipped < id; skipped++ {
+		c.missing[skipped] = now
+	}
+	c.highID = max(c.highID, id)
+	delete(c.missing, id)
+	c.seen[id] = struct{}{}
+	c.advance(now)
+
+	inOrder := c.lastID >= id
+	if !inOrder {
+		c.ahead = true
+	}
+	return inOrder
+}
+
+// advance moves lastID over the posts that are done with: the ones seen, and the missing ones that were waited for long enough
+func (c *streamCursor) advance(now time.Time) {
+	for len(c.missing) != 0 {
+		first := c.firstMissing()
+		if now.Sub(c.missing[first]) < c.timeout {
+			c.moveTo(first - 1)
+			return
+		}
+		delete(c.missing, first) // given up on it
+	}
+	c.moveTo(c.highID)
+}
+
+func (c *streamCursor) firstMissing() uint64 {
+	var first uint64
+	for id := range c.missing { // there are only a few of them, if any
+		if first == 0 || id < first {
+			first = id
+		}
+	}
+	return first
+}
+
+func (c *streamCursor) moveTo(id uint64) {
+	if id <= c.lastID {
+		return
+	}
+	c.lastID = id
+	for seenID := range c.seen {
+		if seenID <= id {
+			delete(c.seen, seenID)
+		}
+	}
+}
+
+// resumeID returns the id the client should be told to resume from, if posts were sent without event ids (see see), and nothing is missing anymore
+func (c *streamCursor) resumeID() (uint64, bool) {
+	if !c.ahead || c.waiting() {
+		return 0, false
+	}
+	c.ahead = false
+	return c.lastID, true
+}
@@ -0,0 +1,90 @@
+package views
+
+import (
+	"testing"
+	"time"
+)
+
+// TestStreamCursorOutOfOrder sees post 3 before 2, like when concurrent creates commit out of order.
+// Post 3 must not be where the client resumes from until 2 turns up
+func TestStreamCursorOutOfOrder(t *testing.T) {
+	now := time.Now()
+	c := newStreamCursor(1, time.Minute)
+
+	if c.skipsAhead(2) || !c.skipsAhead(3) {
+		t.Fatal("only post 3 should skip ahead")
+	}
+	if c.see(3, now) {
+		t.Fatal("post 3 was sent with its id while post 2 is missing")
+	}
+	if c.lastID != 1 || !c.waiting() {
+		t.Fatalf("the cursor moved over the missing post, it's at %d", c.lastID)
+	}
+	if c.fresh(3) || !c.fresh(2) {
+		t.Fatal("post 3 should be seen, and post 2 should not")
+	}
+	if _, ok := c.resumeID(); ok {
+		t.Fatal("the client was told to resume while post 2 is still missing")
+	}
+
+	if !c.see(2, now) {
+		t.Fatal("post 2 should be sent with its id, nothing is missing before it")
+	}
+	if c.lastID != 3 || c.waiting() {
+		t.Fatalf("the cursor should be at 3, it's at %d", c.lastID)
+	}
+	if id, ok := c.resumeID(); !ok || id != 3 {
+		t.Fatal("the client should be told to resume after post 3, it was sent without an id")
+	}
+	if _, ok := c.resumeID(); ok {
+		t.Fatal("the client was told to resume twice")
+	}
+	if c.fresh(2) || c.fresh(3) || !c.fresh(4) {
+		t.Fatal("posts 2 and 3 should be done with, and 4 should not")
+	}
+}
+
+// TestStreamCursorGivesUp waits for a missing post, that never turns up (its transaction was rolled back)
+func TestStreamCursorGivesUp(t *testing.T) {
+	now := time.Now()
+	c := newStreamCursor(0, time.Minute)
+
+	c.see(1, now)
+	c.see(3, now)
+	c.see(5, now.Add(30*time.Second))
+
+	c.advance(now.Add(59 * time.Second))
+	if c.lastID != 1 {
+		t.Fatalf("the cursor should wait for post 2, it's at %d", c.lastID)
+	}
+
+	c.advance(now.Add(time.Minute))
+	if c.lastID != 3 || !c.waiting() {
+		t.Fatalf("the cursor should have given up on post 2 only, it's at %d", c.lastID)
+	}
+
+	c.advance(now.Add(2 * time.Minute))
+	if c.lastID != 5 || c.waiting() {
+		t.Fatalf("the cursor should have given up on post 4 too, it's at %d", c.lastID)
+	}
+	if id, ok := c.resumeID(); !ok || id != 5 {
+		t.Fatal("the client should be told to resume after post 5")
+	}
+}
+
+// TestStreamCursorInOrder is the usual case, nothing is waited for and no extra ids are sent
+func TestStreamCursorInOrder(t *testing.T) {
+	now := time.Now()
+	c := newStreamCursor(10, time.Minute)
+	for id := uint64(11); id <= 20; id++ {
+		if !c.fresh(id) || c.skipsAhead(id) || !c.see(id, now) {
+			t.Fatalf("post %d was not sent in order", id)
+		}
+	}
+	if c.lastID != 20 || c.waiting() || len(c.seen) != 0 {
+		t.Fatalf("the cursor should be at 20 with nothing kept, it's at %d", c.lastID)
+	}
+	if _, ok := c.resumeID(); ok {
+		t.Fatal("the client was told to resume, even though every post was sent with its id")
+	}
+}
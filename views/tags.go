@@ -9,6 +9,7 @@ import (
 
 func listTags(ctx *gin.Context) {
 	var queryParams db.CommonPaginationParams
+	stopBind := startPhase(ctx, "bind")
 	err := ctx.ShouldBindQuery(&queryParams)
 	if err != nil {
 		handleUserError(ctx, err)
@@ -20,14 +21,15 @@ func listTags(ctx *gin.Context) {
 		handleUserError(ctx, err)
 		return
 	}
+	stopBind()
 
-	tags, err := db.GetTags(&queryParams)
+	tags, err := db.GetTags(ctx.Request.Context(), &queryParams)
 	if err != nil {
 		handleInternalError(ctx, err)
 		return
 	}
 
-	ctx.JSON(200, tags)
+	respondJSON(ctx, 200, tags)
 }
 
 func getTag(ctx *gin.Context) {
@@ -38,6 +40,7 @@ func getTag(ctx *gin.Context) {
 	}
 
 	var queryParams db.TagFillFilterParams
+	stopBind := startPhase(ctx, "bind")
 	err := ctx.ShouldBindQuery(&queryParams)
 	if err != nil {
 		handleUserError(ctx, err)
@@ -49,34 +52,36 @@ func getTag(ctx *gin.Context) {
 		handleUserError(ctx, err)
 		return
 	}
+	stopBind()
 
-	tag, err := db.GetTagByTag(tagStr, &queryParams)
+	etag := listingETag(ctx)
+	if notModified(ctx, etag) {
+		return
+	}
+
+	tag, page, err := db.GetTagByTag(ctx.Request.Context(), tagStr, &queryParams)
 	if err != nil {
 		if err == gorm.ErrRecordNotFound {
 			ctx.AbortWithStatus(404)
 			return
 		}
-		handleInternalError(ctx, err)
+		handlePageError(ctx, err)
 		return
 	}
 
 	tag.JSONIncludePosts = queryParams.IsFill()
+	setPageHeaders(ctx, page)
+	setETag(ctx, etag)
 
-	ctx.JSON(200, tag)
+	respondJSON(ctx, 200, tag)
 }
 
 func getTrendingTags(ctx *gin.Context) {
-	tags, err := db.GetTrendingTags()
-
-	if err != nil {
-		handleInternalError(ctx, err)
+	tags, version := trendingEngine.Trending() // a snapshot kept up to date by the engine, no need to bother the DB
+	etag := trendingETag(version)
+	if notModified(ctx, etag) {
 		return
 	}
-
-	trendingTags := make([]string, len(*tags))
-	for idx, tag := range *tags {
-		trendingTags[idx] = tag.Tag
-	}
-
-	ctx.JSON(200, trendingTags)
+	setETag(ctx, etag)
+	respondJSON(ctx, 200, tags)
 }
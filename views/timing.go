@@ -0,0 +1,89 @@
+package views
+
+import (
+	"encoding/json"
+	"github.com/gin-gonic/gin"
+	"github.com/pproj/tutter/db"
+	"github.com/pproj/tutter/timing"
+)
+
+// serverTimingWriter injects the Server-Timing header right before the headers are sent.
+// Gin writes the headers lazily on the first write, so every path that may do that is covered here
+type serverTimingWriter struct {
+	gin.ResponseWriter
+	timings *timing.Timings
+}
+
+func (w *serverTimingWriter) injectHeader() {
+	if !w.Written() {
+		w.Header().Set("Server-Timing", w.timings.Header())
+	}
+}
+
+func (w *serverTimingWriter) WriteHeaderNow() {
+	w.injectHeader()
+	w.ResponseWriter.WriteHeaderNow()
+}
+
+func (w *serverTimingWriter) Write(data []byte) (int, error) {
+	w.injectHeader()
+	return w.ResponseWriter.Write(data)
+}
+
+func (w *serverTimingWriter) WriteString(s string) (int, error) {
+	w.injectHeader()
+	return w.ResponseWriter.WriteString(s)
+}
+
+func (w *serverTimingWriter) Flush() {
+	w.injectHeader()
+	w.ResponseWriter.Flush()
+}
+
+// serverTimingMiddleware adds a Server-Timing header to every response, with the time spent binding, querying the DB and encoding.
+// This leaks information about the internals, so it should only be used in debug mode
+func serverTimingMiddleware() gin.HandlerFunc {
+	return func(ctx *gin.Context) {
+		t := timing.New()
+		ctx.Request = ctx.Request.WithContext(timing.NewContext(ctx.Request.Context(), t))
+		w := &serverTimingWriter{ResponseWriter: ctx.Writer, timings: t}
+		ctx.Writer = w
+
+		ctx.Next()
+
+		// responses without a body get their headers written by gin after the chain, bypassing the wrapper.
+		// Our own writer is used, the handlers after us may have replaced ctx.Writer with theirs
+		w.injectHeader()
+	}
+}
+
+// startPhase starts timing a phase of the request, the returned function should be called when the phase ends.
+// Does nothing if timing is not enabled
+func startPhase(ctx *gin.Context, name string) func() {
+	return timing.FromContext(ctx.Request.Context()).Start(name)
+}
+
+// respondJSON does the same as ctx.JSON, except the time spent encoding is recorded
+func respondJSON(ctx *gin.Context, code int, obj any) {
+	stop := startPhase(ctx, "encode")
+	var data []byte
+	var err error
+	switch v := obj.(type) {
+	case *[]db.Post:
+		if v == nil {
+			data = []byte("null")
+		} else {
+			data, err = db.MarshalPosts(*v) // splices the cached encodings of the posts
+		}
+	case json.Marshaler:
+		data, err = v.MarshalJSON() // our marshalers produce valid compact JSON, no need for encoding/json to go through it again
+	default:
+		data, err = json.Marshal(obj)
+	}
+	stop()
+	if err != nil {
+		handleInternalError(ctx, err)
+		return
+	}
+	ctx.Data(code, "application/json; charset=utf-8", data)
+}